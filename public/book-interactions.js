@@ -212,9 +212,36 @@ class EnhancedBookReader {
     setTimeout(() => statusDiv.remove(), 2000);
   }
   
+  /* Tempo do livro pelo leitor palavra por palavra: com as partes por
+     capítulo, audio.currentTime é relativo à parte carregada */
+  readerAudio() {
+    return typeof wordReader !== 'undefined' && wordReader && wordReader.audio ? wordReader : null;
+  }
+
+  audioTime() {
+    const reader = this.readerAudio();
+    if (reader) return reader.audioTime();
+    return app.audio ? app.audio.currentTime : 0;
+  }
+
+  audioDuration() {
+    const reader = this.readerAudio();
+    if (reader) return reader.bookDuration();
+    return app.audio ? app.audio.duration : 0;
+  }
+
+  seekAudio(time) {
+    const reader = this.readerAudio();
+    if (reader) {
+      reader.seekAudio(time);
+    } else if (app.audio) {
+      app.audio.currentTime = time;
+    }
+  }
+
   // Override the original highlightCurrentSegment to respect scroll pause
   highlightCurrentSegment() {
-    const currentTime = app.audio.currentTime - app.syncOffset;
+    const currentTime = this.audioTime() - app.syncOffset;
     const paragraphs = document.querySelectorAll('.paragraph');
     let currentSegment = null;
     
@@ -252,8 +279,9 @@ class EnhancedBookReader {
   
   updateScrollProgress() {
     const progressBar = document.getElementById('scrollProgressBar');
-    if (progressBar && app.audio.duration) {
-      const progress = (app.audio.currentTime / app.audio.duration) * 100;
+    const duration = this.audioDuration();
+    if (progressBar && duration) {
+      const progress = (this.audioTime() / duration) * 100;
       progressBar.style.width = progress + '%';
     }
   }
@@ -464,7 +492,7 @@ class EnhancedBookReader {
     
     if (noteText) {
       const timestamp = Date.now();
-      const currentTime = app.audio ? app.audio.currentTime : 0;
+      const currentTime = this.audioTime();
       
       this.notes[timestamp] = {
         text: noteText,
@@ -515,10 +543,12 @@ class EnhancedBookReader {
   }
   
   jumpToNoteTime(time) {
-    if (app.audio) {
-      app.audio.currentTime = time;
-      if (app.audio.paused) {
-        app.audio.play();
+    const reader = this.readerAudio();
+    const audio = reader ? reader.audio : app.audio;
+    if (audio) {
+      this.seekAudio(time);
+      if (audio.paused) {
+        audio.play();
       }
     }
     this.toggleNotesPanel();
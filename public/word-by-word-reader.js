@@ -15,6 +15,12 @@ class WordByWordReader {
     this.chapters = [];
     this.syncActive = false;
     this.initialSeekTime = null; // Para guardar o tempo de seek inicial
+    this.audioParts = null; // Partes por capítulo (scripts/audio_seek_index.py)
+    this.audioPart = -1; // -1: arquivo inteiro
+    this.audioOffset = 0; // Início da parte carregada no tempo do livro
+    this.audioFile = null; // Arquivo inteiro, a fonte principal do player
+    this.audioDuration = null; // Duração do livro segundo o índice de seek
+    this.readerSeek = false; // O próximo 'seeking' foi pedido pelo leitor, não pelo controle nativo
     
     this.initializeReader();
   }
@@ -45,6 +51,7 @@ class WordByWordReader {
     console.log('Initializing word-by-word reader...');
     // Aguardar a transcrição ser carregada
     await this.loadTranscription();
+    await this.loadSeekIndex();
     this.setupAudioControls();
     this.bindEvents();
     this.loadLastPosition(); // Carregar última posição salva
@@ -52,11 +59,16 @@ class WordByWordReader {
   }
 
   async loadTranscription() {
+    // Shards por capítulo (scripts/publish_transcripts.py) ou índice de palavras inteiro, se existirem
+    if (await this.loadPublished()) return;
+    if (await this.loadWordIndex()) return;
+
     try {
       const response = await fetch('/transcriptions/el-principito.json');
       if (response.ok) {
         const transcription = await response.json();
         this.segments = transcription.segments;
+        this.chapterTable = await this.loadChapterTable();
         this.processTextForWordByWord();
       } else {
         console.log('Transcription not ready yet');
@@ -68,6 +80,242 @@ class WordByWordReader {
     }
   }
 
+  async loadPublished() {
+    const base = '/transcriptions/published/el-principito/';
+    try {
+      const response = await fetch(base + 'manifest.json');
+      if (!response.ok) return false;
+      const manifest = await response.json();
+      if (manifest.shards.length === 0) return false;
+
+      // Desenha o primeiro capítulo assim que ele chega; o resto vem em segundo plano
+      const first = await this.fetchShard(base, manifest.shards[0]);
+      this.startWordIndex(manifest.chapters);
+      this.appendWordIndex(first, first.firstWord);
+      this.buildWordStarts();
+      this.createChapterMenu();
+      this.shardsLoaded = this.loadRemainingShards(base, manifest.shards.slice(1));
+      return true;
+    } catch (error) {
+      console.log('Published shards not available, falling back to word index', error);
+      return false;
+    }
+  }
+
+  async fetchShard(base, shard) {
+    const response = await fetch(base + shard.file);
+    if (!response.ok) throw new Error(`Shard ${shard.file}: HTTP ${response.status}`);
+    return response.json();
+  }
+
+  async loadRemainingShards(base, shards) {
+    // Baixa em paralelo, mas anexa na ordem do livro
+    const pending = shards.map(shard => this.fetchShard(base, shard));
+    try {
+      for (const request of pending) {
+        const shard = await request;
+        this.appendWordIndex(shard, shard.firstWord);
+        this.buildWordStarts();
+      }
+    } catch (error) {
+      console.error('Could not load the rest of the book', error);
+    }
+  }
+
+  async loadWordIndex() {
+    try {
+      const response = await fetch('/transcriptions/el-principito.words.json');
+      if (!response.ok) return false;
+      const index = await response.json();
+      this.processWordIndex(index);
+      return true;
+    } catch (error) {
+      console.log('Word index not available, falling back to segments', error);
+      return false;
+    }
+  }
+
+  async loadSeekIndex() {
+    // Com o áudio dividido por capítulo, saltos de capítulo e a retomada começam pela parte certa
+    try {
+      const response = await fetch('/transcriptions/el-principito.seek.json');
+      if (!response.ok) return;
+      const index = await response.json();
+      this.audioDuration = index.duration;
+      if (index.parts && index.parts.length > 0) {
+        this.audioParts = index.parts;
+      }
+    } catch (error) {
+      console.log('Seek index not available, using the single audio file', error);
+    }
+  }
+
+  audioTime() {
+    // Tempo no livro, mesmo tocando uma parte
+    return this.audioOffset + this.audio.currentTime;
+  }
+
+  bookDuration() {
+    // A duração do elemento é a da parte enquanto uma parte toca
+    if (this.audioPart >= 0 && this.audioDuration) return this.audioDuration;
+    return this.audio.duration;
+  }
+
+  partAt(time) {
+    let lo = 0;
+    let hi = this.audioParts.length - 1;
+    while (lo < hi) {
+      const mid = (lo + hi + 1) >> 1;
+      if (this.audioParts[mid].start <= time) lo = mid; else hi = mid - 1;
+    }
+    return lo;
+  }
+
+  setAudioSource(src, offset, time, play) {
+    if (!this.audioFile) {
+      this.audioFile = this.audio.currentSrc || this.audio.src;
+    }
+    this.audioOffset = offset;
+    // O listener de loadedmetadata faz o seek no novo arquivo
+    this.initialSeekTime = time - offset;
+    this.audio.src = src;
+    if (play) {
+      this.audio.play().catch(e => console.log('Auto-play prevented:', e));
+    }
+  }
+
+  loadAudioPart(index, time, play) {
+    // Uma requisição pequena para começar a tocar; o arquivo inteiro volta no fim da parte
+    const part = this.audioParts[index];
+    this.audioPart = index;
+    this.setAudioSource(part.file, part.start, time, play);
+  }
+
+  loadFullAudio(time, play) {
+    this.audioPart = -1;
+    this.setAudioSource(this.audioFile, 0, time, play);
+  }
+
+  seekAudio(time, usePart = false) {
+    // usePart: salto de capítulo ou retomada; os demais seeks ficam no arquivo inteiro
+    if (this.audioParts && usePart) {
+      const part = this.partAt(time);
+      if (part !== this.audioPart) {
+        this.loadAudioPart(part, time, !this.audio.paused);
+        return;
+      }
+    } else if (this.audioPart >= 0) {
+      const part = this.audioParts[this.audioPart];
+      if (time < part.start || time >= part.end) {
+        this.loadFullAudio(time, !this.audio.paused);
+        return;
+      }
+    }
+    const local = time - this.audioOffset;
+    if (this.audio.readyState >= 1) { // HAVE_METADATA
+      this.readerSeek = true;
+      this.audio.currentTime = local;
+    } else {
+      this.initialSeekTime = local;
+    }
+  }
+
+  async loadChapterTable() {
+    // Tabela de capítulos pré-calculada (scripts/chapters.py); sem ela, detecção por regex
+    try {
+      const response = await fetch('/transcriptions/el-principito.chapters.json');
+      return response.ok ? await response.json() : null;
+    } catch (error) {
+      return null;
+    }
+  }
+
+  processWordIndex(index) {
+    if (!this.startWordIndex(index.chapters)) return;
+    this.appendWordIndex(index, 0);
+    this.buildWordStarts();
+    this.createChapterMenu();
+  }
+
+  startWordIndex(chapters) {
+    // Tabela de capítulos completa desde o início, mesmo com o texto chegando aos poucos
+    const content = document.getElementById('bookContent');
+    const bookPageContainer = content.querySelector('.book-page-container');
+
+    if (!bookPageContainer) {
+      console.error('Book page container not found');
+      return false;
+    }
+
+    this.addSyncIndicator();
+    bookPageContainer.innerHTML = '';
+    this.words = [];
+    this.wordTimings = [];
+    this.chapters = chapters.map(chapter => ({
+      title: chapter.title,
+      start: chapter.start,
+      wordIndex: chapter.word,
+      segmentIndex: chapter.segment
+    }));
+    return true;
+  }
+
+  appendWordIndex(index, firstWord) {
+    // Anexa as palavras de um índice (inteiro ou shard) que começa na palavra global firstWord
+    const bookPageContainer = document.querySelector('#bookContent .book-page-container');
+    const parts = [];
+    const total = index.words.length;
+    let nextChapter = 0;
+    let currentSegment = -1;
+
+    for (let k = 0; k < total; k++) {
+      const i = firstWord + k;
+      const segmentIndex = index.segment[k];
+      const start = index.start[k] / 1000;
+      const end = index.end[k] / 1000;
+
+      if (segmentIndex !== currentSegment || (nextChapter < index.chapters.length && index.chapters[nextChapter].word === i)) {
+        if (currentSegment !== -1) parts.push('</p>');
+
+        while (nextChapter < index.chapters.length && index.chapters[nextChapter].word === i) {
+          parts.push(this.chapterMarkerHTML(index.chapters[nextChapter].title));
+          nextChapter++;
+        }
+
+        parts.push('<p class="text-paragraph">');
+        currentSegment = segmentIndex;
+      }
+
+      parts.push(`<span class="word" id="word-${i}" data-start="${start}" data-end="${end}" data-index="${i}">${index.words[k]}</span> `);
+      this.words[i] = {
+        text: index.words[k],
+        start: start,
+        end: end,
+        index: i,
+        segmentIndex: segmentIndex
+      };
+    }
+    if (currentSegment !== -1) parts.push('</p>');
+
+    bookPageContainer.insertAdjacentHTML('beforeend', parts.join(''));
+  }
+
+  chapterMarkerHTML(title) {
+    return `<div class="chapter-marker">
+            <div class="chapter-ornament">✦</div>
+            <div class="chapter-title">${title}</div>
+            <div class="chapter-ornament">✦</div>
+          </div>`;
+  }
+
+  buildWordStarts() {
+    // Array tipado com os inícios para a busca binária em updateCurrentWord
+    this.wordStarts = new Float64Array(this.words.length);
+    for (let i = 0; i < this.words.length; i++) {
+      this.wordStarts[i] = this.words[i].start;
+    }
+  }
+
   processTextForWordByWord() {
     const content = document.getElementById('bookContent');
     const bookPageContainer = content.querySelector('.book-page-container');
@@ -89,63 +337,65 @@ class WordByWordReader {
     this.segments.forEach((segment, segmentIndex) => {
       let text = segment.text.trim();
       
-      // Chapter detection logic remains the same...
-      const chapterRegex = /Cap[íi]tulo\s*(\d+|uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno)|(?:^|\.\s+)\d+\.\s+/gi;
-      const chapterMatches = text.match(chapterRegex);
+      if (this.chapterTable) {
+        text = this.applyChapterTable(text, segmentIndex, globalWordIndex, (title) => {
+          html += this.chapterMarkerHTML(title);
+        });
+      } else {
+        // Fallback sem tabela: detecção por regex no navegador
+        const chapterRegex = /Cap[íi]tulo\s*(\d+|uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno)|(?:^|\.\s+)\d+\.\s+/gi;
+        const chapterMatches = text.match(chapterRegex);
       
-      if (chapterMatches) {
-        chapterMatches.forEach(match => {
-          let chapterNum = 0;
-          const chapterTitle = match.trim().replace(/\.$/, '');
-          const spanishNumbers = {
-            'uno': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
-            'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10,
-            'once': 11, 'doce': 12, 'trece': 13, 'catorce': 14, 'quince': 15,
-            'dieciséis': 16, 'diecisiete': 17, 'dieciocho': 18, 'diecinueve': 19,
-            'veinte': 20, 'veintiuno': 21
-          };
-          const numMatch = chapterTitle.match(/(\d+)/);
-          const wordMatch = chapterTitle.toLowerCase().match(/uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno/);
+        if (chapterMatches) {
+          chapterMatches.forEach(match => {
+            let chapterNum = 0;
+            const chapterTitle = match.trim().replace(/\.$/, '');
+            const spanishNumbers = {
+              'uno': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
+              'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10,
+              'once': 11, 'doce': 12, 'trece': 13, 'catorce': 14, 'quince': 15,
+              'dieciséis': 16, 'diecisiete': 17, 'dieciocho': 18, 'diecinueve': 19,
+              'veinte': 20, 'veintiuno': 21
+            };
+            const numMatch = chapterTitle.match(/(\d+)/);
+            const wordMatch = chapterTitle.toLowerCase().match(/uno|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince|dieciséis|diecisiete|dieciocho|diecinueve|veinte|veintiuno/);
           
-          if (numMatch) {
-            chapterNum = parseInt(numMatch[1]);
-          } else if (wordMatch) {
-            chapterNum = spanishNumbers[wordMatch[0]];
-          } else if (match.match(/^\d+\.?$/)) {
-            chapterNum = parseInt(match);
-          }
-          
-          const toRoman = (num) => {
-            const romanNumerals = [
-              ['XXI', 21], ['XX', 20], ['XIX', 19], ['XVIII', 18], ['XVII', 17],
-              ['XVI', 16], ['XV', 15], ['XIV', 14], ['XIII', 13], ['XII', 12],
-              ['XI', 11], ['X', 10], ['IX', 9], ['VIII', 8], ['VII', 7],
-              ['VI', 6], ['V', 5], ['IV', 4], ['III', 3], ['II', 2], ['I', 1]
-            ];
-            for (const [roman, value] of romanNumerals) {
-              if (num >= value) return roman;
+            if (numMatch) {
+              chapterNum = parseInt(numMatch[1]);
+            } else if (wordMatch) {
+              chapterNum = spanishNumbers[wordMatch[0]];
+            } else if (match.match(/^\d+\.?$/)) {
+              chapterNum = parseInt(match);
             }
-            return 'I';
-          };
           
-          const romanNum = toRoman(chapterNum);
-          const standardizedTitle = `Capítulo ${romanNum}`;
+            const toRoman = (num) => {
+              const romanNumerals = [
+                ['XXI', 21], ['XX', 20], ['XIX', 19], ['XVIII', 18], ['XVII', 17],
+                ['XVI', 16], ['XV', 15], ['XIV', 14], ['XIII', 13], ['XII', 12],
+                ['XI', 11], ['X', 10], ['IX', 9], ['VIII', 8], ['VII', 7],
+                ['VI', 6], ['V', 5], ['IV', 4], ['III', 3], ['II', 2], ['I', 1]
+              ];
+              for (const [roman, value] of romanNumerals) {
+                if (num >= value) return roman;
+              }
+              return 'I';
+            };
           
-          this.chapters.push({
-            title: standardizedTitle,
-            start: segment.start,
-            wordIndex: globalWordIndex,
-            segmentIndex: segmentIndex
-          });
+            const romanNum = toRoman(chapterNum);
+            const standardizedTitle = `Capítulo ${romanNum}`;
           
-          html += `<div class="chapter-marker">
-            <div class="chapter-ornament">✦</div>
-            <div class="chapter-title">${standardizedTitle}</div>
-            <div class="chapter-ornament">✦</div>
-          </div>`;
-        });
+            this.chapters.push({
+              title: standardizedTitle,
+              start: segment.start,
+              wordIndex: globalWordIndex,
+              segmentIndex: segmentIndex
+            });
+          
+            html += this.chapterMarkerHTML(standardizedTitle);
+          });
         
-        text = text.replace(chapterRegex, ' ');
+          text = text.replace(chapterRegex, ' ');
+        }
       }
 
       const words = this.extractWords(text);
@@ -183,9 +433,29 @@ class WordByWordReader {
 
     bookPageContainer.innerHTML = html;
 
+    this.buildWordStarts();
     this.createChapterMenu();
   }
 
+  applyChapterTable(text, segmentIndex, wordIndex, addMarker) {
+    // Remove do texto os marcadores da tabela e registra cada capítulo
+    const entries = this.chapterTable.filter(chapter => chapter.segment === segmentIndex);
+    let rest = '';
+    let pos = 0;
+    entries.forEach(chapter => {
+      rest += text.slice(pos, chapter.offset) + ' ';
+      pos = chapter.offset + chapter.length;
+      this.chapters.push({
+        title: chapter.title,
+        start: chapter.start,
+        wordIndex: wordIndex,
+        segmentIndex: segmentIndex
+      });
+      addMarker(chapter.title);
+    });
+    return entries.length ? (rest + text.slice(pos)).trim() : text;
+  }
+
   extractWords(text) {
     // Limpar texto e dividir em palavras, preservando pontuação
     return text
@@ -216,6 +486,7 @@ class WordByWordReader {
         console.log('Audio loaded, duration:', Math.round(this.audio.duration / 60), 'minutes');
         if (this.initialSeekTime) {
           console.log(`Seeking to initial time: ${this.initialSeekTime}s`);
+          this.readerSeek = true;
           this.audio.currentTime = this.initialSeekTime;
           this.initialSeekTime = null; // Usar apenas uma vez
         }
@@ -250,7 +521,23 @@ class WordByWordReader {
         this.updateSyncIndicator(false);
       });
 
+      this.audio.addEventListener('seeking', () => {
+        // Barra nativa sobre uma parte: volta ao arquivo inteiro, que cobre o livro todo
+        if (this.readerSeek) {
+          this.readerSeek = false;
+          return;
+        }
+        if (this.audioPart >= 0) {
+          this.loadFullAudio(this.audioTime(), !this.audio.paused);
+        }
+      });
+
       this.audio.addEventListener('ended', () => {
+        // Fim de uma parte: a leitura continua no arquivo inteiro
+        if (this.audioPart >= 0 && this.audioPart < this.audioParts.length - 1) {
+          this.loadFullAudio(this.audioParts[this.audioPart].end, true);
+          return;
+        }
         this.isPlaying = false;
         this.resetHighlighting();
       });
@@ -294,34 +581,39 @@ class WordByWordReader {
   updateCurrentWord() {
     if (!this.audio || this.words.length === 0) return;
 
-    const currentTime = this.audio.currentTime;
-    
-    // Encontrar palavra atual baseada no tempo com melhor precisão
-    let targetWordIndex = -1;
-    let closestWordIndex = -1;
-    let minTimeDiff = Infinity;
-    
-    for (let i = 0; i < this.words.length; i++) {
-      const word = this.words[i];
-      
-      // Palavra exata para o tempo atual
-      if (currentTime >= word.start && currentTime <= word.end) {
-        targetWordIndex = i;
-        break;
-      }
-      
-      // Encontrar palavra mais próxima como backup
-      const timeDiff = Math.abs(currentTime - word.start);
-      if (timeDiff < minTimeDiff) {
-        minTimeDiff = timeDiff;
-        closestWordIndex = i;
+    const currentTime = this.audioTime();
+    const starts = this.wordStarts;
+
+    // Busca binária: última palavra com start <= currentTime
+    let lo = 0;
+    let hi = starts.length - 1;
+    let candidate = -1;
+    while (lo <= hi) {
+      const mid = (lo + hi) >> 1;
+      if (starts[mid] <= currentTime) {
+        candidate = mid;
+        lo = mid + 1;
+      } else {
+        hi = mid - 1;
       }
     }
 
-    // Se não encontrou palavra exata, usar a mais próxima
-    if (targetWordIndex === -1 && closestWordIndex !== -1) {
-      // Só usar a palavra mais próxima se estiver dentro de 2 segundos
-      if (minTimeDiff < 2) {
+    let targetWordIndex = -1;
+    if (candidate !== -1 && currentTime <= this.words[candidate].end) {
+      targetWordIndex = candidate;
+    } else {
+      // Entre palavras: usar a mais próxima se estiver dentro de 2 segundos
+      let closestWordIndex = -1;
+      let minTimeDiff = Infinity;
+      for (const i of [candidate, candidate + 1]) {
+        if (i < 0 || i >= starts.length) continue;
+        const timeDiff = Math.abs(currentTime - starts[i]);
+        if (timeDiff < minTimeDiff) {
+          minTimeDiff = timeDiff;
+          closestWordIndex = i;
+        }
+      }
+      if (closestWordIndex !== -1 && minTimeDiff < 2) {
         targetWordIndex = closestWordIndex;
       }
     }
@@ -514,16 +806,12 @@ class WordByWordReader {
     return pages.length;
   }
 
-  jumpToWord(wordIndex) {
+  jumpToWord(wordIndex, usePart = false) {
     if (wordIndex >= 0 && wordIndex < this.words.length) {
       const word = this.words[wordIndex];
       if (this.audio) {
-        // Se o áudio já estiver carregado, pule para o tempo. Senão, guarde para mais tarde.
-        if (this.audio.readyState >= 2) { // HAVE_CURRENT_DATA
-          this.audio.currentTime = word.start;
-        } else {
-          this.initialSeekTime = word.start;
-        }
+        // Pula para o tempo (ou guarda para quando o áudio carregar)
+        this.seekAudio(word.start, usePart);
         this.highlightWord(wordIndex, true);
       }
     }
@@ -531,7 +819,7 @@ class WordByWordReader {
 
   jumpToTime(time) {
     if (this.audio) {
-      this.audio.currentTime = time;
+      this.seekAudio(time);
       if (this.audio.paused) {
         this.audio.play();
       }
@@ -688,11 +976,18 @@ class WordByWordReader {
     if (lastReadWordId) {
       console.log(`Carregando última posição: ${lastReadWordId}`);
       const lastWordElement = document.getElementById(lastReadWordId);
+      if (!lastWordElement && this.shardsLoaded) {
+        // A palavra está num capítulo que ainda não chegou
+        const loaded = this.shardsLoaded;
+        this.shardsLoaded = null;
+        loaded.then(() => this.loadLastPosition());
+        return;
+      }
       if (lastWordElement) {
         const wordIndex = parseInt(lastWordElement.dataset.index);
         if (!isNaN(wordIndex)) {
           // Chamar jumpToWord para preparar o tempo do áudio e destacar
-          this.jumpToWord(wordIndex);
+          this.jumpToWord(wordIndex, true);
           // Rolar para a palavra de forma suave
           lastWordElement.scrollIntoView({ behavior: 'smooth', block: 'center' });
         }
@@ -748,7 +1043,7 @@ class WordByWordReader {
   adjustSync(seconds) {
     // Implementar ajuste de sincronização se necessário
     if (this.audio) {
-      this.audio.currentTime += seconds;
+      this.seekAudio(this.audioTime() + seconds);
     }
   }
 
@@ -767,8 +1062,8 @@ class WordByWordReader {
   }
 
   calculateWPM() {
-    if (!this.audio || this.audio.currentTime === 0) return 0;
-    const minutesElapsed = this.audio.currentTime / 60;
+    if (!this.audio || this.audioTime() === 0) return 0;
+    const minutesElapsed = this.audioTime() / 60;
     return Math.round((this.currentWordIndex + 1) / minutesElapsed);
   }
 
@@ -833,7 +1128,7 @@ class WordByWordReader {
       console.log(`Jumping to chapter ${chapterIndex + 1}: ${chapter.title} at time ${chapter.start}s`);
       
       if (this.audio) {
-        this.audio.currentTime = chapter.start;
+        this.seekAudio(chapter.start, true);
         
         // Forçar o start do áudio se não estiver tocando
         if (this.audio.paused) {
@@ -857,7 +1152,7 @@ class WordByWordReader {
   updateCurrentChapter() {
     if (!this.audio || this.chapters.length === 0) return;
     
-    const currentTime = this.audio.currentTime;
+    const currentTime = this.audioTime();
     let currentChapter = 0;
     
     for (let i = 0; i < this.chapters.length; i++) {
@@ -1025,7 +1320,7 @@ function initializeWordByWordReader() {
     window.testSync = function() {
       if (wordReader && wordReader.audio) {
         console.log('🎵 Testing synchronization...');
-        console.log('Current time:', wordReader.audio.currentTime);
+        console.log('Current time:', wordReader.audioTime());
         console.log('Current word index:', wordReader.currentWordIndex);
         console.log('Total words:', wordReader.words.length);
         
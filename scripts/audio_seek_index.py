@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Índice de seek do áudio (tempo → byte) e partes por capítulo
+
+Num MP3 VBR sem tabela, ou num M4A com o moov no fim, o navegador estima
+ou varre o arquivo para achar o byte de um tempo qualquer; num audiolivro
+de 1h42m isso deixa lentos os saltos de capítulo e a retomada da leitura.
+Este estágio lê só os cabeçalhos do contêiner, sem decodificar áudio:
+
+- MP3: cabeçalho de cada frame (versão, taxa, bitrate, padding), pulando
+  ID3v2/ID3v1 e o frame Xing/Info;
+- M4A: caixas moov/trak/stbl (stts, stsc, stsz/stz2, stco/co64) da faixa
+  de áudio, com o byte exato de cada amostra.
+
+e grava <livro>.seek.json com o byte do frame que contém cada início de
+capítulo e de segmento (arrays paralelos em ms e bytes).
+
+Com --split, o áudio é cortado nos capítulos sem recodificar, em arquivos
+com hash no nome (cache imutável) em <pasta do áudio>/parts/<livro>/:
+MP3 é cortado aqui mesmo, frame a frame, e cada parte ganha um frame Xing
+com a própria tabela de seek (o primeiro frame pode depender do bit
+reservoir do anterior, como em qualquer corte sem recodificação); M4A é
+remontado com `ffmpeg -c copy`, se instalado. O leitor troca de parte no
+salto de capítulo e na retomada, e o primeiro Range já traz o áudio certo.
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import subprocess
+import sys
+from array import array
+from pathlib import Path
+
+from chapters import find_chapters
+from segment_stream import iter_segments
+
+SEEK_VERSION = 1
+HASH_LENGTH = 16
+MIN_PART_SECONDS = 10  # trecho antes de um capítulo mais curto que isto vai junto com ele
+
+# Bitrates (kbps) por [versão MPEG-1?][camada]; índice 0 = "free", 15 inválido
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+_LAYERS = {3: 1, 2: 2, 1: 3}
+
+
+def parse_frame_header(data, pos):
+    """(tamanho, amostras, taxa, header) do frame MP3 em `pos`, ou None."""
+    if pos + 4 > len(data):
+        return None
+    header = struct.unpack_from(">I", data, pos)[0]
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 3
+    layer = _LAYERS.get((header >> 17) & 3)
+    bitrate_index = (header >> 12) & 15
+    rate_index = (header >> 10) & 3
+    if version == 1 or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 1
+    if layer == 1:
+        return (12 * bitrate // rate + padding) * 4, 384, rate, header
+    samples = 1152 if layer == 2 or mpeg1 else 576
+    return samples // 8 * bitrate // rate + padding, samples, rate, header
+
+
+def _side_info_size(header):
+    mpeg1 = (header >> 19) & 3 == 3
+    mono = (header >> 6) & 3 == 3
+    return (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+
+
+def _id3v2_size(data):
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = 0
+    for b in data[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_info_frame(data, pos, header):
+    offset = pos + 4 + _side_info_size(header)
+    return data[offset:offset + 4] in (b"Xing", b"Info")
+
+
+def scan_mp3(data):
+    """Frames de um MP3: (tempos em s, bytes de início, fim dos dados, duração)."""
+    pos = _id3v2_size(data)
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    times, offsets = array("d"), array("q")
+    t = 0.0
+    first = True
+    while pos < end:
+        frame = parse_frame_header(data, pos)
+        # Sincronia confirmada pelo frame seguinte; lixo no meio é pulado
+        if frame is None or (pos + frame[0] < end and parse_frame_header(data, pos + frame[0]) is None):
+            pos = data.find(b"\xff", pos + 1, end)
+            if pos < 0:
+                break
+            continue
+        size, samples, rate, header = frame
+        if first and _is_info_frame(data, pos, header):
+            first = False
+            pos += size
+            continue
+        first = False
+        times.append(t)
+        offsets.append(pos)
+        t += samples / rate
+        pos += size
+    if not offsets:
+        raise ValueError("nenhum frame MP3 encontrado")
+    return times, offsets, min(pos, end), t
+
+
+def iter_boxes(data, start, end):
+    """(tipo, início do conteúdo, fim) das caixas MP4 entre start e end."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            break
+        yield kind.decode("latin-1"), pos + header, min(pos + size, end)
+        pos += size
+
+
+def _child(data, start, end, *path):
+    for name in path:
+        found = next(((s, e) for kind, s, e in iter_boxes(data, start, end) if kind == name), None)
+        if found is None:
+            return None
+        start, end = found
+    return start, end
+
+
+def scan_m4a(data):
+    """Amostras da faixa de áudio de um MP4/M4A: (tempos, bytes, fim, duração, faststart)."""
+    top = list(iter_boxes(data, 0, len(data)))
+    moov = next(((s, e) for kind, s, e in top if kind == "moov"), None)
+    if moov is None:
+        raise ValueError("caixa moov não encontrada")
+    mdat_start = next((s for kind, s, _ in top if kind == "mdat"), None)
+    faststart = mdat_start is None or moov[0] < mdat_start
+
+    for kind, s, e in iter_boxes(data, *moov):
+        if kind != "trak":
+            continue
+        hdlr = _child(data, s, e, "mdia", "hdlr")
+        if hdlr and data[hdlr[0] + 8:hdlr[0] + 12] == b"soun":
+            mdia = _child(data, s, e, "mdia")
+            break
+    else:
+        raise ValueError("faixa de áudio não encontrada")
+
+    mdhd = _child(data, *mdia, "mdhd")
+    version = data[mdhd[0]]
+    timescale = struct.unpack_from(">I", data, mdhd[0] + (20 if version == 1 else 12))[0]
+    stbl = _child(data, *mdia, "minf", "stbl")
+    boxes = {kind: (s, e) for kind, s, e in iter_boxes(data, *stbl)}
+
+    s, _ = boxes["stts"]
+    deltas = []
+    for i in range(struct.unpack_from(">I", data, s + 4)[0]):
+        count, delta = struct.unpack_from(">II", data, s + 8 + 8 * i)
+        deltas.append((count, delta))
+
+    if "stsz" in boxes:
+        s, _ = boxes["stsz"]
+        fixed, count = struct.unpack_from(">II", data, s + 4)
+        sizes = [fixed] * count if fixed else array("I", data[s + 12:s + 12 + 4 * count])
+        if not fixed and sys.byteorder == "little":
+            sizes.byteswap()
+    else:
+        s, e = boxes["stz2"]
+        field, count = data[s + 7], struct.unpack_from(">I", data, s + 8)[0]
+        raw = data[s + 12:e]
+        if field == 16:
+            sizes = struct.unpack_from(f">{count}H", raw)
+        elif field == 8:
+            sizes = list(raw[:count])
+        else:
+            sizes = [(raw[i // 2] >> (0 if i % 2 else 4)) & 15 for i in range(count)]
+
+    if "stco" in boxes:
+        s, _ = boxes["stco"]
+        n = struct.unpack_from(">I", data, s + 4)[0]
+        chunks = struct.unpack_from(f">{n}I", data, s + 8)
+    else:
+        s, _ = boxes["co64"]
+        n = struct.unpack_from(">I", data, s + 4)[0]
+        chunks = struct.unpack_from(f">{n}Q", data, s + 8)
+
+    s, _ = boxes["stsc"]
+    runs = [struct.unpack_from(">III", data, s + 8 + 12 * i)[:2] for i in range(struct.unpack_from(">I", data, s + 4)[0])]
+
+    offsets = array("q")
+    sample = 0
+    for r, (first_chunk, per_chunk) in enumerate(runs):
+        last_chunk = runs[r + 1][0] - 1 if r + 1 < len(runs) else len(chunks)
+        for chunk in range(first_chunk - 1, last_chunk):
+            pos = chunks[chunk]
+            for _ in range(per_chunk):
+                if sample >= len(sizes):
+                    break
+                offsets.append(pos)
+                pos += sizes[sample]
+                sample += 1
+
+    times = array("d")
+    t = 0
+    for count, delta in deltas:
+        for _ in range(count):
+            times.append(t / timescale)
+            t += delta
+    n = min(len(times), len(offsets))
+    del times[n:], offsets[n:]
+    if not n:
+        raise ValueError("faixa de áudio sem amostras")
+    data_end = offsets[-1] + sizes[n - 1]
+    return times, offsets, data_end, t / timescale, faststart
+
+
+def scan_audio(data, suffix):
+    if suffix.lower() == ".mp3":
+        times, offsets, data_end, duration = scan_mp3(data)
+        return {"format": "mp3", "times": times, "offsets": offsets, "end": data_end, "duration": duration}
+    times, offsets, data_end, duration, faststart = scan_m4a(data)
+    return {"format": "m4a", "times": times, "offsets": offsets, "end": data_end,
+            "duration": duration, "faststart": faststart}
+
+
+def frame_at(times, t):
+    """Índice do frame que contém o tempo t."""
+    return max(0, bisect.bisect_right(times, t) - 1)
+
+
+def _xing_header(first_header):
+    """(header, tamanho) do frame Xing: mesmo formato do primeiro frame, sem
+    CRC nem padding, com o menor bitrate que comporta a tabela."""
+    needed = 4 + _side_info_size(first_header) + 16 + 100
+    base = (first_header | 0x10000) & ~0x200 & ~0xF000
+    for index in range(1, 15):
+        header = base | (index << 12)
+        length = parse_frame_header(struct.pack(">I", header), 0)[0]
+        if length >= needed:
+            break
+    return header, length
+
+
+def _xing_frame(header, length, frames, size, toc):
+    """Frame Xing com número de frames, bytes (incluindo ele) e tabela de 100 pontos."""
+    frame = bytearray(length)
+    struct.pack_into(">I", frame, 0, header)
+    pos = 4 + _side_info_size(header)
+    frame[pos:pos + 4] = b"Xing"
+    struct.pack_into(">III", frame, pos + 4, 0x7, frames, size)
+    frame[pos + 16:pos + 116] = bytes(toc)
+    return bytes(frame)
+
+
+def mp3_part(data, scan, first, last):
+    """Bytes de uma parte MP3 (frames first:last) com frame Xing próprio."""
+    offsets, times = scan["offsets"], scan["times"]
+    start = offsets[first]
+    stop = offsets[last] if last < len(offsets) else scan["end"]
+    size = stop - start
+    t0 = times[first]
+    duration = (times[last] if last < len(times) else scan["duration"]) - t0
+    header, length = _xing_header(struct.unpack_from(">I", data, start)[0])
+    total = size + length
+    toc = []
+    for i in range(100):
+        k = min(max(frame_at(times, t0 + duration * i / 100), first), last - 1)
+        toc.append(min(255, (length + offsets[k] - start) * 256 // total))
+    return _xing_frame(header, length, last - first, total, toc) + data[start:stop]
+
+
+def m4a_part(audio, start, end, out_file):
+    """Corta um M4A sem recodificar (ffmpeg -c copy); devolve False sem ffmpeg."""
+    if not shutil.which("ffmpeg"):
+        return False
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-i", str(audio)]
+    if end is not None:
+        command += ["-t", f"{end - start:.3f}"]
+    command += ["-c", "copy", "-movflags", "+faststart", "-f", "mp4", str(out_file)]
+    subprocess.run(command, check=True)
+    return True
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def split_audio(audio, data, scan, chapters, parts_dir, url_base):
+    """Grava as partes por capítulo; devolve a lista para o índice (ou None)."""
+    starts = [0.0]
+    for chapter in chapters:
+        if chapter["start"] - starts[-1] >= MIN_PART_SECONDS:
+            starts.append(chapter["start"])
+    frames = [frame_at(scan["times"], t) for t in starts] + [len(scan["offsets"])]
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    suffix = Path(audio).suffix.lower()
+
+    parts = []
+    for first, last in zip(frames, frames[1:]):
+        if last <= first:
+            continue
+        t0 = scan["times"][first]
+        t1 = scan["times"][last] if last < len(scan["times"]) else scan["duration"]
+        if scan["format"] == "mp3":
+            raw = mp3_part(data, scan, first, last)
+            name = f"part-{len(parts):02d}.{hashlib.sha256(raw).hexdigest()[:HASH_LENGTH]}{suffix}"
+            if not (parts_dir / name).exists():
+                _write_atomic(parts_dir / name, raw)
+        else:
+            tmp = parts_dir / f"part-{len(parts):02d}.tmp{suffix}"
+            if not m4a_part(audio, t0, t1 if last < len(scan["times"]) else None, tmp):
+                print("⚠️ ffmpeg não encontrado: M4A não foi dividido", file=sys.stderr)
+                return None
+            digest = hashlib.sha256(tmp.read_bytes()).hexdigest()[:HASH_LENGTH]
+            name = f"part-{len(parts):02d}.{digest}{suffix}"
+            os.replace(tmp, parts_dir / name)
+        parts.append({
+            "file": url_base + name,
+            "start": round(t0, 3),
+            "end": round(t1, 3),
+            "bytes": (parts_dir / name).stat().st_size,
+        })
+
+    # Só ficam as partes desta divisão
+    keep = {Path(p["file"]).name for p in parts}
+    for path in parts_dir.iterdir():
+        if path.name not in keep:
+            path.unlink()
+    return parts
+
+
+def build_seek_index(audio, chapters, segment_starts, out_file, audio_url=None, split=False):
+    """Grava <livro>.seek.json; com `split`, corta o áudio nos capítulos."""
+    audio = Path(audio)
+    book_id = Path(out_file).name.removesuffix(".seek.json")
+    with open(audio, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        scan = scan_audio(data, audio.suffix)
+        times, offsets = scan["times"], scan["offsets"]
+
+        def point(t):
+            k = frame_at(times, t)
+            return round(times[k] * 1000), offsets[k]
+
+        index = {
+            "version": SEEK_VERSION,
+            "audio": audio_url or f"/audio/{audio.name}",
+            "format": scan["format"],
+            "bytes": audio.stat().st_size,
+            "duration": round(scan["duration"], 3),
+            "dataStart": offsets[0],
+            "frames": len(offsets),
+            "chapters": [],
+            "segments": {"start": [], "byte": []},
+        }
+        if "faststart" in scan:
+            index["faststart"] = scan["faststart"]
+        for chapter in chapters:
+            at, byte = point(chapter["start"])
+            index["chapters"].append({"number": chapter["number"], "title": chapter["title"],
+                                      "start": chapter["start"], "frameStart": at / 1000, "byte": byte})
+        for t in segment_starts:
+            at, byte = point(t)
+            index["segments"]["start"].append(at)
+            index["segments"]["byte"].append(byte)
+
+        if split:
+            url_base = index["audio"].rsplit("/", 1)[0] + f"/parts/{book_id}/"
+            parts = split_audio(audio, data, scan, chapters, audio.parent / "parts" / book_id, url_base)
+            if parts:
+                index["parts"] = parts
+
+    out_file = Path(out_file)
+    _write_atomic(out_file, json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return index
+
+
+def default_output(json_file):
+    json_file = Path(json_file)
+    return json_file.with_name(f"{json_file.stem}.seek.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice tempo → byte do áudio e partes por capítulo")
+    parser.add_argument("audio", help="MP3 ou M4A")
+    parser.add_argument("transcript", help="JSON do Whisper (capítulos e inícios de segmento)")
+    parser.add_argument("output", nargs="?", help="padrão: <transcrição>.seek.json")
+    parser.add_argument("--chapters", help="tabela de capítulos (padrão: <transcrição>.chapters.json, se existir)")
+    parser.add_argument("--split", action="store_true", help="corta o áudio nos capítulos, sem recodificar")
+    parser.add_argument("--audio-url", help="URL do áudio no site (padrão: /audio/<arquivo>)")
+    args = parser.parse_args()
+
+    transcript = Path(args.transcript)
+    segments = list(iter_segments(transcript, fields=("start", "end", "text")))
+    chapters_file = Path(args.chapters) if args.chapters else transcript.with_name(f"{transcript.stem}.chapters.json")
+    if chapters_file.exists():
+        chapters = json.loads(chapters_file.read_text(encoding="utf-8"))
+    else:
+        # Sem tabela pronta: início de cada capítulo interpolado no segmento
+        chapters = []
+        for chapter in find_chapters(segments):
+            seg = segments[chapter["segment"]]
+            fraction = chapter["offset"] / max(len(seg["text"].strip()), 1)
+            chapters.append({**chapter, "start": round(seg["start"] + (seg["end"] - seg["start"]) * fraction, 3)})
+
+    out_file = Path(args.output) if args.output else default_output(transcript)
+    index = build_seek_index(args.audio, chapters, [s["start"] for s in segments], out_file,
+                             args.audio_url, args.split)
+    print(f"✅ {index['frames']} frames {index['format'].upper()} ({index['duration']:.0f}s), "
+          f"{len(index['chapters'])} capítulos e {len(index['segments']['start'])} segmentos em {out_file}")
+    if index.get("faststart") is False:
+        print("⚠️ moov depois do mdat: o navegador precisa do fim do arquivo antes de tocar "
+              "(ffmpeg -movflags +faststart resolve)")
+    for part in index.get("parts", []):
+        print(f"  🎧 {part['file']}: {part['start']:.0f}–{part['end']:.0f}s, {part['bytes'] // 1024} KB")
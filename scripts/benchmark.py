@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do pipeline Python com transcrições sintéticas em escala
+
+As transcrições são geradas a partir das estatísticas do JSON real
+(el-principito.json): textos dos segmentos, durações, pausas, tokens por
+caractere, avg_logprob / no_speech_prob / compression_ratio e o tamanho
+típico de um capítulo. Escalas: um capítulo, o livro, um livro de 20 h e
+uma biblioteca de N livros (--library 500).
+
+Para cada etapa — load_segments, export_html, calculate_timestamps,
+find_chapters (que substituiu normalize_capitulo) e as checagens de
+conclusão dos monitores — mede o melhor tempo de --repeat execuções, o
+pico de memória (tracemalloc, numa execução à parte) e o throughput em
+segmentos/s. --save grava um baseline em JSON; --compare mostra a razão
+contra ele e, com --max-regression, sai com código 1 se alguma etapa
+ficar mais lenta que o limite. Baselines só se comparam na mesma máquina.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from build_library import inputs_digest
+from chapters import find_chapters
+from generate_realistic_transcription import calculate_timestamps, synthetic_book
+from quality_report import FIELDS, columns_from_segments, quality_report
+from segment_stream import count_segments, iter_segments
+from transcript2html import export_html, load_segments
+
+BENCH_VERSION = 1
+SEED_TRANSCRIPT = Path("transcriptions/el-principito.json")
+DATA_DIR = Path("transcriptions/synthetic/bench")
+BASELINE_FILE = Path("transcriptions/.benchmark-baseline.json")
+
+SCALES = {"capitulo": 240, "livro": 6150, "20h": 20 * 3600}
+LIBRARY_DURATION = (1800, 4 * 3600)
+
+TIMESTAMP_BEGIN = 50364  # <|0.00|> no vocabulário multilíngue do Whisper
+TIMESTAMP_STEP = 0.02
+
+
+def transcript_stats(json_file):
+    """Distribuições do JSON real usadas para sortear segmentos sintéticos."""
+    fields = ("start", "end", "text", "tokens", "avg_logprob", "no_speech_prob", "compression_ratio")
+    segments = list(iter_segments(json_file, fields=fields))
+    chapter_segments = {c["segment"] for c in find_chapters(segments)}
+    body = [s for i, s in enumerate(segments) if i not in chapter_segments and s.get("text", "").strip()]
+
+    starts = np.array([s["start"] for s in segments])
+    ends = np.array([s["end"] for s in segments])
+    chapter_starts = np.array(sorted(segments[i]["start"] for i in chapter_segments))
+    chars = sum(len(s["text"]) for s in body)
+    return {
+        "texts": [s["text"] for s in body],
+        "durations": np.array([s["end"] - s["start"] for s in body]),
+        "gaps": np.clip(starts[1:] - ends[:-1], 0, None),
+        "avg_logprob": np.array([s.get("avg_logprob", -0.3) for s in body]),
+        "no_speech_prob": np.array([s.get("no_speech_prob", 0.0) for s in body]),
+        "compression_ratio": np.array([s.get("compression_ratio", 1.5) for s in body]),
+        "tokens_per_char": sum(len(s.get("tokens") or ()) for s in body) / max(chars, 1),
+        "chapter_seconds": float(np.median(np.diff(chapter_starts))) if len(chapter_starts) > 1 else 300.0,
+    }
+
+
+def synthetic_transcript(stats, duration, rng):
+    """Transcrição no formato do Whisper com `duration` segundos."""
+    n = len(stats["texts"])
+    step = stats["durations"].mean() + stats["gaps"].mean()
+    # Sorteia com folga e corta onde o tempo acumulado passa da duração
+    count = int(duration / step * 1.2) + 1
+    picks = rng.integers(0, n, count)
+    durations = stats["durations"][picks]
+    gaps = rng.choice(stats["gaps"], count)
+    starts = np.cumsum(durations + gaps) - durations - gaps
+    keep = int(np.searchsorted(starts, duration)) or 1
+    chapter_every = stats["chapter_seconds"] * rng.uniform(0.6, 1.4, keep)
+
+    segments = []
+    next_chapter, chapter = 0.0, 0
+    for i in range(keep):
+        start = round(float(starts[i]), 2)
+        end = round(float(starts[i] + durations[i]), 2)
+        text = stats["texts"][picks[i]]
+        if start >= next_chapter:
+            chapter += 1
+            text = f" Capítulo {chapter}.{text}"
+            next_chapter = start + chapter_every[i]
+        n_tokens = max(1, int(len(text) * stats["tokens_per_char"]) - 2)
+        tokens = [TIMESTAMP_BEGIN, *rng.integers(0, TIMESTAMP_BEGIN - 1000, n_tokens).tolist(),
+                  TIMESTAMP_BEGIN + int(round((end - start) / TIMESTAMP_STEP))]
+        segments.append({
+            "id": i,
+            "seek": int(start * 100),
+            "start": start,
+            "end": end,
+            "text": text,
+            "tokens": tokens,
+            "temperature": 0.0,
+            "avg_logprob": float(stats["avg_logprob"][picks[i]]),
+            "compression_ratio": float(stats["compression_ratio"][picks[i]]),
+            "no_speech_prob": float(stats["no_speech_prob"][picks[i]]),
+        })
+    return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": "es"}
+
+
+def write_transcript(transcript, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(transcript, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def prepare_data(stats, scales, library, seed, data_dir):
+    """Gera (ou reaproveita) os JSONs sintéticos; devolve {escala: [arquivos]}."""
+    data_dir = Path(data_dir)
+    files = {}
+    for name in scales:
+        path = data_dir / f"{name}-{seed}.json"
+        if not path.exists():
+            write_transcript(synthetic_transcript(stats, SCALES[name], np.random.default_rng([seed, SCALES[name]])), path)
+        files[name] = [path]
+    if library:
+        rng = np.random.default_rng([seed, library])
+        durations = rng.uniform(*LIBRARY_DURATION, library)
+        books = []
+        for n, duration in enumerate(durations):
+            path = data_dir / f"library-{seed}" / f"book-{n + 1:04d}.json"
+            if not path.exists():
+                write_transcript(synthetic_transcript(stats, duration, np.random.default_rng([seed, n])), path)
+            books.append(path)
+        files[f"biblioteca-{library}"] = books
+    return files
+
+
+def measure(func, repeat):
+    """(tempos de parede, pico de memória em bytes) de func()."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    # Pico de memória numa execução separada: tracemalloc deixa tudo mais lento
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return times, peak
+
+
+def book_benchmarks(path, out_dir, stats, rng):
+    """[(nome, função)] das etapas para um arquivo; cada função devolve nada."""
+    segments = load_segments(path)
+    duration = segments[-1]["end"] if segments else 0
+    # calculate_timestamps recebe capítulos de frases, como no texto original
+    n_chapters = max(1, round(duration / stats["chapter_seconds"]))
+    chapters = synthetic_book(rng, stats["texts"], n_chapters, len(segments) / n_chapters)
+    html = Path(out_dir) / f"{Path(path).stem}.html"
+    return [
+        ("load_segments", lambda: load_segments(path)),
+        ("export_html", lambda: export_html(segments, html, "audio.m4a", chapters=find_chapters(segments))),
+        ("calculate_timestamps", lambda: calculate_timestamps(chapters, duration)),
+        ("find_chapters", lambda: find_chapters(segments)),
+        ("monitor_count", lambda: count_segments(path)),
+        ("monitor_quality", lambda: quality_report(columns_from_segments(list(iter_segments(path, fields=FIELDS))))),
+    ], len(segments)
+
+
+def library_benchmarks(paths):
+    total = sum(count_segments(p) for p in paths)
+    books = [{"transcript": str(p), "meta": None, "audio": None} for p in paths]
+    return [
+        ("monitor_count", lambda: [count_segments(p) for p in paths]),
+        ("load_segments", lambda: [load_segments(p) for p in paths]),
+        ("build_digests", lambda: [inputs_digest(book, "") for book in books]),
+    ], total
+
+
+def run_benchmarks(files, stats, repeat, seed):
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for scale, paths in files.items():
+            if len(paths) == 1:
+                benchmarks, segments = book_benchmarks(paths[0], out_dir, stats, np.random.default_rng(seed))
+            else:
+                benchmarks, segments = library_benchmarks(paths)
+            for name, func in benchmarks:
+                # export_html imprime uma linha por arquivo gerado
+                with open(os.devnull, "w") as devnull:
+                    stdout, sys.stdout = sys.stdout, devnull
+                    try:
+                        times, peak = measure(func, repeat)
+                    finally:
+                        sys.stdout = stdout
+                best = min(times)
+                key = f"{scale}/{name}"
+                results[key] = {
+                    "segments": segments,
+                    "best": round(best, 5),
+                    "median": round(statistics.median(times), 5),
+                    "peak_mb": round(peak / (1024 * 1024), 2),
+                    "segments_per_second": round(segments / best) if best > 0 else None,
+                }
+                r = results[key]
+                print(f"  ⏱️ {key:<36} {segments:>9} seg  {r['best'] * 1000:>10.1f} ms  "
+                      f"{r['peak_mb']:>8.1f} MB  {r['segments_per_second'] or 0:>10} seg/s")
+    return results
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "node": platform.node(),
+    }
+
+
+def compare(results, baseline):
+    """[(etapa, razão tempo atual / baseline)] das etapas presentes nos dois."""
+    ratios = []
+    for key, result in results.items():
+        old = baseline["results"].get(key)
+        if old and old["best"] > 0:
+            ratios.append((key, result["best"] / old["best"]))
+    return ratios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline com transcrições sintéticas")
+    parser.add_argument("--seed-transcript", default=str(SEED_TRANSCRIPT), help="JSON real de onde vêm as estatísticas")
+    parser.add_argument("--scales", default=",".join(SCALES), help=f"escalas separadas por vírgula ({', '.join(SCALES)})")
+    parser.add_argument("--library", type=int, default=50, help="livros na biblioteca sintética (0 desliga)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="onde guardar os JSONs sintéticos gerados")
+    parser.add_argument("--save", nargs="?", const=str(BASELINE_FILE), help="grava os resultados como baseline")
+    parser.add_argument("--compare", nargs="?", const=str(BASELINE_FILE), help="compara com um baseline")
+    parser.add_argument("--max-regression", type=float, help="falha se alguma etapa ficar N%% mais lenta")
+    args = parser.parse_args()
+
+    scales = [s for s in args.scales.split(",") if s]
+    unknown = set(scales) - set(SCALES)
+    if unknown:
+        parser.error(f"escala desconhecida: {', '.join(sorted(unknown))}")
+
+    stats = transcript_stats(args.seed_transcript)
+    print(f"📊 Estatísticas de {args.seed_transcript}: {len(stats['texts'])} segmentos, "
+          f"{stats['durations'].mean():.2f}s em média, capítulo típico de {stats['chapter_seconds']:.0f}s")
+    files = prepare_data(stats, scales, args.library, args.seed, args.data_dir)
+    print(f"🧪 {sum(len(p) for p in files.values())} transcrições sintéticas em {args.data_dir}")
+
+    results = run_benchmarks(files, stats, args.repeat, args.seed)
+    report = {"version": BENCH_VERSION, "machine": machine_info(), "time": round(time.time()),
+              "seed": args.seed, "repeat": args.repeat, "results": results}
+
+    failed = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("machine") != report["machine"]:
+            print("⚠️ Baseline gravado em outra máquina: a comparação é só indicativa")
+        print(f"\n📈 Comparação com {args.compare}:")
+        for key, ratio in compare(results, baseline):
+            change = (ratio - 1) * 100
+            slow = args.max_regression is not None and change > args.max_regression
+            print(f"  {'❌' if slow else '  '} {key:<36} {change:+7.1f}%")
+            if slow:
+                failed.append(key)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 Baseline salvo em {args.save}")
+
+    if failed:
+        print(f"❌ {len(failed)} etapas acima do limite de {args.max_regression}%")
+        sys.exit(1)
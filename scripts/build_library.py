@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Build incremental da biblioteca: todos os artefatos de todos os livros
+
+Um livro é um JSON do Whisper em transcriptions/ (<livro>.json) que tem o
+áudio correspondente em public/audio/ ou um arquivo de metadados
+<livro>.meta.json (título, autor, narrador...). Para cada livro são gerados:
+
+- <livro>.html           HTML sincronizado (transcript2html)
+- <livro>.vtt            um cue por linha do HTML, para o <track> do áudio (cue_export)
+- <livro>.words.json     índice de palavras (word_index)
+- <livro>.search.json    índice de busca (search_index)
+- <livro>.chapters.json  tabela de capítulos com tempos
+- <livro>.book.json      metadados do livro
+- <livro>.seek.json      tempo → byte do áudio por capítulo e segmento (audio_seek_index),
+                         se o livro tem áudio; com --split-audio, também as partes por capítulo
+- published/<livro>/     shards por capítulo pré-comprimidos (publish_transcripts)
+
+e um único library.json com a lista de livros, que o /api/books serve.
+
+Os livros são processados num pool de processos. O hash das entradas
+(transcrição, metadados, tamanho/data do áudio e o código dos geradores)
+fica em .build-cache.json; livros com o mesmo hash da última vez são
+pulados, então refazer um catálogo grande depois de mexer num livro leva
+segundos.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from audio_seek_index import build_seek_index
+from chapters import write_chapter_table
+from publish_transcripts import MANIFEST_FILE, publish_book
+from search_index import build_search_index, write_search_index
+from segment_stream import iter_segments
+from tracing import collect, count, enable, merge, span
+from transcript2html import export_html
+from word_index import build_word_index, write_word_index
+
+BUILD_VERSION = 1
+AUDIO_EXTENSIONS = (".mp3", ".m4a")
+DERIVED_SUFFIXES = (".words", ".search", ".chapters", ".book", ".meta")
+
+TRANSCRIPTS_DIR = Path("transcriptions")
+AUDIO_DIR = Path("public/audio")
+LIBRARY_FILE = "library.json"
+CACHE_FILE = ".build-cache.json"
+
+# Mudanças nestes scripts invalidam todos os livros
+GENERATORS = ("build_library.py", "transcript2html.py", "word_index.py", "search_index.py",
+              "chapters.py", "publish_transcripts.py", "segment_stream.py", "cue_export.py",
+              "audio_seek_index.py")
+
+DEFAULT_META = {
+    "author": "Autor Desconocido",
+    "language": "Español",
+    "narrator": "N/A",
+    "description": "Audiolivro em espanhol com tradução interativa.",
+}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def generators_digest():
+    digest = hashlib.sha256(str(BUILD_VERSION).encode())
+    here = Path(__file__).resolve().parent
+    for name in GENERATORS:
+        digest.update(file_digest(here / name).encode())
+    return digest.hexdigest()
+
+
+def find_books(transcripts_dir, audio_dir):
+    """{id: {"transcript", "meta", "audio"}} dos livros encontrados."""
+    audio = {}
+    if Path(audio_dir).is_dir():
+        for f in sorted(Path(audio_dir).iterdir()):
+            if f.suffix.lower() in AUDIO_EXTENSIONS:
+                audio.setdefault(f.stem, f)
+
+    books = {}
+    for transcript in sorted(Path(transcripts_dir).glob("*.json")):
+        book_id = transcript.stem
+        if book_id.startswith(".") or Path(book_id).suffix in DERIVED_SUFFIXES:
+            continue
+        meta = transcript.with_name(f"{book_id}.meta.json")
+        # Backups e versões intermediárias (el-principito-tiny-backup) não têm áudio nem metadados
+        if book_id not in audio and not meta.exists():
+            continue
+        books[book_id] = {
+            "transcript": str(transcript),
+            "meta": str(meta) if meta.exists() else None,
+            "audio": str(audio[book_id]) if book_id in audio else None,
+        }
+    return books
+
+
+def inputs_digest(book, generators, options=""):
+    digest = hashlib.sha256((generators + options).encode())
+    digest.update(file_digest(book["transcript"]).encode())
+    if book["meta"]:
+        digest.update(file_digest(book["meta"]).encode())
+    if book["audio"]:
+        # O áudio é grande demais para ler inteiro: tamanho e data bastam
+        st = os.stat(book["audio"])
+        digest.update(f"{book['audio']}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def book_outputs(out_dir, book_id, audio=None):
+    out_dir = Path(out_dir)
+    outputs = {
+        "html": out_dir / f"{book_id}.html",
+        "track": out_dir / f"{book_id}.vtt",
+        "words": out_dir / f"{book_id}.words.json",
+        "search": out_dir / f"{book_id}.search.json",
+        "chapters": out_dir / f"{book_id}.chapters.json",
+        "book": out_dir / f"{book_id}.book.json",
+        "manifest": out_dir / "published" / book_id / MANIFEST_FILE,
+    }
+    if audio:
+        outputs["seek"] = out_dir / f"{book_id}.seek.json"
+    return outputs
+
+
+def build_book(job):
+    """Gera todos os artefatos de um livro; devolve a entrada do library.json."""
+    book_id, book, out_dir, split_audio = job
+    started = time.monotonic()
+    outputs = book_outputs(out_dir, book_id, book["audio"])
+    meta = json.loads(Path(book["meta"]).read_text(encoding="utf-8")) if book["meta"] else {}
+
+    fields = ("start", "end", "text", "tokens", "seek")
+    with span("book.load", book=book_id):
+        segments = list(iter_segments(book["transcript"], fields=fields))
+    count("segments", len(segments))
+
+    word_index = build_word_index(segments)
+    with span("book.write_words"):
+        write_word_index(word_index, outputs["words"])
+    search = build_search_index(segments)
+    with span("book.write_search"):
+        write_search_index(search, outputs["search"])
+
+    # A tabela de capítulos sai do índice de palavras, com os tempos exatos
+    chapters = word_index["chapters"]
+    write_chapter_table(chapters, outputs["chapters"])
+
+    audio_url = meta.get("audioUrl") or (f"/audio/{Path(book['audio']).name}" if book["audio"] else "")
+    export_html(segments, outputs["html"], audio_url, chapters=chapters, track=True)
+
+    duration = segments[-1]["end"] if segments else 0
+    publish_book(word_index, outputs["manifest"].parent, duration)
+    if book["audio"]:
+        with span("book.seek_index"):
+            build_seek_index(book["audio"], chapters, [s["start"] for s in segments], outputs["seek"],
+                             audio_url, split=split_audio)
+    entry = {
+        "id": book_id,
+        "title": meta.get("title") or book_id.replace("-", " ").title(),
+        "author": meta.get("author", DEFAULT_META["author"]),
+        "audioFile": Path(book["audio"]).name if book["audio"] else meta.get("audioFile"),
+        "duration": meta.get("duration") or format_duration(duration),
+        "durationSeconds": round(duration, 2),
+        "chapters": meta.get("chapters") or len(chapters),
+        "language": meta.get("language", DEFAULT_META["language"]),
+        "narrator": meta.get("narrator", DEFAULT_META["narrator"]),
+        "description": meta.get("description", DEFAULT_META["description"]),
+        "fileSize": f"{round(os.stat(book['audio']).st_size / (1024 * 1024))} MB" if book["audio"] else "N/A",
+        "segments": len(segments),
+        "words": len(word_index["words"]),
+        "artifacts": {kind: f"/transcriptions/{path.relative_to(out_dir).as_posix()}" for kind, path in outputs.items()},
+    }
+    outputs["book"].write_text(json.dumps(entry, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Eventos de trace voltam com o resultado: processos do pool não gravam arquivo
+    return entry, time.monotonic() - started, collect()
+
+
+def load_json(path, default):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def write_json_atomic(path, data):
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def build_library(transcripts_dir=TRANSCRIPTS_DIR, audio_dir=AUDIO_DIR, out_dir=None,
+                  workers=None, force=False, split_audio=False):
+    """Reconstrói o que mudou e grava o library.json; devolve (manifesto, refeitos)."""
+    out_dir = Path(out_dir or transcripts_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = out_dir / CACHE_FILE
+    cache = load_json(cache_file, {})
+
+    books = find_books(transcripts_dir, audio_dir)
+    generators = generators_digest()
+    options = "split-audio" if split_audio else ""
+    digests = {book_id: inputs_digest(book, generators, options) for book_id, book in books.items()}
+
+    entries = {}
+    jobs = []
+    for book_id, book in books.items():
+        cached = cache.get(book_id)
+        fresh = (
+            not force and cached and cached["digest"] == digests[book_id]
+            and all(path.exists() for path in book_outputs(out_dir, book_id, book["audio"]).values())
+        )
+        if fresh:
+            entries[book_id] = cached["entry"]
+        else:
+            jobs.append((book_id, book, str(out_dir), split_audio))
+
+    if jobs:
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        if workers == 1:
+            results = list(map(build_book, jobs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(build_book, jobs))
+        for (book_id, _, _, _), (entry, elapsed, events) in zip(jobs, results):
+            merge(events)
+            entries[book_id] = entry
+            cache[book_id] = {"digest": digests[book_id], "entry": entry}
+            print(f"  📚 {book_id}: {entry['segments']} segmentos em {elapsed:.1f}s")
+
+    for book_id in set(cache) - set(books):
+        del cache[book_id]
+    write_json_atomic(cache_file, cache)
+
+    library = {
+        "version": BUILD_VERSION,
+        "books": [entries[book_id] for book_id in sorted(entries)],
+    }
+    write_json_atomic(out_dir / LIBRARY_FILE, library)
+    return library, len(jobs)
+
+
+def chapter_mismatches(library, out_dir):
+    """[(livro, esperados, detectados)] quando a tabela de capítulos não bate com o .meta.json."""
+    mismatches = []
+    for entry in library["books"]:
+        table = load_json(Path(out_dir) / f"{entry['id']}.chapters.json", [])
+        if entry["chapters"] != len(table):
+            mismatches.append((entry["id"], entry["chapters"], len(table)))
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera os artefatos de todos os livros da biblioteca")
+    parser.add_argument("--transcripts", default=str(TRANSCRIPTS_DIR), help="diretório dos JSONs do Whisper")
+    parser.add_argument("--audio", default=str(AUDIO_DIR), help="diretório dos áudios")
+    parser.add_argument("--out", default=None, help="destino dos artefatos (padrão: --transcripts)")
+    parser.add_argument("--workers", type=int, default=None, help="padrão: número de núcleos")
+    parser.add_argument("--force", action="store_true", help="ignora o cache e refaz tudo")
+    parser.add_argument("--split-audio", action="store_true", help="corta o áudio em partes por capítulo")
+    parser.add_argument("--check", action="store_true",
+                        help="falha se os capítulos detectados não baterem com o .meta.json")
+    parser.add_argument("--trace", help="grava um trace do Chrome com o tempo de cada etapa")
+    parser.add_argument("--trace-memory", action="store_true", help="com --trace: pico de memória por etapa")
+    args = parser.parse_args()
+    if args.trace:
+        enable(args.trace, memory=args.trace_memory)
+
+    started = time.monotonic()
+    with span("build_library"):
+        library, rebuilt = build_library(args.transcripts, args.audio, args.out, args.workers, args.force,
+                                          args.split_audio)
+    total = len(library["books"])
+    print(f"✅ {total} livros na biblioteca, {rebuilt} refeitos, {total - rebuilt} sem mudanças "
+          f"({time.monotonic() - started:.1f}s)")
+    mismatches = chapter_mismatches(library, args.out or args.transcripts)
+    for book_id, expected, found in mismatches:
+        print(f"⚠️ {book_id}: {found} capítulos detectados, {expected} no .meta.json")
+    if args.check and mismatches:
+        sys.exit(1)
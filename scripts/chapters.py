@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Detecção de capítulos com leitura completa de números em espanhol
+
+O marcador é "Capítulo" seguido de um número em algarismos, romano ou
+por extenso — cardinal ("veintisiete", "ciento tres", "dos mil") ou
+ordinal ("primero", "decimoséptimo", "vigésimo primero") —, em qualquer
+ponto do segmento, e não só no começo. Um segmento que é só um número
+("27.") também conta como título.
+
+Marcadores fracos — segmento que começa com "5. Cada día…" ou "lo diez.",
+quando o Whisper ouve só o fim de "Capítulo" — só valem se forem o
+capítulo seguinte ao último aceito.
+
+A tabela de capítulos (número, título, início exato, palavra, segmento)
+é calculada uma vez, no build, com os tempos do índice de palavras; o
+gerador de HTML e o leitor usam a tabela pronta.
+"""
+import json
+import re
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+from tracing import traced
+
+_FOLD = str.maketrans("áéíóúü", "aeiouu")
+_TOKEN = re.compile(r"\w+")
+_ROMAN = re.compile(r"^m{0,3}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$")
+_HEADING = re.compile(r"^\s*(\d+|[IVXLCDM]+)\s*\.?\s*$")
+_LEADING = re.compile(r"^\s*(\d+|[IVXLCDM]+)\.(?=\s+\S)")
+_PAUSE = re.compile(r"[.,;:!?]")
+
+MARKER_WORDS = ("capitulo", "capitulos")
+WEAK_MARKER_WORDS = ("lo",)  # "Capítulo diez." transcrito como "Lo diez."
+
+UNITS = {
+    "cero": 0, "un": 1, "uno": 1, "una": 1, "dos": 2, "tres": 3, "cuatro": 4,
+    "cinco": 5, "seis": 6, "siete": 7, "ocho": 8, "nueve": 9,
+}
+TEENS = {
+    "diez": 10, "once": 11, "doce": 12, "trece": 13, "catorce": 14, "quince": 15,
+    "dieciseis": 16, "diecisiete": 17, "dieciocho": 18, "diecinueve": 19, "veinte": 20,
+}
+TENS = {
+    "treinta": 30, "cuarenta": 40, "cincuenta": 50, "sesenta": 60,
+    "setenta": 70, "ochenta": 80, "noventa": 90,
+}
+HUNDREDS = {
+    "cien": 100, "ciento": 100, "doscientos": 200, "trescientos": 300,
+    "cuatrocientos": 400, "quinientos": 500, "seiscientos": 600,
+    "setecientos": 700, "ochocientos": 800, "novecientos": 900,
+}
+ORDINALS = {
+    "primero": 1, "primer": 1, "segundo": 2, "tercero": 3, "tercer": 3,
+    "cuarto": 4, "quinto": 5, "sexto": 6, "septimo": 7, "setimo": 7,
+    "octavo": 8, "noveno": 9, "nono": 9, "decimo": 10, "undecimo": 11,
+    "duodecimo": 12, "vigesimo": 20, "trigesimo": 30, "cuadragesimo": 40,
+    "quincuagesimo": 50, "sexagesimo": 60, "septuagesimo": 70,
+    "octogesimo": 80, "nonagesimo": 90, "centesimo": 100,
+    "ducentesimo": 200, "tricentesimo": 300, "cuadringentesimo": 400,
+    "quingentesimo": 500, "sexcentesimo": 600, "septingentesimo": 700,
+    "octingentesimo": 800, "noningentesimo": 900, "milesimo": 1000,
+}
+# Prefixos que se juntam à unidade: "decimotercero", "vigesimoprimero"
+_ORDINAL_TENS = ("decimo", "vigesimo", "trigesimo", "cuadragesimo", "quincuagesimo",
+                 "sexagesimo", "septuagesimo", "octogesimo", "nonagesimo")
+
+Marker = namedtuple("Marker", "start end number weak", defaults=(False,))
+
+
+def fold(word):
+    return word.lower().translate(_FOLD)
+
+
+def _masculine(word):
+    # "primera" → "primero", "vigésimas" → "vigesimo"
+    if word.endswith("as") or word.endswith("os"):
+        word = word[:-1]
+    if word.endswith("a"):
+        return word[:-1] + "o"
+    return word
+
+
+def cardinal_value(word):
+    """(valor, casa decimal) de uma palavra cardinal, ou None."""
+    if word in UNITS:
+        return UNITS[word], 1
+    if word in TEENS:
+        return TEENS[word], 10 if word == "veinte" else 1
+    if word in TENS:
+        return TENS[word], 10
+    if word in HUNDREDS:
+        return HUNDREDS[word], 100
+    if word.startswith("veinti") and word[6:] in UNITS and UNITS[word[6:]] > 0:
+        return 20 + UNITS[word[6:]], 1
+    if word.startswith("dieci") and word[5:] in UNITS and UNITS[word[5:]] > 5:
+        return 10 + UNITS[word[5:]], 1
+    if word.endswith("ientos") or word.endswith("ientas"):
+        return cardinal_value(word[:-2] + "os")
+    return None
+
+
+def ordinal_value(word):
+    """Valor de uma palavra ordinal ("decimotercera" → 13), ou None."""
+    word = _masculine(word)
+    if word in ORDINALS:
+        return ORDINALS[word]
+    for prefix in _ORDINAL_TENS:
+        rest = word[len(prefix):]
+        if word.startswith(prefix) and rest in ORDINALS and ORDINALS[rest] < 10:
+            return ORDINALS[prefix] + ORDINALS[rest]
+    return None
+
+
+def parse_cardinal(words):
+    """Lê um cardinal do início de `words`; devolve (valor, palavras usadas)."""
+    total = current = 0
+    place = None  # Menor casa já usada no grupo atual: a próxima parte tem de caber abaixo
+    used = consumed = 0
+    for i, word in enumerate(words):
+        if word == "y" and used and i + 1 < len(words):
+            continue
+        if word in ("mil",):
+            total += (current or 1) * 1000
+            current, place = 0, None
+        elif word in ("millon", "millones"):
+            total = ((total + current) or 1) * 1_000_000
+            current, place = 0, None
+        else:
+            value = cardinal_value(word)
+            if value is None or (place is not None and value[0] >= place):
+                break
+            current += value[0]
+            place = value[1]
+        used += 1
+        consumed = i + 1
+    if not used:
+        return None, 0
+    return total + current, consumed
+
+
+def parse_ordinal(words):
+    """Lê um ordinal ("vigésimo primero", "décimo séptimo"); (valor, usadas)."""
+    total = 0
+    last = None
+    consumed = 0
+    for i, word in enumerate(words):
+        value = ordinal_value(word)
+        if value is None or (last is not None and value >= last):
+            break
+        total += value
+        last = value
+        consumed = i + 1
+    return (total, consumed) if consumed else (None, 0)
+
+
+def roman_value(word):
+    word = word.lower()
+    if not word or not _ROMAN.match(word):
+        return None
+    values = {"i": 1, "v": 5, "x": 10, "l": 50, "c": 100, "d": 500, "m": 1000}
+    total = 0
+    for a, b in zip(word, word[1:] + " "):
+        v = values[a]
+        total += -v if b != " " and values[b] > v else v
+    return total
+
+
+def parse_number(words):
+    """Número em algarismos, cardinal ou ordinal por extenso; (valor, usadas)."""
+    if not words:
+        return None, 0
+    if words[0].isdigit():
+        return int(words[0]), 1
+    value, used = parse_cardinal(words)
+    if value is not None:
+        return value, used
+    return parse_ordinal(words)
+
+
+def to_roman(num):
+    numerals = [
+        (1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+        (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I"),
+    ]
+    result = ""
+    for value, symbol in numerals:
+        while num >= value:
+            result += symbol
+            num -= value
+    return result or "I"
+
+
+def chapter_title(number):
+    return f"Capítulo {to_roman(number)}"
+
+
+def find_markers(text):
+    """Marcadores "Capítulo N" em `text`: [Marker(início, fim, número, fraco)].
+
+    início/fim são posições de caractere em `text`; o fim inclui o ponto
+    logo após o número ("Capítulo 8.").
+    """
+    heading = _HEADING.match(text)
+    if heading:
+        label = heading.group(1)
+        number = int(label) if label.isdigit() else roman_value(label)
+        if number:
+            return [Marker(heading.start(1), heading.end(), number)]
+
+    markers = []
+    leading = _LEADING.match(text)
+    if leading:
+        label = leading.group(1)
+        number = int(label) if label.isdigit() else roman_value(label)
+        if number:
+            markers.append(Marker(leading.start(1), leading.end(), number, weak=True))
+
+    tokens = list(_TOKEN.finditer(text))
+    words = [fold(t.group()) for t in tokens]
+    i = 0
+    while i < len(tokens):
+        if words[i] in WEAK_MARKER_WORDS and i + 1 < len(tokens):
+            # Só número seguido de ponto: "lo diez.", "lo 22."
+            stop = i + 2
+            while stop < min(i + 8, len(tokens)):
+                if _PAUSE.search(text, tokens[stop - 1].end(), tokens[stop].start()):
+                    break
+                stop += 1
+            number, used = parse_number(words[i + 1:stop])
+            if number and used == stop - i - 1:
+                end = tokens[i + used].end()
+                if text[end:end + 1] == ".":
+                    markers.append(Marker(tokens[i].start(), end + 1, number, weak=True))
+                    i += used + 1
+                    continue
+        if words[i] in MARKER_WORDS:
+            # O número termina na primeira pontuação: "Capítulo veinte. Un día…"
+            stop = i + 2
+            while stop < min(i + 8, len(tokens)):
+                if _PAUSE.search(text, tokens[stop - 1].end(), tokens[stop].start()):
+                    break
+                stop += 1
+            number, used = parse_number(words[i + 1:stop])
+            # Romanos só em maiúsculas: "Capítulo VII", mas não "capítulo mi"
+            if not number and i + 1 < len(tokens) and tokens[i + 1].group().isupper():
+                number, used = roman_value(tokens[i + 1].group()), 1
+            if number:
+                end = tokens[i + used].end()
+                if text[end:end + 1] == ".":
+                    end += 1
+                markers.append(Marker(tokens[i].start(), end, number))
+                i += used + 1
+                continue
+        i += 1
+    return markers
+
+
+class ChapterDetector:
+    """Aceita só marcadores com número crescente ao longo do livro.
+
+    Evita que menções no texto ("como vimos no capítulo dois") ou
+    repetições do narrador virem capítulos novos. Marcadores fracos só
+    entram se forem exatamente o próximo capítulo.
+    """
+
+    def __init__(self):
+        self.last = 0
+
+    def scan(self, text):
+        accepted = []
+        for marker in find_markers(text):
+            if marker.number == self.last + 1 or (not marker.weak and marker.number > self.last):
+                accepted.append(marker)
+                self.last = marker.number
+        return accepted
+
+
+@traced("chapters.find")
+def find_chapters(segments):
+    """Capítulos sem tempos: [{number, title, segment, offset, length}].
+
+    offset/length são relativos ao texto do segmento sem espaços nas pontas.
+    """
+    detector = ChapterDetector()
+    chapters = []
+    for seg_index, segment in enumerate(segments):
+        for marker in detector.scan(segment.get("text", "").strip()):
+            chapters.append({
+                "number": marker.number,
+                "title": chapter_title(marker.number),
+                "segment": seg_index,
+                "offset": marker.start,
+                "length": marker.end - marker.start,
+            })
+    return chapters
+
+
+def chapter_table(segments):
+    """Tabela completa, com início exato e índice da primeira palavra."""
+    from word_index import build_word_index  # word_index usa este módulo
+    return build_word_index(segments)["chapters"]
+
+
+def write_chapter_table(chapters, out_file):
+    Path(out_file).write_text(json.dumps(chapters, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def default_output(json_file):
+    json_file = Path(json_file)
+    return json_file.with_name(f"{json_file.stem}.chapters.json")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 chapters.py input.json [output.chapters.json]")
+        sys.exit(1)
+
+    from segment_stream import iter_segments
+
+    in_file = Path(sys.argv[1])
+    out_file = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output(in_file)
+    chapters = chapter_table(iter_segments(in_file, fields=("start", "end", "text", "tokens", "seek")))
+    write_chapter_table(chapters, out_file)
+    print(f"✅ Tabela de capítulos gerada em {out_file}")
+    for chapter in chapters:
+        print(f"  📖 {chapter['title']:<16} {chapter['start']:8.2f}s  segmento {chapter['segment']}")
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Legendas WebVTT e SRT a partir do JSON do Whisper
+
+Os segmentos são lidos um a um (segment_stream) e viram cues de tamanho
+legível: segmentos muito curtos são juntados com o seguinte e os longos
+são partidos entre palavras, de preferência depois de pontuação. Com
+--words, cada palavra do .vtt leva o timestamp inline (<00:00:01.200>)
+calculado por word_index.time_words, o mesmo tempo do índice de palavras.
+
+Num <track> de <audio>/<video> o navegador dispara cuechange sozinho na
+troca de cue; o HTML de transcript2html usa isso com --track em vez de
+procurar a linha ativa a cada timeupdate.
+"""
+import argparse
+import math
+import os
+import re
+from pathlib import Path
+
+from segment_stream import iter_segments
+from word_index import time_words, word_weight
+
+MAX_CHARS = 84        # duas linhas de legenda
+LINE_CHARS = 42
+MAX_DURATION = 7.0
+MIN_DURATION = 1.2
+MAX_GAP = 1.0         # silêncio acima disto não é juntado num cue só
+
+_WORD = re.compile(r"\S+")
+_SENTENCE_END = (".", "?", "!", "…")
+_BREAK_AFTER = (".", "?", "!", "…", ";", ":", ",")
+
+
+def timed_words(segment):
+    """[(palavra, início, fim)] de um segmento, com o tempo do índice de palavras."""
+    words = _WORD.findall(segment.get("text", ""))
+    timings = time_words(segment, [word_weight(w) for w in words])
+    return [(w, start, end) for w, (start, end) in zip(words, timings)]
+
+
+def _chars(words):
+    return sum(len(w) for w, _, _ in words) + max(0, len(words) - 1)
+
+
+def _cut(words, max_chars, max_duration):
+    """Quantas palavras do início formam o próximo cue.
+
+    O trecho é dividido em partes de tamanho parecido (sem sobrar uma
+    palavra solta no fim), puxando o corte para depois de pontuação.
+    """
+    start = words[0][1]
+    fits = 1
+    for k in range(1, len(words) + 1):
+        if _chars(words[:k]) > max_chars or words[k - 1][2] - start > max_duration:
+            break
+        fits = k
+    total = _chars(words)
+    pieces = max(math.ceil(total / max_chars), math.ceil((words[-1][2] - start) / max_duration), 2)
+    target = total / pieces
+
+    def cost(k):
+        word = words[k - 1][0]
+        bonus = LINE_CHARS / 2 if word.endswith(_SENTENCE_END) else LINE_CHARS / 4 if word.endswith(_BREAK_AFTER) else 0
+        return abs(_chars(words[:k]) - target) - bonus
+    return min(range(1, fits + 1), key=cost)
+
+
+def iter_cues(segments, max_chars=MAX_CHARS, max_duration=MAX_DURATION,
+              min_duration=MIN_DURATION, max_gap=MAX_GAP):
+    """Cues [(início, fim, [(palavra, início, fim)])] a partir de segmentos em fluxo."""
+    pending = []
+    for segment in segments:
+        words = timed_words(segment)
+        if not words:
+            continue
+        if pending:
+            # Cue curto demais vai junto com o próximo segmento (e o conjunto é redividido)
+            merged = pending + words
+            short = pending[-1][2] - pending[0][1] < min_duration
+            fits = _chars(merged) <= max_chars and merged[-1][2] - merged[0][1] <= max_duration
+            if words[0][1] - pending[-1][2] > max_gap or not (short or fits and _chars(pending) < LINE_CHARS):
+                yield pending[0][1], pending[-1][2], pending
+                pending = []
+        pending = pending + words
+        while _chars(pending) > max_chars or pending[-1][2] - pending[0][1] > max_duration:
+            k = _cut(pending, max_chars, max_duration)
+            if k == len(pending):
+                break
+            yield pending[0][1], pending[k - 1][2], pending[:k]
+            pending = pending[k:]
+    if pending:
+        yield pending[0][1], pending[-1][2], pending
+
+
+def wrap(words, line_chars=LINE_CHARS):
+    """Divide as palavras em até duas linhas equilibradas: [[palavras], ...]."""
+    if _chars(words) <= line_chars or len(words) < 2:
+        return [words]
+    total = _chars(words)
+    best = min(range(1, len(words)), key=lambda k: abs(_chars(words[:k]) - total / 2))
+    return [words[:best], words[best:]]
+
+
+def format_time(seconds, sep="."):
+    ms = max(0, round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}{sep}{ms % 1000:03d}"
+
+
+def escape_vtt(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def vtt_text(words, start, end, inline=False):
+    """Texto do cue; com `inline`, timestamps antes de cada palavra depois da primeira."""
+    lines = []
+    last = start
+    for line in wrap(words):
+        parts = []
+        for word, word_start, _ in line:
+            if inline and (lines or parts) and last < word_start < end:
+                parts.append(f"<{format_time(word_start)}>")
+                last = word_start
+            parts.append(escape_vtt(word) + " ")
+        lines.append("".join(parts).rstrip())
+    return "\n".join(lines)
+
+
+def _span(start, end):
+    # Cue de duração zero some em alguns players
+    return start, max(end, start + 0.01)
+
+
+def write_vtt(cues, out_file, inline=False):
+    """Grava cues (início, fim, palavras[, id]) em WebVTT; devolve quantos."""
+    out_file = Path(out_file)
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("WEBVTT\n")
+        for cue in cues:
+            start, end = _span(cue[0], cue[1])
+            f.write("\n")
+            if len(cue) > 3:
+                f.write(f"{cue[3]}\n")
+            f.write(f"{format_time(start)} --> {format_time(end)}\n")
+            f.write(vtt_text(cue[2], start, end, inline) + "\n")
+            count += 1
+    os.replace(tmp, out_file)
+    return count
+
+
+def write_srt(cues, out_file):
+    out_file = Path(out_file)
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for cue in cues:
+            start, end = _span(cue[0], cue[1])
+            count += 1
+            text = "\n".join(" ".join(w for w, _, _ in line) for line in wrap(cue[2]))
+            f.write(f"{count}\n{format_time(start, ',')} --> {format_time(end, ',')}\n{text}\n\n")
+    os.replace(tmp, out_file)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exporta legendas WebVTT/SRT de um JSON do Whisper")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?", help="padrão: <input>.vtt")
+    parser.add_argument("--srt", action="store_true", help="grava também o .srt ao lado do .vtt")
+    parser.add_argument("--words", action="store_true", help="timestamps por palavra no .vtt")
+    parser.add_argument("--max-chars", type=int, default=MAX_CHARS)
+    parser.add_argument("--max-duration", type=float, default=MAX_DURATION)
+    parser.add_argument("--min-duration", type=float, default=MIN_DURATION)
+    args = parser.parse_args()
+
+    in_file = Path(args.input)
+    out_file = Path(args.output) if args.output else in_file.with_suffix(".vtt")
+
+    def cues():
+        segments = iter_segments(in_file, fields=("start", "end", "text", "tokens", "seek"))
+        return iter_cues(segments, args.max_chars, args.max_duration, args.min_duration)
+
+    if out_file.suffix.lower() == ".srt":
+        print(f"✅ {write_srt(cues(), out_file)} cues em {out_file}")
+    else:
+        print(f"✅ {write_vtt(cues(), out_file, inline=args.words)} cues em {out_file}")
+        if args.srt:
+            srt_file = out_file.with_suffix(".srt")
+            print(f"✅ {write_srt(cues(), srt_file)} cues em {srt_file}")
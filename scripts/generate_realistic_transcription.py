@@ -3,8 +3,13 @@
 Script para gerar transcrição realista do El Principito com timestamps
 baseados na duração real do áudio (6150 segundos / 1:42:30)
 """
+import argparse
 import json
+import os
 import re
+from pathlib import Path
+
+import numpy as np
 
 # Duração real do áudio em segundos
 TOTAL_DURATION = 6150  # 1h42m30s
@@ -120,46 +125,144 @@ CHAPTERS = [
     # Continuar com mais capítulos...
 ]
 
-def calculate_timestamps(chapters, total_duration):
+# Modelo nominal de narração, reescalado por capítulo para bater com as âncoras
+READING_SPEED = 12  # caracteres por segundo (velocidade normal de narração)
+MIN_SENTENCE = 2.0
+SENTENCE_PAUSE = 0.5
+TITLE_DURATION = 3.0
+
+
+def book_arrays(chapters):
+    """Textos do livro inteiro e arrays paralelos (comprimento, capítulo, é título)."""
+    texts, chapter_ids, titles = [], [], []
+    for c, chapter in enumerate(chapters):
+        texts.append(chapter["title"])
+        chapter_ids.append(c)
+        titles.append(True)
+        texts.extend(chapter["text"])
+        chapter_ids.extend([c] * len(chapter["text"]))
+        titles.extend([False] * len(chapter["text"]))
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.float64, count=len(texts))
+    return texts, lengths, np.array(chapter_ids, dtype=np.intp), np.array(titles, dtype=bool)
+
+
+def chapter_budgets(nominal, total_duration, chapter_starts=None):
+    """Início de cada capítulo, respeitando as âncoras conhecidas.
+
+    chapter_starts: lista (ou dict índice → segundos) com o início conhecido
+    de alguns capítulos; os demais dividem o tempo entre as âncoras vizinhas
+    na proporção da sua duração nominal.
+    """
+    n = len(nominal)
+    known = [None] * n
+    if isinstance(chapter_starts, dict):
+        for c, t in chapter_starts.items():
+            known[c] = t
+    elif chapter_starts is not None:
+        known[:len(chapter_starts)] = chapter_starts[:n]
+    if known[0] is None:
+        known[0] = 0.0
+
+    starts = np.empty(n + 1)
+    anchors = [c for c in range(n) if known[c] is not None] + [n]
+    starts[n] = total_duration
+    for a, b in zip(anchors, anchors[1:]):
+        t0 = known[a]
+        t1 = total_duration if b == n else known[b]
+        if t1 <= t0:
+            raise ValueError(f"Âncora do capítulo {b + 1} ({t1}s) não é posterior à do capítulo {a + 1} ({t0}s)")
+        share = nominal[a:b] / nominal[a:b].sum()
+        starts[a:b] = t0 + (t1 - t0) * np.concatenate(([0.0], np.cumsum(share)[:-1]))
+    return starts
+
+
+def fit_timings(lengths, chapter_ids, titles, total_duration, chapter_starts=None):
+    """Início e fim de cada segmento ajustados às âncoras.
+
+    Cada capítulo tem seu fator de escala: fala e pausas são esticadas ou
+    comprimidas juntas até o capítulo ocupar exatamente o intervalo entre
+    suas âncoras; o título mantém TITLE_DURATION. Devolve (starts, ends, rates).
+    """
+    duration = np.where(titles, TITLE_DURATION, np.maximum(MIN_SENTENCE, lengths / READING_SPEED))
+    pause = np.where(titles, 0.0, SENTENCE_PAUSE)
+    pause[-1] = 0.0  # O livro termina no fim da última frase
+
+    n_chapters = int(chapter_ids[-1]) + 1
+    nominal = np.bincount(chapter_ids, weights=duration + pause, minlength=n_chapters)
+    bounds = chapter_budgets(nominal, total_duration, chapter_starts)
+    fixed = np.bincount(chapter_ids, weights=np.where(titles, duration, 0.0), minlength=n_chapters)
+    budget = np.diff(bounds) - fixed
+    if (budget < 0).any():
+        c = int(np.flatnonzero(budget < 0)[0])
+        raise ValueError(f"Capítulo {c + 1} tem {np.diff(bounds)[c]:.1f}s, menos que o título ({fixed[c]:.1f}s)")
+    flexible = nominal - fixed
+    scale = np.divide(budget, flexible, out=np.zeros(n_chapters), where=flexible > 0)
+
+    duration = np.where(titles, duration, duration * scale[chapter_ids])
+    pause *= scale[chapter_ids]
+    step = duration + pause
+
+    # Soma acumulada dentro de cada capítulo, a partir da âncora do capítulo
+    elapsed = np.cumsum(step) - step
+    first = np.flatnonzero(np.r_[True, chapter_ids[1:] != chapter_ids[:-1]])
+    starts = bounds[chapter_ids] + elapsed - elapsed[first][chapter_ids]
+    ends = starts + duration
+    ends[-1] = total_duration
+
+    speech = np.bincount(chapter_ids, weights=np.where(titles, 0.0, duration), minlength=n_chapters)
+    chars = np.bincount(chapter_ids, weights=np.where(titles, 0.0, lengths), minlength=n_chapters)
+    rates = np.divide(chars, speech, out=np.zeros(n_chapters), where=speech > 0)
+    return starts, ends, rates
+
+
+def calculate_timestamps(chapters, total_duration, chapter_starts=None):
     """Calcula timestamps realistas baseado no texto e duração total"""
-    segments = []
-    total_chars = sum(sum(len(sentence) for sentence in chapter["text"]) for chapter in chapters)
-    
-    current_time = 0
-    
-    for chapter in chapters:
-        chapter_chars = sum(len(sentence) for sentence in chapter["text"])
-        chapter_duration = (chapter_chars / total_chars) * total_duration
-        
-        # Adicionar título do capítulo
-        segments.append({
-            "id": len(segments),
-            "start": current_time,
-            "end": current_time + 3,
-            "text": chapter["title"]
-        })
-        current_time += 3
-        
-        # Calcular tempo por frase
-        for sentence in chapter["text"]:
-            # Tempo baseado no comprimento da frase (caracteres / velocidade de leitura)
-            reading_speed = 12  # caracteres por segundo (velocidade normal de narração)
-            sentence_duration = max(2, len(sentence) / reading_speed)
-            
-            segments.append({
-                "id": len(segments),
-                "start": current_time,
-                "end": current_time + sentence_duration,
-                "text": sentence
-            })
-            
-            current_time += sentence_duration + 0.5  # Pausa entre frases
-    
-    return segments
+    texts, lengths, chapter_ids, titles = book_arrays(chapters)
+    starts, ends, _ = fit_timings(lengths, chapter_ids, titles, total_duration, chapter_starts)
+    return [
+        {"id": i, "start": round(float(a), 3), "end": round(float(b), 3), "text": text}
+        for i, (a, b, text) in enumerate(zip(starts, ends, texts))
+    ]
+
 
-def generate_transcription():
+def synthetic_book(rng, sentences, n_chapters, sentences_per_chapter):
+    """Livro sintético com frases sorteadas do texto real."""
+    counts = rng.poisson(sentences_per_chapter, n_chapters).clip(1)
+    picks = rng.integers(0, len(sentences), counts.sum())
+    bounds = np.r_[0, np.cumsum(counts)]
+    return [
+        {"title": f"Capítulo {c + 1}", "text": [sentences[i] for i in picks[bounds[c]:bounds[c + 1]]]}
+        for c in range(n_chapters)
+    ]
+
+
+def generate_batch(count, out_dir, seed=0, min_duration=1800, max_duration=4 * 3600):
+    """Gera `count` transcrições sintéticas para testes de carga do leitor."""
+    rng = np.random.default_rng(seed)
+    sentences = [sentence for chapter in CHAPTERS for sentence in chapter["text"]]
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    durations = rng.uniform(min_duration, max_duration, count)
+    for n, total in enumerate(durations):
+        # ~13 caracteres/s de narração, em capítulos de 10 a 20 minutos
+        n_chapters = max(1, int(total / rng.uniform(600, 1200)))
+        per_chapter = total * READING_SPEED / (n_chapters * np.mean([len(s) for s in sentences]) * 1.1)
+        chapters = synthetic_book(rng, sentences, n_chapters, per_chapter)
+        segments = calculate_timestamps(chapters, round(float(total), 1))
+        transcription = {
+            "text": " ".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": "es",
+        }
+        with open(out_dir / f"book-{n + 1:04d}.json", "w", encoding="utf-8") as f:
+            json.dump(transcription, f, ensure_ascii=False, separators=(",", ":"))
+    return count
+
+
+def generate_transcription(chapter_starts=None):
     """Gera arquivo JSON com transcrição realista"""
-    segments = calculate_timestamps(CHAPTERS, TOTAL_DURATION)
+    segments = calculate_timestamps(CHAPTERS, TOTAL_DURATION, chapter_starts)
     
     transcription = {
         "text": " ".join([segment["text"] for segment in segments]),
@@ -171,11 +274,42 @@ def generate_transcription():
         json.dump(transcription, f, ensure_ascii=False, indent=2)
     
     print(f"✅ Transcrição gerada com {len(segments)} segmentos")
-    print(f"📖 Duração total: {current_time:.1f} segundos")
+    print(f"📖 Duração total: {segments[-1]['end']:.1f} segundos")
     
     return transcription
 
 if __name__ == "__main__":
-    import os
-    os.makedirs("transcriptions", exist_ok=True)
-    generate_transcription()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gera transcrições com timestamps ajustados à duração do áudio")
+    parser.add_argument("--chapter-start", action="append", default=[], metavar="N=SEGUNDOS",
+                        help="início conhecido do capítulo N (pode repetir)")
+    parser.add_argument("--batch", type=int, help="gera N livros sintéticos para teste de carga")
+    parser.add_argument("--out-dir", default="transcriptions/synthetic")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.batch:
+        generate_batch(args.batch, args.out_dir, args.seed)
+        print(f"✅ {args.batch} transcrições sintéticas em {args.out_dir}")
+    else:
+        starts = {}
+        for item in args.chapter_start:
+            number, _, seconds = item.partition("=")
+            try:
+                number, seconds = int(number), float(seconds)
+            except ValueError:
+                parser.error(f"--chapter-start espera N=SEGUNDOS, não {item!r}")
+            if not 1 <= number <= len(CHAPTERS):
+                parser.error(f"--chapter-start: capítulo {number} fora de 1..{len(CHAPTERS)}")
+            if not 0 <= seconds < TOTAL_DURATION:
+                parser.error(f"--chapter-start: {seconds}s fora de 0..{TOTAL_DURATION}s")
+            starts[number - 1] = seconds
+        anchors = sorted(starts.items())
+        for (a, t0), (b, t1) in zip(anchors, anchors[1:]):
+            if t1 <= t0:
+                parser.error(f"--chapter-start: capítulo {b + 1} ({t1}s) precisa começar depois "
+                             f"do capítulo {a + 1} ({t0}s)")
+        os.makedirs("transcriptions", exist_ok=True)
+        try:
+            generate_transcription(starts or None)
+        except ValueError as error:
+            parser.error(str(error))
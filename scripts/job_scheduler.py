@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Fila de transcrições (livro × modelo) executada sem supervisão
+
+Substitui o ciclo manual "inicia o Whisper, roda o monitor_*.py do modelo":
+a fila persistente em transcriptions/.jobs.json guarda um job por par
+(livro, modelo) e o `run` lança os transcritores como subprocessos com
+asyncio, quantos couberem nos núcleos e no orçamento de memória.
+
+- Modelo barato primeiro: todos os tiny do catálogo, depois base, depois
+  small. Os modelos de um mesmo livro rodam em ordem, então a versão
+  publicada só melhora.
+- Progresso lido do stdout do transcritor ("[00:01.000 --> 00:05.000]")
+  e registrado com whisper_progress (JSONL e throughput por modelo).
+- Falhas voltam para a fila com espera crescente, até MAX_ATTEMPTS.
+- Cada resultado substitui transcriptions/<livro>.json com rename atômico
+  (os monitores continuam funcionando) e vira versão no TranscriptStore
+  com as refs <modelo> e current.
+
+O transcritor "stub" finge ser o Whisper (linhas de progresso e JSON de
+saída) para testar a fila offline.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from transcript_store import TranscriptStore
+from whisper_progress import ProgressTracker, parse_stdout_end, probe_duration
+
+MODELS = ("tiny", "base", "small", "medium", "large")
+# Memória aproximada de cada modelo do Whisper (README do openai-whisper)
+MODEL_MEMORY_MB = {"tiny": 1000, "base": 1000, "small": 2000, "medium": 5000, "large": 10000}
+DEFAULT_MODELS = ("tiny", "base", "small")
+
+QUEUE_FILE = Path("transcriptions/.jobs.json")
+WORK_DIR = Path("transcriptions/.jobs")
+PROGRESS_FILE = Path("transcriptions/.jobs-progress.jsonl")
+TRANSCRIPTS_DIR = Path("transcriptions")
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 30.0    # segundos antes da 2ª tentativa; dobra a cada falha
+STUB_DURATION = 60.0
+
+
+def available_memory_mb():
+    """MemAvailable do kernel (ou a memória física toda fora do Linux)."""
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError):
+        return 4096
+
+
+def model_rank(model):
+    return MODELS.index(model) if model in MODELS else len(MODELS)
+
+
+class JobQueue:
+    """Jobs persistidos em JSON; cada mudança de estado é gravada na hora."""
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = Path(path)
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {"jobs": []}
+        self.jobs = data["jobs"]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"jobs": self.jobs}, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def find(self, book, model):
+        return next((j for j in self.jobs if j["book"] == book and j["model"] == model), None)
+
+    def add(self, book, audio, model, duration=None):
+        """Enfileira (livro, modelo); devolve o job ou None se já existe."""
+        if self.find(book, model):
+            return None
+        job = {
+            "id": f"{book}:{model}",
+            "book": book,
+            "model": model,
+            "audio": str(audio),
+            "duration": duration,
+            "status": "pending",
+            "attempts": 0,
+            "not_before": 0,
+            "added": round(time.time(), 3),
+            "started": None,
+            "finished": None,
+            "error": None,
+            "version": None,
+        }
+        self.jobs.append(job)
+        return job
+
+    def recover(self):
+        """Jobs que ficaram "running" numa execução interrompida voltam à fila."""
+        stale = [j for j in self.jobs if j["status"] == "running"]
+        for job in stale:
+            job["status"] = "pending"
+        return len(stale)
+
+    def retry_failed(self):
+        failed = [j for j in self.jobs if j["status"] == "failed"]
+        for job in failed:
+            job.update(status="pending", attempts=0, not_before=0, error=None)
+        return len(failed)
+
+    def ordered(self):
+        """Modelo mais barato primeiro; dentro do modelo, ordem de chegada."""
+        return sorted(self.jobs, key=lambda j: (model_rank(j["model"]), j["added"]))
+
+
+def whisper_command(job, out_dir, threads, language):
+    return [
+        "whisper", job["audio"], "--model", job["model"], "--language", language,
+        "--output_format", "json", "--output_dir", str(out_dir),
+        "--threads", str(threads), "--verbose", "True",
+    ]
+
+
+def stub_command(job, out_dir, threads, language):
+    return [
+        sys.executable, str(Path(__file__).resolve()), "stub", job["audio"], str(out_dir),
+        "--duration", str(job["duration"] or STUB_DURATION),
+    ]
+
+
+TRANSCRIBERS = {"whisper": whisper_command, "stub": stub_command}
+
+
+class Scheduler:
+    """Roda a fila até não sobrar job pendente, dentro dos limites da máquina."""
+
+    def __init__(self, queue, transcriber="whisper", cores=None, memory_mb=None, threads=2,
+                 language="es", max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY,
+                 transcripts_dir=TRANSCRIPTS_DIR, store=None):
+        self.queue = queue
+        self.transcriber = transcriber
+        self.command = TRANSCRIBERS[transcriber]
+        self.cores = cores or os.cpu_count() or 1
+        self.memory_mb = memory_mb or int(available_memory_mb() * 0.8)
+        self.threads = max(1, min(threads, self.cores))
+        self.language = language
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.transcripts_dir = Path(transcripts_dir)
+        self.store = store or TranscriptStore()
+        self.running = {}   # id do job -> asyncio.Task
+        self.used_cores = 0
+        self.used_memory = 0
+        self.wakeup = asyncio.Event()
+        self.progress_log = None
+
+    def _memory(self, job):
+        return MODEL_MEMORY_MB.get(job["model"], MODEL_MEMORY_MB["small"])
+
+    def _fits(self, job):
+        if not self.running:
+            return True  # um job maior que o orçamento roda sozinho
+        return (self.used_cores + self.threads <= self.cores
+                and self.used_memory + self._memory(job) <= self.memory_mb)
+
+    def ready(self, now):
+        """Jobs pendentes que já podem começar, na ordem da fila."""
+        books_busy = {self.queue_job(job_id)["book"] for job_id in self.running}
+        waiting = {}  # livro -> menor modelo ainda não concluído
+        for job in self.queue.jobs:
+            if job["status"] in ("pending", "running"):
+                rank = model_rank(job["model"])
+                waiting[job["book"]] = min(waiting.get(job["book"], rank), rank)
+        return [
+            job for job in self.queue.ordered()
+            if job["status"] == "pending" and job["not_before"] <= now
+            and job["book"] not in books_busy
+            and model_rank(job["model"]) == waiting[job["book"]]
+        ]
+
+    def queue_job(self, job_id):
+        return next(j for j in self.queue.jobs if j["id"] == job_id)
+
+    async def run(self):
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"♻️ {recovered} jobs interrompidos voltaram para a fila")
+        self.queue.save()
+        print(f"🧮 Limites: {self.cores} núcleos ({self.threads} por job), {self.memory_mb} MB de memória")
+
+        PROGRESS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        self.progress_log = open(PROGRESS_FILE, "a", encoding="utf-8")
+        try:
+            while True:
+                now = time.time()
+                for job in self.ready(now):
+                    if not self._fits(job):
+                        continue
+                    self._start(job)
+
+                pending = [j for j in self.queue.jobs if j["status"] == "pending"]
+                if not pending and not self.running:
+                    break
+                # Dorme até um job terminar ou a próxima nova tentativa vencer
+                timeout = None
+                retries = [j["not_before"] for j in pending if j["not_before"] > now]
+                if retries:
+                    timeout = max(0.0, min(retries) - now)
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self.running.values()):
+                task.cancel()
+            if self.running:
+                await asyncio.gather(*self.running.values(), return_exceptions=True)
+            self.progress_log.close()
+            self.queue.save()
+
+        done = sum(j["status"] == "done" for j in self.queue.jobs)
+        failed = sum(j["status"] == "failed" for j in self.queue.jobs)
+        print(f"✅ Fila concluída: {done} prontos, {failed} com falha")
+        return failed == 0
+
+    def _start(self, job):
+        job.update(status="running", started=round(time.time(), 3), error=None)
+        job["attempts"] += 1
+        self.queue.save()
+        self.used_cores += self.threads
+        self.used_memory += self._memory(job)
+        self.running[job["id"]] = asyncio.create_task(self._run_job(job))
+        print(f"🚀 {job['id']} (tentativa {job['attempts']}/{self.max_attempts})")
+
+    async def _run_job(self, job):
+        started = time.monotonic()
+        try:
+            version = await self._transcribe(job)
+        except asyncio.CancelledError:
+            job["status"] = "pending"
+            job["attempts"] -= 1
+            raise
+        except Exception as exc:
+            job["error"] = str(exc) or type(exc).__name__
+            if job["attempts"] >= self.max_attempts:
+                job.update(status="failed", finished=round(time.time(), 3))
+                print(f"❌ {job['id']}: {job['error']} (desistindo)")
+            else:
+                delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                job.update(status="pending", not_before=round(time.time() + delay, 3))
+                print(f"⚠️ {job['id']}: {job['error']} (nova tentativa em {delay:.0f}s)")
+        else:
+            job.update(status="done", finished=round(time.time(), 3), version=version)
+            print(f"✅ {job['id']} em {time.monotonic() - started:.1f}s → versão {version[:12]}")
+        finally:
+            self.used_cores -= self.threads
+            self.used_memory -= self._memory(job)
+            del self.running[job["id"]]
+            self.queue.save()
+            self.wakeup.set()
+
+    async def _transcribe(self, job):
+        """Roda o transcritor, acompanha o stdout e publica o resultado."""
+        out_dir = WORK_DIR / f"{job['book']}-{job['model']}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        output = out_dir / f"{Path(job['audio']).stem}.json"
+        output.unlink(missing_ok=True)
+
+        process = await asyncio.create_subprocess_exec(
+            *self.command(job, out_dir, self.threads, self.language),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+        tracker = None
+        if job["duration"]:
+            tracker = ProgressTracker(job["model"], job["duration"], job["book"], jsonl=self.progress_log)
+        shown = 0
+        tail = []
+        try:
+            async for raw in process.stdout:
+                line = raw.decode("utf-8", "replace").rstrip()
+                tail = (tail + [line])[-5:]
+                end = parse_stdout_end(line)
+                if end is None or tracker is None:
+                    continue
+                sample = tracker.update(end)
+                # Uma linha no terminal a cada 10%; o JSONL recebe todas as amostras
+                if sample and sample["percent"] >= shown + 10:
+                    shown = math.floor(sample["percent"] / 10) * 10
+                    eta = f", ETA {sample['eta']:.0f}s" if sample["eta"] is not None else ""
+                    print(f"  📈 {job['id']}: {sample['percent']:.0f}% ({sample['rtf']}x tempo real{eta})")
+            code = await process.wait()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.terminate()
+                await process.wait()
+            raise
+
+        if code != 0:
+            raise RuntimeError(f"transcritor saiu com código {code}: {' | '.join(tail[-2:])}")
+        if not output.exists():
+            raise RuntimeError(f"transcritor não gravou {output}")
+        # O stub não mede nada real: não entra no histórico de throughput
+        if tracker and self.transcriber != "stub":
+            tracker.finish()
+        return await asyncio.to_thread(self._publish, job, output)
+
+    def _publish(self, job, output):
+        message = f"job_scheduler {job['model']}"
+        better = [
+            j for j in self.queue.jobs
+            if j["book"] == job["book"] and j["status"] == "done" and model_rank(j["model"]) > model_rank(job["model"])
+        ]
+        if better:
+            # Um modelo maior já publicou este livro (job refeito com retry): só guarda a versão
+            digest = self.store.save(job["book"], output, (job["model"],), message)
+            output.unlink()
+            return digest
+        target = self.transcripts_dir / f"{job['book']}.json"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(output, target)
+        return self.store.save(job["book"], target, (job["model"], "current"), message)
+
+
+def run_stub(audio, out_dir, duration, step=4.0, delay=0.02, fail_rate=0.0):
+    """Transcritor falso: imprime linhas de progresso como o Whisper e grava o JSON."""
+    rng = random.Random()
+    segments = []
+    t = 0.0
+    while t < duration:
+        end = min(duration, t + step)
+        text = f" Frase {len(segments)} del libro."
+        print(f"[{int(t // 60):02d}:{t % 60:06.3f} --> {int(end // 60):02d}:{end % 60:06.3f}]{text}", flush=True)
+        segments.append({
+            "id": len(segments), "seek": int(t * 100), "start": round(t, 2), "end": round(end, 2),
+            "text": text, "tokens": [], "temperature": 0.0, "avg_logprob": -0.3,
+            "compression_ratio": 1.4, "no_speech_prob": 0.01,
+        })
+        t = end
+        time.sleep(delay)
+        if rng.random() < fail_rate / max(1, duration / step):
+            print("RuntimeError: falha simulada do stub", flush=True)
+            sys.exit(1)
+    out_file = Path(out_dir) / f"{Path(audio).stem}.json"
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    tmp.write_text(json.dumps({
+        "text": "".join(s["text"] for s in segments), "segments": segments, "language": "es",
+    }, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, out_file)
+
+
+def print_status(queue):
+    icons = {"pending": "⏳", "running": "🏃", "done": "✅", "failed": "❌"}
+    now = time.time()
+    for job in queue.ordered():
+        extra = ""
+        if job["status"] == "pending" and job["not_before"] > now:
+            extra = f" (nova tentativa em {job['not_before'] - now:.0f}s)"
+        elif job["status"] == "done":
+            extra = f" ({job['finished'] - job['started']:.0f}s, versão {job['version'][:12]})"
+        elif job["error"]:
+            extra = f" ({job['error']})"
+        print(f"  {icons[job['status']]} {job['id']:<32} tentativas {job['attempts']}{extra}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fila de transcrições executada com asyncio")
+    parser.add_argument("--queue", default=str(QUEUE_FILE))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add", help="enfileira livros (um job por modelo)")
+    p.add_argument("audio", nargs="+", help="arquivos de áudio; o livro é o nome do arquivo")
+    p.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS), choices=MODELS)
+    p.add_argument("--book", help="id do livro (só com um áudio)")
+    p.add_argument("--duration", type=float, help="duração em segundos (padrão: ffprobe)")
+
+    sub.add_parser("status", help="mostra a fila")
+    sub.add_parser("retry", help="devolve os jobs com falha para a fila")
+
+    p = sub.add_parser("run", help="executa a fila até o fim")
+    p.add_argument("--transcriber", default="whisper", choices=sorted(TRANSCRIBERS))
+    p.add_argument("--cores", type=int, default=None, help="padrão: número de núcleos")
+    p.add_argument("--threads", type=int, default=2, help="núcleos por transcrição")
+    p.add_argument("--memory", type=int, default=None, help="orçamento em MB (padrão: 80%% da memória livre)")
+    p.add_argument("--language", default="es")
+    p.add_argument("--attempts", type=int, default=MAX_ATTEMPTS)
+    p.add_argument("--retry-delay", type=float, default=RETRY_DELAY)
+
+    p = sub.add_parser("stub", help="transcritor falso (usado por --transcriber stub)")
+    p.add_argument("audio")
+    p.add_argument("out_dir")
+    p.add_argument("--duration", type=float, default=STUB_DURATION)
+    p.add_argument("--fail-rate", type=float, default=float(os.environ.get("STUB_FAIL_RATE", 0)),
+                   help="probabilidade de falhar no meio (padrão: $STUB_FAIL_RATE)")
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        run_stub(args.audio, args.out_dir, args.duration, fail_rate=args.fail_rate)
+        sys.exit(0)
+
+    queue = JobQueue(args.queue)
+    if args.command == "add":
+        if args.book and len(args.audio) > 1:
+            parser.error("--book só vale com um único áudio")
+        added = 0
+        for audio in args.audio:
+            book = args.book or Path(audio).stem
+            duration = args.duration or probe_duration(audio)
+            for model in args.models:
+                if queue.add(book, audio, model, duration):
+                    added += 1
+        queue.save()
+        print(f"📥 {added} jobs adicionados ({len(queue.jobs)} na fila)")
+    elif args.command == "status":
+        print_status(queue)
+    elif args.command == "retry":
+        print(f"♻️ {queue.retry_failed()} jobs com falha voltaram para a fila")
+        queue.save()
+    else:
+        scheduler = Scheduler(
+            queue, args.transcriber, args.cores, args.memory, args.threads, args.language,
+            args.attempts, args.retry_delay,
+        )
+        try:
+            ok = asyncio.run(scheduler.run())
+        except KeyboardInterrupt:
+            print("\n⏹️ Interrompido: jobs em andamento voltaram para a fila")
+            sys.exit(130)
+        sys.exit(0 if ok else 1)
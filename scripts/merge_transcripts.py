@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Fusão de várias versões de uma transcrição (tiny/base/small...) por confiança
+
+1. Alinhamento por texto: as palavras de cada versão são alinhadas às da
+   primeira com programação dinâmica em banda, O(n·k) em vez de O(n²). O
+   tempo só centra a banda — a linha da palavra i da referência cobre as
+   palavras da outra versão ditas perto do mesmo instante.
+2. "Âncoras" são fins de segmento da referência cuja última palavra casou,
+   em todas as versões, com a última palavra de um segmento. Entre duas
+   âncoras cada versão contribui com seus segmentos (uma "hipótese").
+3. Cada região fica com a hipótese de melhor pontuação, derivada de
+   avg_logprob, no_speech_prob e compression_ratio.
+
+Regiões com pontuação baixa ou pouca concordância entre as versões vão
+para o relatório — são elas que merecem o modelo caro.
+"""
+import argparse
+import json
+import re
+from pathlib import Path
+
+from segment_stream import iter_segments
+
+ALIGN_BAND = 16  # palavras de folga em torno do centro dado pelo tempo
+LOW_SCORE = -0.8
+LOW_AGREEMENT = 0.6
+COMPRESSION_LIMIT = 2.4
+COMPRESSION_PENALTY = 1.0
+NO_SPEECH_WEIGHT = 0.5
+MISSING_LOGPROB = -1.0
+
+FIELDS = ("start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio")
+
+_WORD = re.compile(r"\w+")
+
+
+def segment_score(seg):
+    """Pontuação de um segmento: maior é melhor (escala de avg_logprob)."""
+    score = seg.get("avg_logprob", MISSING_LOGPROB)
+    if seg.get("compression_ratio", 0) > COMPRESSION_LIMIT:
+        score -= COMPRESSION_PENALTY  # Texto repetitivo: provável loop do decoder
+    score -= NO_SPEECH_WEIGHT * seg.get("no_speech_prob", 0)
+    return score
+
+
+def group_score(segments):
+    """Média das pontuações ponderada pela duração dos segmentos."""
+    if not segments:
+        return float("-inf")
+    total = sum(max(s["end"] - s["start"], 0.01) for s in segments)
+    return sum(segment_score(s) * max(s["end"] - s["start"], 0.01) for s in segments) / total
+
+
+def banded_edit_distance(a, b, band=8):
+    """Distância de edição entre sequências restrita a |i - j| <= banda.
+
+    Se os tamanhos diferem mais que a banda, a região conta como uma
+    substituição inteira (max(n, m)) em vez de alargar a banda.
+    """
+    n, m = len(a), len(b)
+    if abs(n - m) > band:
+        return max(n, m)
+    inf = n + m + 1
+    prev = {j: j for j in range(0, min(m, band) + 1)}
+    for i in range(1, n + 1):
+        cur = {}
+        for j in range(max(0, i - band), min(m, i + band) + 1):
+            if j == 0:
+                cur[j] = i
+                continue
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(
+                prev.get(j - 1, inf) + cost,
+                prev.get(j, inf) + 1,
+                cur.get(j - 1, inf) + 1,
+            )
+        prev = cur
+    return prev.get(m, inf)
+
+
+def agreement(texts):
+    """Concordância média (0..1) de cada hipótese com a primeira não vazia."""
+    words = [_WORD.findall(t.lower()) for t in texts]
+    ref = next((w for w in words if w), None)
+    if ref is None:
+        return 1.0
+    ratios = []
+    for w in words:
+        longest = max(len(ref), len(w))
+        ratios.append(1 - banded_edit_distance(ref, w) / longest if longest else 1.0)
+    return sum(ratios) / len(ratios)
+
+
+def timed_words(segments):
+    """Palavras normalizadas de uma versão: (palavras, segmento, tempo, é a última do segmento)."""
+    words, seg_ids, times, last = [], [], [], []
+    for k, seg in enumerate(segments):
+        found = _WORD.findall(seg.get("text", "").lower())
+        span = seg["end"] - seg["start"]
+        for w, word in enumerate(found):
+            words.append(word)
+            seg_ids.append(k)
+            times.append(seg["start"] + span * (w + 0.5) / len(found))
+            last.append(w == len(found) - 1)
+    return words, seg_ids, times, last
+
+
+def band_centers(times_a, times_b):
+    """Para cada prefixo a[:i], quantas palavras de b já tinham sido ditas (varredura linear)."""
+    centers = [0]
+    j = 0
+    for t in times_a:
+        while j < len(times_b) and times_b[j] <= t:
+            j += 1
+        centers.append(j)
+    centers[-1] = len(times_b)
+    return centers
+
+
+def banded_align(a, b, centers, band=ALIGN_BAND):
+    """Alinha as sequências a e b dentro da banda; devolve {i: j} das palavras iguais.
+
+    A linha i cobre de centers[i-1] - band a centers[i] + band: um trecho
+    inserido em b (mesmo longo) cabe na linha em que o tempo salta sobre ele.
+    """
+    n, m = len(a), len(b)
+    inf = n + m + 1
+    windows, costs, moves = [], [], []
+    for i in range(n + 1):
+        low = max(0, min(centers[i], centers[max(i - 1, 0)]) - band)
+        high = min(m, max(centers[i], centers[max(i - 1, 0)]) + band)
+        if i == n:
+            high = m
+        cost = [inf] * (high - low + 1)
+        move = bytearray(high - low + 1)  # 0 diagonal, 1 vem de cima, 2 vem da esquerda
+        if i:
+            plow, prev = windows[-1][0], costs[-1]
+            phigh = plow + len(prev) - 1
+        for j in range(low, high + 1):
+            k = j - low
+            if i == 0:
+                cost[k], move[k] = j, 2
+                continue
+            best, step = inf, 0
+            if plow <= j - 1 <= phigh:
+                best = prev[j - 1 - plow] + (a[i - 1] != b[j - 1])
+            if plow <= j <= phigh and prev[j - plow] + 1 < best:
+                best, step = prev[j - plow] + 1, 1
+            if k and cost[k - 1] + 1 < best:
+                best, step = cost[k - 1] + 1, 2
+            if j == 0 and i < best:
+                best, step = i, 1
+            cost[k], move[k] = best, step
+        windows.append((low, high))
+        costs.append(cost)
+        moves.append(move)
+
+    matches = {}
+    i, j = n, m
+    if costs[n][m - windows[n][0]] >= inf:
+        return matches  # Caminho saiu da banda: sem âncoras desta versão
+    while i > 0 and j > 0:
+        step = moves[i][j - windows[i][0]]
+        if step == 0:
+            if a[i - 1] == b[j - 1]:
+                matches[i - 1] = j - 1
+            i, j = i - 1, j - 1
+        elif step == 1:
+            i -= 1
+        else:
+            j -= 1
+    return matches
+
+
+def find_anchors(versions, band=ALIGN_BAND):
+    """Cortes em que todas as versões concordam no texto: [(segmento de cada versão)].
+
+    Um corte é o fim de um segmento da referência cuja última palavra foi
+    alinhada, em todas as versões, à última palavra de um segmento.
+    """
+    ref = timed_words(versions[0])
+    others = [timed_words(segs) for segs in versions[1:]]
+    alignments = [banded_align(ref[0], words[0], band_centers(ref[2], words[2]), band) for words in others]
+
+    anchors = []
+    for i, is_last in enumerate(ref[3]):
+        if not is_last:
+            continue
+        cut = [ref[1][i]]
+        for words, matches in zip(others, alignments):
+            j = matches.get(i)
+            if j is None or not words[3][j]:
+                break
+            cut.append(words[1][j])
+        else:
+            if not anchors or all(c > p for c, p in zip(cut, anchors[-1])):
+                anchors.append(cut)
+    return anchors
+
+
+def split_regions(versions, anchors):
+    """Agrupa os segmentos de cada versão nas regiões entre âncoras."""
+    regions = []
+    starts = [0] * len(versions)
+    for cut in [*anchors, [len(segs) - 1 for segs in versions]]:
+        groups = [segs[s:c + 1] for segs, s, c in zip(versions, starts, cut)]
+        if any(groups):
+            regions.append(groups)
+        starts = [c + 1 for c in cut]
+    return regions
+
+
+def merge(versions, names):
+    """Funde as versões e devolve (transcrição, relatório de regiões fracas)."""
+    anchors = find_anchors(versions)
+    merged, report = [], []
+    wins = {name: 0 for name in names}
+
+    for groups in split_regions(versions, anchors):
+        scores = [group_score(g) for g in groups]
+        best = max(range(len(groups)), key=lambda v: scores[v])
+        chosen = groups[best]
+        wins[names[best]] += 1
+        for seg in chosen:
+            merged.append(dict(seg, source=names[best]))
+
+        texts = ["".join(s["text"] for s in g) for g in groups]
+        agree = agreement(texts)
+        spans = [s for g in groups for s in g]
+        if scores[best] < LOW_SCORE or agree < LOW_AGREEMENT:
+            report.append({
+                "start": round(min(s["start"] for s in spans), 2),
+                "end": round(max(s["end"] for s in spans), 2),
+                "chosen": names[best],
+                "score": round(scores[best], 3),
+                "agreement": round(agree, 3),
+                "hypotheses": {names[v]: texts[v].strip() for v in range(len(groups))},
+            })
+
+    for i, seg in enumerate(merged):
+        seg["id"] = i
+    transcription = {
+        "text": "".join(s["text"] for s in merged),
+        "segments": merged,
+        "language": "es",
+    }
+    summary = {
+        "versions": names,
+        "anchors": len(anchors),
+        "regions_won": wins,
+        "low_confidence": report,
+        "low_confidence_seconds": round(sum(r["end"] - r["start"] for r in report), 2),
+    }
+    return transcription, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Funde versões de uma transcrição por confiança")
+    parser.add_argument("output")
+    parser.add_argument("inputs", nargs="+", help="JSONs do Whisper (a primeira é a referência de tempo)")
+    parser.add_argument("--report", help="grava o relatório de regiões fracas em JSON")
+    args = parser.parse_args()
+
+    names = [Path(p).stem for p in args.inputs]
+    if len(set(names)) != len(names):
+        names = [str(p) for p in args.inputs]
+    versions = [list(iter_segments(p, fields=FIELDS)) for p in args.inputs]
+
+    transcription, summary = merge(versions, names)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(transcription, f, ensure_ascii=False)
+    if args.report:
+        Path(args.report).write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(f"✅ {len(transcription['segments'])} segmentos fundidos em {args.output}")
+    print(f"⚓ {summary['anchors']} âncoras de alinhamento")
+    for name, count in summary["regions_won"].items():
+        print(f"  📊 {name}: {count} regiões")
+    print(f"⚠️ {len(summary['low_confidence'])} regiões de baixa confiança "
+          f"({summary['low_confidence_seconds']:.0f}s) para reprocessar com modelo maior")
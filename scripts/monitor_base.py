@@ -3,71 +3,120 @@
 Monitor Whisper Base model processing with time estimates
 """
 import os
-import time
-import subprocess
-import json
 from datetime import datetime, timedelta
 
-def check_whisper_process():
-    """Check if Whisper base is running"""
-    try:
-        result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
-        return 'whisper' in result.stdout and 'base' in result.stdout
-    except:
-        return False
+from segment_stream import iter_segments
+from transcript_store import TranscriptStore
+from whisper_progress import ProgressTracker, last_segment_end, measured_rtf, record_throughput
+from whisper_watch import find_whisper_pids, process_start_time, wait_for_transcript
+
+# Duração real do áudio em segundos (1h42m30s)
+TOTAL_DURATION = 6150
+PROGRESS_LOG = "transcriptions/.whisper-progress.jsonl"
 
 def main():
+    base_rtf = measured_rtf("base")
+    small_rtf = measured_rtf("small")
+
     print("🚀 Whisper Base Model - Monitor de Progresso")
     print("=" * 50)
     print("📊 Modelo Base: 74M parâmetros")
-    print("⚡ Velocidade: ~3x mais rápido que Small")
+    if base_rtf and small_rtf:
+        print(f"⚡ Velocidade medida: {base_rtf / small_rtf:.1f}x mais rápido que Small")
     print("🎯 Qualidade: Boa para uso geral")
-    print("⏱️ Tempo estimado: 8-12 minutos")
+    if base_rtf:
+        print(f"⏱️ Tempo estimado: {TOTAL_DURATION / base_rtf / 60:.1f} minutos ({base_rtf:.1f}x tempo real)")
+    else:
+        print("⏱️ Tempo estimado: sem execuções anteriores medidas")
     print("=" * 50)
     
     start_time = datetime.now()
     transcription_file = "transcriptions/el-principito.json"
     
     print(f"\n🕐 Início: {start_time.strftime('%H:%M:%S')}")
-    estimated_end = start_time + timedelta(minutes=10)
-    print(f"⏰ Término estimado: {estimated_end.strftime('%H:%M:%S')}")
+    if base_rtf:
+        estimated_end = start_time + timedelta(seconds=TOTAL_DURATION / base_rtf)
+        print(f"⏰ Término estimado: {estimated_end.strftime('%H:%M:%S')}")
     
-    dots = 0
+    # Amostras JSON num arquivo: o stdout fica para a linha de progresso
+    progress_log = open(PROGRESS_LOG, "a", encoding="utf-8")
+    tracker = ProgressTracker("base", TOTAL_DURATION, jsonl=progress_log,
+                              prom_file="transcriptions/.whisper-progress.prom")
+    whisper_started = None
+
+    def find_whisper_start():
+        # Throughput e ETA contam do início do Whisper, mesmo com o monitor aberto depois
+        nonlocal whisper_started
+        if whisper_started is None:
+            for pid in find_whisper_pids("base"):
+                whisper_started = process_start_time(pid)
+                if whisper_started is not None:
+                    tracker.set_start(whisper_started)
+                    break
+        return whisper_started
+
+    def report(size):
+        find_whisper_start()
+        sample = tracker.update(last_segment_end(transcription_file))
+        if sample:
+            print(f"\r⏳ {sample['percent']:.1f}% ({sample['rtf']}x tempo real, ETA {sample['eta']:.0f}s)", end="")
+        else:
+            print(f"\r⏳ Processando... ({size} bytes)", end="")
+    
+    find_whisper_start()
+    require_change = False
     while True:
-        is_running = check_whisper_process()
+        # Bloqueia até o Whisper Base terminar e o arquivo estabilizar
+        try:
+            result = wait_for_transcript(
+                transcription_file, model="base", require_change=require_change,
+                on_change=report,
+            )
+        except ChildProcessError as error:
+            print(f"\n⚠️ {error}; aguardando nova execução...")
+            require_change = True
+            continue
+        require_change = True
         elapsed = datetime.now() - start_time
         
-        if not is_running and os.path.exists(transcription_file):
-            try:
-                with open(transcription_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                if 'segments' in data and len(data['segments']) > 0:
-                    print(f"\n✅ Transcrição Base completa!")
-                    print(f"⏱️ Tempo total: {elapsed.total_seconds()/60:.1f} minutos")
-                    print(f"📊 {len(data['segments'])} segmentos processados")
-                    
-                    # Analisar qualidade
-                    print("\n🔍 Análise da transcrição Base:")
-                    for i, seg in enumerate(data['segments'][:3]):
-                        print(f"  {i+1}. {seg['text'].strip()}")
-                    
-                    # Comparação com tiny
-                    print("\n📈 Comparado ao Tiny:")
-                    print("  ✅ +50% melhor precisão em nomes")
-                    print("  ✅ Melhor segmentação de frases")
-                    print("  ✅ Pontuação mais precisa")
-                    print("  ⚡ 2x mais rápido que Small")
-                    break
-            except:
-                pass
-        
-        # Progress indicator
-        dots = (dots + 1) % 4
-        progress = "." * dots + " " * (3 - dots)
-        print(f"\r⏳ Processando{progress} [{elapsed.total_seconds()//60:.0f}:{elapsed.total_seconds()%60:02.0f}]", end="")
-        
-        time.sleep(5)
+        try:
+            count = 0
+            first_texts = []
+            for seg in iter_segments(transcription_file, fields=("text",)):
+                count += 1
+                if len(first_texts) < 3:
+                    first_texts.append(seg['text'])
+            if count > 0:
+                print(f"\n✅ Transcrição Base completa!")
+                print(f"⏱️ Tempo total: {elapsed.total_seconds()/60:.1f} minutos")
+                print(f"📊 {count} segmentos processados")
+                digest = TranscriptStore().save("el-principito", transcription_file, ("base", "current"))
+                print(f"💾 Versão {digest[:12]} salva no store (refs base, current)")
+                # Só mede throughput se acompanhamos uma execução cujo início é conhecido
+                rtf = None
+                if result.reason != "existente" and whisper_started is not None:
+                    wall = os.path.getmtime(transcription_file) - whisper_started
+                    rtf = record_throughput("base", TOTAL_DURATION, wall)
+                if rtf:
+                    print(f"⚡ Throughput medido: {rtf:.1f}x tempo real")
+                
+                # Analisar qualidade
+                print("\n🔍 Análise da transcrição Base:")
+                for i, text in enumerate(first_texts):
+                    print(f"  {i+1}. {text.strip()}")
+                
+                # Comparação com tiny
+                print("\n📈 Comparado ao Tiny:")
+                print("  ✅ +50% melhor precisão em nomes")
+                print("  ✅ Melhor segmentação de frases")
+                print("  ✅ Pontuação mais precisa")
+                if rtf and small_rtf:
+                    print(f"  ⚡ {rtf / small_rtf:.1f}x mais rápido que Small (medido)")
+                break
+        except (ValueError, FileNotFoundError):
+            print("\n⚠️ Transcrição incompleta, aguardando nova gravação...")
     
+    progress_log.close()
     print(f"\n🎉 Pronto para uso em produção!")
 
 if __name__ == "__main__":
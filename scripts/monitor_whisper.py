@@ -3,10 +3,9 @@
 Script para monitorar quando o Whisper termina e automaticamente 
 atualizar a aplicação com a transcrição real
 """
-import os
-import time
-import json
-import shutil
+from segment_stream import count_segments
+from transcript_store import TranscriptStore
+from whisper_watch import wait_for_transcript
 
 def wait_for_whisper_completion():
     """Aguarda o Whisper completar e processa o resultado"""
@@ -14,28 +13,33 @@ def wait_for_whisper_completion():
     
     print("🎧 Aguardando conclusão da transcrição do Whisper...")
     
+    require_change = False
     while True:
-        if os.path.exists(transcription_file):
-            try:
-                # Verifica se o arquivo está completo (pode ler JSON)
-                with open(transcription_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+        # Acorda por evento de arquivo/processo em vez de checar a cada 10 segundos
+        try:
+            wait_for_transcript(transcription_file, require_change=require_change)
+        except ChildProcessError as error:
+            print(f"⚠️ {error}; aguardando nova execução...")
+            require_change = True
+            continue
+        require_change = True
+        try:
+            # Verifica se o arquivo está completo (lista de segmentos fechada)
+            count = count_segments(transcription_file)
+            
+            if count > 0:
+                print(f"✅ Transcrição completa encontrada!")
+                print(f"📊 {count} segmentos processados")
                 
-                if 'segments' in data and len(data['segments']) > 0:
-                    print(f"✅ Transcrição completa encontrada!")
-                    print(f"📊 {len(data['segments'])} segmentos processados")
-                    
-                    # Backup da transcrição original
-                    backup_file = "transcriptions/el-principito-original.json"
-                    shutil.copy2(transcription_file, backup_file)
-                    print(f"💾 Backup salvo em: {backup_file}")
-                    
-                    return True
-                    
-            except (json.JSONDecodeError, FileNotFoundError):
-                pass
+                # Versão guardada no store por hash (sem cópia inteira do arquivo)
+                digest = TranscriptStore().save("el-principito", transcription_file, ("original", "current"))
+                print(f"💾 Versão {digest[:12]} salva no store (refs original, current)")
+                
+                return True
+                
+        except (ValueError, FileNotFoundError):
+            pass
         
-        time.sleep(10)  # Verifica a cada 10 segundos
         print("⏳ Ainda processando...")
 
 if __name__ == "__main__":
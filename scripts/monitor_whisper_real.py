@@ -3,23 +3,17 @@
 Script para monitorar o progresso real do Whisper Small
 """
 import os
-import time
-import subprocess
-import json
+import sys
 
-def check_whisper_process():
-    """Verifica se o processo Whisper está rodando"""
-    try:
-        result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
-        return 'whisper' in result.stdout and 'small' in result.stdout
-    except:
-        return False
+from segment_stream import iter_segments
+from transcript_store import TranscriptStore
+from whisper_watch import wait_for_transcript
 
 def get_file_size(filepath):
     """Obtém o tamanho do arquivo se existir"""
     try:
         return os.path.getsize(filepath)
-    except:
+    except OSError:
         return 0
 
 def main():
@@ -30,41 +24,39 @@ def main():
     print(f"📊 Tamanho original: {original_size} bytes")
     
     last_size = original_size
-    stable_count = 0
     
-    while True:
-        is_running = check_whisper_process()
-        current_size = get_file_size(transcription_file)
-        
-        if current_size != last_size:
-            print(f"📈 Arquivo atualizado: {current_size} bytes (+{current_size - last_size})")
-            last_size = current_size
-            stable_count = 0
-        elif not is_running and current_size > original_size:
-            stable_count += 1
-            if stable_count >= 3:
-                print("✅ Whisper completou! Arquivo estável e processo terminado.")
-                break
-        elif is_running:
-            print(f"⏳ Processando... (arquivo: {current_size} bytes)")
-            stable_count = 0
-        else:
-            stable_count += 1
-            
-        time.sleep(10)
+    def report(current_size):
+        nonlocal last_size
+        print(f"📈 Arquivo atualizado: {current_size} bytes ({current_size - last_size:+})")
+        last_size = current_size
+    
+    # Processo acompanhado pelo PID e arquivo por eventos: acorda só quando algo muda
+    try:
+        result = wait_for_transcript(transcription_file, model="small", on_change=report)
+    except ChildProcessError as error:
+        print(f"❌ {error}: a transcrição anterior ({original_size} bytes) foi mantida")
+        sys.exit(1)
+    current_size = result.size
+    print(f"✅ Whisper completou! Arquivo {'renomeado' if result.reason == 'rename' else 'estável'} e processo terminado.")
     
     print(f"🎉 Transcrição Small finalizada! Tamanho final: {current_size} bytes")
+    digest = TranscriptStore().save("el-principito", transcription_file, ("small", "current"))
+    print(f"💾 Versão {digest[:12]} salva no store (refs small, current)")
     
     # Verificar qualidade
     try:
-        with open(transcription_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        print(f"📊 {len(data['segments'])} segmentos processados")
+        count = 0
+        first_texts = []
+        for segment in iter_segments(transcription_file, fields=("text",)):
+            count += 1
+            if len(first_texts) < 3:
+                first_texts.append(segment['text'])
+        print(f"📊 {count} segmentos processados")
         
         # Mostrar primeiros segmentos para verificar qualidade
         print("\n🔍 Primeiros segmentos:")
-        for i, segment in enumerate(data['segments'][:3]):
-            print(f"  {i+1}. {segment['text'].strip()}")
+        for i, text in enumerate(first_texts):
+            print(f"  {i+1}. {text.strip()}")
             
     except Exception as e:
         print(f"⚠️ Erro ao analisar arquivo: {e}")
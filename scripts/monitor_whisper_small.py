@@ -3,10 +3,10 @@
 Script para monitorar quando o Whisper Small termina e automaticamente 
 atualizar a aplicação com a transcrição de maior qualidade
 """
-import os
-import time
-import json
-import shutil
+from quality_report import FIELDS, columns_from_segments, quality_report
+from segment_stream import iter_segments
+from transcript_store import TranscriptStore
+from whisper_watch import wait_for_transcript
 
 def wait_for_whisper_completion():
     """Aguarda o Whisper Small completar e processa o resultado"""
@@ -15,46 +15,50 @@ def wait_for_whisper_completion():
     print("🎧 Aguardando conclusão da transcrição do Whisper Small...")
     print("⚡ Modelo Small: melhor qualidade para nomes próprios e contexto literário")
     
+    require_change = False
     while True:
-        if os.path.exists(transcription_file):
-            try:
-                # Verifica se o arquivo está completo (pode ler JSON)
-                with open(transcription_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+        # Acorda quando o processo Small termina ou o arquivo muda, sem polling de 15 s
+        try:
+            wait_for_transcript(transcription_file, model="small", require_change=require_change)
+        except ChildProcessError as error:
+            print(f"⚠️ {error}; aguardando nova execução...")
+            require_change = True
+            continue
+        require_change = True
+        try:
+            # Verifica se o arquivo está completo (lista de segmentos fechada)
+            segments = list(iter_segments(transcription_file, fields=FIELDS))
+            
+            if len(segments) > 0:
+                print(f"✅ Transcrição Small completa encontrada!")
+                print(f"📊 {len(segments)} segmentos processados com modelo Small")
                 
-                if 'segments' in data and len(data['segments']) > 0:
-                    print(f"✅ Transcrição Small completa encontrada!")
-                    print(f"📊 {len(data['segments'])} segmentos processados com modelo Small")
-                    
-                    # Backup da transcrição small
-                    backup_file = "transcriptions/el-principito-small-original.json"
-                    shutil.copy2(transcription_file, backup_file)
-                    print(f"💾 Backup Small salvo em: {backup_file}")
-                    
-                    # Verificar qualidade comparada
-                    print("\n🔍 Analisando qualidade da transcrição...")
-                    analyze_quality(data)
-                    
-                    return True
-                    
-            except (json.JSONDecodeError, FileNotFoundError):
-                pass
+                # Versão Small guardada no store por hash (sem cópia inteira do arquivo)
+                digest = TranscriptStore().save("el-principito", transcription_file, ("small", "current"))
+                print(f"💾 Versão Small {digest[:12]} salva no store (refs small, current)")
+                
+                # Verificar qualidade comparada
+                print("\n🔍 Analisando qualidade da transcrição...")
+                analyze_quality(segments)
+                
+                return True
+                
+        except (ValueError, FileNotFoundError):
+            pass
         
-        time.sleep(15)  # Verifica a cada 15 segundos para Small
         print("⏳ Processando com modelo Small (melhor qualidade)...")
 
-def analyze_quality(data):
-    """Analisa a qualidade da transcrição"""
-    segments = data['segments']
-    
-    # Procurar por nomes importantes
+def analyze_quality(segments):
+    """Analisa a qualidade da transcrição inteira (segmentos com start, end e text)"""
+
+    # Procurar por nomes importantes em todos os segmentos
     important_names = ['saint-exupery', 'antoine', 'leon', 'werth']
     found_names = []
     
-    for segment in segments[:20]:  # Analisa os primeiros 20 segmentos
+    for segment in segments:
         text = segment['text'].lower()
         for name in important_names:
-            if name in text:
+            if name in text and all(name != found for found, _ in found_names):
                 found_names.append((name, segment['text']))
     
     print("📚 Análise de qualidade:")
@@ -64,13 +68,20 @@ def analyze_quality(data):
     else:
         print("  ⚠️ Alguns nomes podem precisar de verificação manual")
     
-    avg_duration = sum(s['end'] - s['start'] for s in segments[:100]) / min(100, len(segments))
+    report = quality_report(columns_from_segments(segments))
+    avg_duration = report['avg_duration']
     print(f"  ⏱️ Duração média dos segmentos: {avg_duration:.2f}s")
     
     if avg_duration > 2 and avg_duration < 8:
         print("  ✅ Segmentação adequada para leitura")
     else:
         print("  ⚠️ Segmentação pode precisar de ajustes")
+    
+    for name, flag in report['flags'].items():
+        if flag['ranges']:
+            print(f"  ⚠️ {name}: {flag['segments']} segmentos em {len(flag['ranges'])} intervalos ({flag['seconds']:.0f}s)")
+    print(f"  📊 {report['flagged_percent']:.1f}% do áudio marcado para revisão")
+    return report
 
 if __name__ == "__main__":
     wait_for_whisper_completion()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Transcrição paralela por blocos com costura dos segmentos
+
+O audiolivro é dividido em blocos de ~5 minutos com cortes nos pontos de
+menor energia (silêncios) perto de cada alvo; cada bloco leva alguns
+segundos de sobreposição com os vizinhos. Os blocos são transcritos num
+pool de processos do tamanho dos núcleos disponíveis e os resultados são
+costurados numa única lista "segments" compatível com o Whisper: tempos
+deslocados, texto duplicado na sobreposição removido e ids renumerados.
+
+O transcritor é plugável ("modulo:funcao"); parallel_transcribe:stub_transcriber
+roda tudo offline, sem Whisper.
+"""
+import argparse
+import importlib
+import json
+import math
+import operator
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+CHUNK_SECONDS = 300
+OVERLAP_SECONDS = 5
+SEARCH_SECONDS = 20
+HOP_SECONDS = 0.1
+ENVELOPE_RATE = 2000  # amostras/s usadas para medir energia
+
+DEFAULT_TRANSCRIBER = "parallel_transcribe:whisper_transcriber"
+
+
+def prepare_wav(audio_file, workdir):
+    """WAV PCM 16 bits do áudio (converte com ffmpeg se necessário)."""
+    audio_file = Path(audio_file)
+    if audio_file.suffix.lower() == ".wav":
+        return audio_file
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("ffmpeg não encontrado: converta o áudio para WAV antes")
+    out = Path(workdir) / "audio.wav"
+    subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", str(audio_file),
+         "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", str(out)],
+        check=True,
+    )
+    return out
+
+
+def energy_envelope(wav_file, hop=HOP_SECONDS):
+    """Energia média por janela de `hop` segundos (canal 0, subamostrado)."""
+    with wave.open(str(wav_file), "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError("Só WAV PCM de 16 bits é suportado")
+        rate, channels = w.getframerate(), w.getnchannels()
+        frames_per_hop = max(1, int(rate * hop))
+        step = max(1, rate // ENVELOPE_RATE) * channels
+        envelope = []
+        while True:
+            raw = w.readframes(frames_per_hop)
+            if not raw:
+                break
+            samples = array("h", raw)
+            if sys.byteorder != "little":
+                samples.byteswap()
+            picked = samples[::step]
+            envelope.append(math.fsum(map(operator.mul, picked, picked)) / len(picked))
+        duration = w.getnframes() / rate
+    return envelope, duration
+
+
+def plan_cuts(envelope, duration, hop=HOP_SECONDS, chunk=CHUNK_SECONDS, search=SEARCH_SECONDS):
+    """Pontos de corte [0, c1, ..., duration] nos silêncios perto de cada alvo."""
+    cuts = [0.0]
+    while duration - cuts[-1] > chunk + search:
+        target = cuts[-1] + chunk
+        lo = max(int((target - search) / hop), int(cuts[-1] / hop) + 1)
+        hi = min(int((target + search) / hop), len(envelope) - 1)
+        if hi <= lo:
+            cuts.append(target)
+            continue
+        # O mais silencioso; em empate, o mais próximo do alvo
+        center = target / hop
+        quietest = min(range(lo, hi + 1), key=lambda k: (envelope[k], abs(k - center)))
+        cuts.append(round((quietest + 0.5) * hop, 3))
+    cuts.append(duration)
+    return cuts
+
+
+def chunk_windows(cuts, duration, overlap=OVERLAP_SECONDS):
+    """Janelas (início, fim) de cada bloco, com sobreposição nas bordas."""
+    return [
+        (max(0.0, a - overlap), min(duration, b + overlap))
+        for a, b in zip(cuts, cuts[1:])
+    ]
+
+
+def write_chunk(wav_file, start, end, out_file):
+    with wave.open(str(wav_file), "rb") as src:
+        rate = src.getframerate()
+        src.setpos(int(start * rate))
+        frames = src.readframes(int((end - start) * rate))
+        with wave.open(str(out_file), "wb") as dst:
+            dst.setparams(src.getparams())
+            dst.writeframes(frames)
+    return out_file
+
+
+def resolve_transcriber(spec):
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def whisper_transcriber(chunk_file, offset, model, language):
+    """Transcreve um bloco com o CLI do Whisper e devolve seus segmentos."""
+    out_dir = Path(chunk_file).parent
+    subprocess.run(
+        ["whisper", str(chunk_file), "--model", model, "--language", language,
+         "--output_format", "json", "--output_dir", str(out_dir), "--verbose", "False"],
+        check=True, capture_output=True,
+    )
+    with open(out_dir / f"{Path(chunk_file).stem}.json", "r", encoding="utf-8") as f:
+        return json.load(f).get("segments", [])
+
+
+def stub_transcriber(chunk_file, offset, model, language):
+    """Transcritor falso para testes: um segmento a cada 4 s da linha do tempo global.
+
+    Como o texto depende do tempo absoluto, blocos vizinhos produzem o mesmo
+    texto na sobreposição — exatamente o caso que a costura precisa limpar.
+    """
+    with wave.open(str(chunk_file), "rb") as w:
+        length = w.getnframes() / w.getframerate()
+    segments = []
+    t = math.floor(offset / 4) * 4
+    while t < offset + length:
+        start, end = max(t, offset), min(t + 4, offset + length)
+        if end - start > 0.5:
+            segments.append({
+                "start": round(start - offset, 2),
+                "end": round(end - offset, 2),
+                "text": f" Frase {int(t // 4)} del libro.",
+            })
+        t += 4
+    return segments
+
+
+def _transcribe_chunk(job):
+    spec, wav_file, index, start, end, workdir, model, language = job
+    chunk_file = write_chunk(wav_file, start, end, Path(workdir) / f"chunk-{index:04d}.wav")
+    try:
+        return resolve_transcriber(spec)(chunk_file, start, model, language)
+    finally:
+        chunk_file.unlink(missing_ok=True)
+
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _drop_repeated_prefix(previous_text, text, max_words=12):
+    """Remove do início de `text` as palavras que repetem o fim de `previous_text`."""
+    prev = _words(previous_text)[-max_words:]
+    matches = list(_WORD.finditer(text))
+    cur = [m.group().lower() for m in matches]
+    if cur and cur == _words(previous_text):
+        return ""
+    # Uma única palavra em comum ("de", "la") não basta para ser repetição
+    for k in range(min(len(prev), len(cur)), 1, -1):
+        if prev[-k:] == cur[:k]:
+            if k == len(cur):
+                return ""
+            return " " + text[matches[k].start():].lstrip()
+    return text
+
+
+def stitch(results, cuts, windows, language="es"):
+    """Junta os segmentos dos blocos numa transcrição única no formato do Whisper."""
+    segments = []
+    for i, chunk_segments in enumerate(results):
+        offset = windows[i][0]
+        lo, hi = cuts[i], cuts[i + 1]
+        first = True
+        for seg in chunk_segments:
+            start = seg["start"] + offset
+            end = seg["end"] + offset
+            # Cada segmento pertence ao bloco que contém seu ponto médio
+            middle = (start + end) / 2
+            if not (lo <= middle < hi or (i == len(results) - 1 and middle >= hi)):
+                continue
+            seg = dict(seg, start=round(start, 2), end=round(end, 2))
+            seg["seek"] = int(round(offset * 100)) + seg.get("seek", 0)
+            if first and segments:
+                text = _drop_repeated_prefix(segments[-1]["text"], seg["text"])
+                if not text.strip():
+                    continue
+                if text != seg["text"]:
+                    seg["text"] = text
+                    seg.pop("tokens", None)  # tokens não correspondem mais ao texto
+            first = False
+            segments.append(seg)
+
+    for i, seg in enumerate(segments):
+        seg["id"] = i
+    return {
+        "text": "".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "language": language,
+    }
+
+
+def transcribe_parallel(audio_file, model="small", language="es", workers=None,
+                        transcriber=DEFAULT_TRANSCRIBER, chunk=CHUNK_SECONDS, overlap=OVERLAP_SECONDS):
+    workers = workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory(prefix="whisper-chunks-") as workdir:
+        wav_file = prepare_wav(audio_file, workdir)
+        envelope, duration = energy_envelope(wav_file)
+        cuts = plan_cuts(envelope, duration, chunk=chunk)
+        windows = chunk_windows(cuts, duration, overlap)
+        print(f"✂️ {len(windows)} blocos para {duration:.0f}s de áudio, {workers} processos")
+
+        jobs = [
+            (transcriber, str(wav_file), i, start, end, workdir, model, language)
+            for i, (start, end) in enumerate(windows)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_transcribe_chunk, jobs))
+
+    return stitch(results, cuts, windows, language)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcrição paralela por blocos")
+    parser.add_argument("audio")
+    parser.add_argument("output")
+    parser.add_argument("--model", default="small")
+    parser.add_argument("--language", default="es")
+    parser.add_argument("--workers", type=int, default=None, help="padrão: número de núcleos")
+    parser.add_argument("--chunk", type=float, default=CHUNK_SECONDS, help="segundos por bloco")
+    parser.add_argument("--overlap", type=float, default=OVERLAP_SECONDS)
+    parser.add_argument("--transcriber", default=DEFAULT_TRANSCRIBER, help="modulo:funcao")
+    args = parser.parse_args()
+
+    transcription = transcribe_parallel(
+        args.audio, args.model, args.language, args.workers,
+        args.transcriber, args.chunk, args.overlap,
+    )
+    # Grava em arquivo temporário e renomeia: os monitores veem um rename atômico
+    out_file = Path(args.output)
+    tmp_file = out_file.with_name(out_file.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(transcription, f, ensure_ascii=False)
+    os.replace(tmp_file, out_file)
+    print(f"✅ {len(transcription['segments'])} segmentos gravados em {out_file}")
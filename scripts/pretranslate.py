@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Pré-tradução do vocabulário de um livro com cache persistente
+
+1. Extrai o vocabulário único e normalizado dos "segments" da transcrição
+   (minúsculas, sem pontuação), do mais frequente para o mais raro.
+2. Consulta o cache SQLite e traduz só o que falta, em lotes grandes, com
+   um backend plugável ("modulo:funcao"): DeepL ou um stub local.
+3. Remove as entradas usadas há mais tempo quando o cache passa do limite
+   (LRU) e exporta um snapshot JSON que o server.js carrega num Map, para
+   responder a maioria dos cliques em /translate sem chamar a API.
+
+As palavras que o servidor não encontrou no snapshot ficam em
+translation-misses.txt e entram no próximo lote.
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import sqlite3
+import time
+import urllib.request
+from collections import Counter
+from pathlib import Path
+
+from segment_stream import iter_segments
+
+CACHE_FILE = Path("transcriptions/.translations.sqlite")
+SNAPSHOT_FILE = Path("transcriptions/translations.json")
+MISSES_FILE = Path("transcriptions/translation-misses.txt")
+
+TARGET_LANG = "PT-BR"
+BATCH_SIZE = 50  # Máximo de textos por requisição da API do DeepL
+MAX_ENTRIES = 50000
+DEFAULT_BACKEND = "pretranslate:deepl_backend"
+DEEPL_URL = "https://api-free.deepl.com/v2/translate"
+
+_WORD = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+
+
+def normalize_word(text):
+    """Forma usada como chave do cache (igual à do server.js)."""
+    words = _WORD.findall(text.lower())
+    return " ".join(words)
+
+
+def extract_vocabulary(segments):
+    """Palavras únicas normalizadas, das mais frequentes para as mais raras."""
+    counts = Counter()
+    for segment in segments:
+        counts.update(_WORD.findall(segment.get("text", "").lower()))
+    return [word for word, _ in counts.most_common()]
+
+
+def resolve_backend(spec):
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def deepl_backend(texts, target_lang):
+    """Traduz um lote com a API do DeepL (chave em DEEPL_API_KEY)."""
+    key = os.environ.get("DEEPL_API_KEY")
+    if not key or key == "test_key":
+        raise RuntimeError("DEEPL_API_KEY não definida: use --backend pretranslate:stub_backend")
+    request = urllib.request.Request(
+        DEEPL_URL,
+        data=json.dumps({"text": texts, "target_lang": target_lang, "source_lang": "ES"}).encode("utf-8"),
+        headers={"Authorization": f"DeepL-Auth-Key {key}", "Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        data = json.load(response)
+    return [t["text"] for t in data["translations"]]
+
+
+def stub_backend(texts, target_lang):
+    """Backend local para testes: marca o texto sem traduzir."""
+    return [f"[{target_lang.lower()}] {text}" for text in texts]
+
+
+class TranslationCache:
+    """Cache persistente (SQLite) de traduções com despejo LRU."""
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                   source TEXT NOT NULL,
+                   target_lang TEXT NOT NULL,
+                   translation TEXT NOT NULL,
+                   backend TEXT,
+                   last_used REAL NOT NULL,
+                   rank INTEGER NOT NULL DEFAULT 0,
+                   PRIMARY KEY (source, target_lang)
+               ) WITHOUT ROWID"""
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS translations_lru ON translations (last_used, rank)")
+
+    def get_many(self, words, target_lang=TARGET_LANG):
+        """{palavra: tradução} das que estão no cache; marca-as como usadas.
+
+        A posição da palavra na lista (0 = mais importante) desempata o LRU
+        entre palavras usadas no mesmo lote.
+        """
+        found = {}
+        now = time.time()
+        with self.db:
+            for start in range(0, len(words), 500):
+                chunk = words[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self.db.execute(
+                    f"SELECT source, translation FROM translations "
+                    f"WHERE target_lang = ? AND source IN ({marks})",
+                    [target_lang, *chunk],
+                ).fetchall()
+                found.update(rows)
+            self.db.executemany(
+                "UPDATE translations SET last_used = ?, rank = ? WHERE source = ? AND target_lang = ?",
+                [(now, rank, word, target_lang) for rank, word in enumerate(words) if word in found],
+            )
+        return found
+
+    def put_many(self, entries, target_lang=TARGET_LANG, backend=None):
+        """Grava [(palavra, tradução, posição)]."""
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                [(source, target_lang, translation, backend, now, rank)
+                 for source, translation, rank in entries],
+            )
+
+    def evict(self):
+        """Remove as entradas menos usadas além de max_entries; devolve quantas."""
+        with self.db:
+            cursor = self.db.execute(
+                "DELETE FROM translations WHERE (source, target_lang) IN ("
+                "SELECT source, target_lang FROM translations "
+                "ORDER BY last_used DESC, rank ASC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        return cursor.rowcount
+
+    def export_snapshot(self, out_file=SNAPSHOT_FILE, target_lang=TARGET_LANG):
+        """Grava {palavra: tradução} em JSON para o servidor (escrita atômica)."""
+        rows = self.db.execute(
+            "SELECT source, translation FROM translations WHERE target_lang = ? ORDER BY source",
+            (target_lang,),
+        ).fetchall()
+        out_file = Path(out_file)
+        tmp = out_file.with_name(out_file.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"target": target_lang, "translations": dict(rows)},
+                       ensure_ascii=False, separators=(",", ":")),
+            encoding="utf-8",
+        )
+        os.replace(tmp, out_file)
+        return len(rows)
+
+    def close(self):
+        self.db.close()
+
+
+def take_misses(path=MISSES_FILE):
+    """Palavras registradas pelo servidor, com o arquivo a apagar no fim.
+
+    O arquivo é renomeado antes da leitura para não perder o que o servidor
+    anotar enquanto o lote roda; sobras de um lote que falhou vêm primeiro.
+    """
+    path = Path(path)
+    taken = path.with_name(path.name + ".batch")
+    if not taken.exists():
+        try:
+            os.replace(path, taken)
+        except FileNotFoundError:
+            return [], None
+    lines = taken.read_text(encoding="utf-8").splitlines()
+    return [word for word in dict.fromkeys(normalize_word(line) for line in lines) if word], taken
+
+
+def pretranslate(words, cache, backend=DEFAULT_BACKEND, target_lang=TARGET_LANG, batch_size=BATCH_SIZE):
+    """Traduz as palavras que faltam no cache; devolve (em cache, traduzidas).
+
+    `words` vem em ordem de importância (ver TranslationCache.get_many).
+    """
+    cached = cache.get_many(words, target_lang)
+    missing = [(rank, word) for rank, word in enumerate(words) if word not in cached]
+    translate = resolve_backend(backend)
+    for start in range(0, len(missing), batch_size):
+        ranks, batch = zip(*missing[start:start + batch_size])
+        translations = translate(list(batch), target_lang)
+        cache.put_many(zip(batch, translations, ranks), target_lang, backend)
+    return len(cached), len(missing)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-tradução do vocabulário com cache persistente")
+    parser.add_argument("inputs", nargs="*", help="JSONs do Whisper")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, help="modulo:funcao")
+    parser.add_argument("--target", default=TARGET_LANG)
+    parser.add_argument("--cache", default=str(CACHE_FILE))
+    parser.add_argument("--snapshot", default=str(SNAPSHOT_FILE))
+    parser.add_argument("--misses", default=str(MISSES_FILE), help="palavras que o servidor não achou")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES)
+    args = parser.parse_args()
+
+    words = []
+    for json_file in args.inputs:
+        words.extend(extract_vocabulary(iter_segments(json_file)))
+    misses, misses_file = take_misses(args.misses)
+    # Palavras clicadas no leitor primeiro: são as últimas a sair do cache
+    words = list(dict.fromkeys(misses + words))
+    print(f"📚 {len(words)} palavras únicas ({len(misses)} vindas do servidor)")
+
+    cache = TranslationCache(args.cache, args.max_entries)
+    try:
+        hits, translated = pretranslate(words, cache, args.backend, args.target)
+        evicted = cache.evict()
+        exported = cache.export_snapshot(args.snapshot, args.target)
+    finally:
+        cache.close()
+    if misses_file:
+        misses_file.unlink()
+
+    print(f"✅ {hits} já no cache, {translated} traduzidas em {-(-translated // BATCH_SIZE)} lotes")
+    if evicted:
+        print(f"🧹 {evicted} entradas antigas removidas do cache")
+    print(f"💾 Snapshot com {exported} traduções em {args.snapshot}")
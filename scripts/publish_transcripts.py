@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Publicação da transcrição em partes por capítulo, pré-comprimidas
+
+O leitor não precisa dos tokens nem das estatísticas do decoder: só das
+palavras, dos tempos e do segmento de cada uma. Este estágio parte o
+índice de palavras em um shard por capítulo (o trecho antes do primeiro
+capítulo vira o shard 0) e grava em transcriptions/published/<livro>/:
+
+- manifest.json                     lista dos shards, com capítulo, tempos,
+                                    primeira palavra, tamanhos e sha256;
+- chapter-NN.<hash>.json            shard com nome pelo hash do conteúdo,
+  chapter-NN.<hash>.json.gz         e as variantes gzip e brotli, geradas
+  chapter-NN.<hash>.json.br         aqui e não a cada requisição.
+
+Como o nome muda junto com o conteúdo, o servidor manda os shards com
+cache de um ano (immutable) e ETag forte; só o manifesto é revalidado. O
+leitor desenha o primeiro capítulo depois de poucos KB e busca o resto
+em segundo plano.
+
+O brotli usa o pacote `brotli`, se instalado; sem ele só o gzip é gerado.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+from segment_stream import iter_segments
+from tracing import traced
+from word_index import build_word_index
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PUBLISH_VERSION = 1
+PUBLISHED_DIR = Path("transcriptions/published")
+MANIFEST_FILE = "manifest.json"
+HASH_LENGTH = 16  # caracteres do sha256 no nome do shard
+
+
+def shard_ranges(index):
+    """[(capítulo ou None, primeira palavra, fim)] cobrindo todas as palavras."""
+    total = len(index["words"])
+    starts = [chapter["word"] for chapter in index["chapters"]]
+    ranges = []
+    if not starts or starts[0] > 0:
+        ranges.append((None, 0, starts[0] if starts else total))
+    for i, chapter in enumerate(index["chapters"]):
+        end = starts[i + 1] if i + 1 < len(starts) else total
+        ranges.append((chapter, starts[i], end))
+    return [r for r in ranges if r[2] > r[1] or r[0] is not None]
+
+
+def make_shards(index):
+    """Shards (dicts) do índice de palavras, um por capítulo."""
+    shards = []
+    for chapter, first, end in shard_ranges(index):
+        shards.append({
+            "version": PUBLISH_VERSION,
+            "shard": len(shards),
+            "firstWord": first,
+            "chapters": [chapter] if chapter else [],
+            "words": index["words"][first:end],
+            "start": index["start"][first:end],
+            "end": index["end"][first:end],
+            "segment": index["segment"][first:end],
+        })
+    return shards
+
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def variants(raw):
+    """{sufixo: bytes} das versões comprimidas de `raw`."""
+    out = {".gz": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        out[".br"] = brotli.compress(raw, quality=11)
+    return out
+
+
+def write_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_file(path, raw):
+    """Grava o arquivo e as variantes; devolve a entrada do manifesto."""
+    entry = {"bytes": len(raw), "sha256": hashlib.sha256(raw).hexdigest()}
+    if not path.exists():
+        # Nome com hash: se existe, o conteúdo é o mesmo
+        for suffix, data in variants(raw).items():
+            write_atomic(path.with_name(path.name + suffix), data)
+        write_atomic(path, raw)
+    for suffix in (".gz", ".br"):
+        variant = path.with_name(path.name + suffix)
+        if variant.exists():
+            entry[suffix[1:]] = variant.stat().st_size
+    return entry
+
+
+@traced("publish")
+def publish_book(index, out_dir, duration=None):
+    """Grava shards e manifesto de um livro; devolve o manifesto."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_FILE
+    try:
+        previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = {"shards": []}
+
+    shards = []
+    for shard in make_shards(index):
+        raw = encode(shard)
+        digest = hashlib.sha256(raw).hexdigest()
+        name = f"chapter-{shard['shard']:02d}.{digest[:HASH_LENGTH]}.json"
+        entry = write_file(out_dir / name, raw)
+        chapter = shard["chapters"][0] if shard["chapters"] else None
+        words = len(shard["words"])
+        shards.append({
+            "file": name,
+            "title": chapter["title"] if chapter else None,
+            "number": chapter["number"] if chapter else None,
+            "firstWord": shard["firstWord"],
+            "words": words,
+            "start": shard["start"][0] / 1000 if words else (chapter["start"] if chapter else 0),
+            "end": shard["end"][-1] / 1000 if words else (chapter["start"] if chapter else 0),
+            **entry,
+        })
+
+    manifest = {
+        "version": PUBLISH_VERSION,
+        "words": len(index["words"]),
+        "duration": duration if duration is not None else (index["end"][-1] / 1000 if index["end"] else 0),
+        "chapters": index["chapters"],
+        "shards": shards,
+    }
+    raw = encode(manifest)
+    for suffix, data in variants(raw).items():
+        write_atomic(out_dir / (MANIFEST_FILE + suffix), data)
+    write_atomic(manifest_path, raw)
+
+    # Só ficam os shards desta publicação e da anterior (leitores no meio do carregamento)
+    keep = {MANIFEST_FILE} | {s["file"] for s in shards} | {s["file"] for s in previous["shards"]}
+    for path in out_dir.iterdir():
+        base = path.name
+        for suffix in (".gz", ".br", ".tmp"):
+            base = base.removesuffix(suffix)
+        if base not in keep:
+            path.unlink()
+    return manifest
+
+
+def default_output(json_file):
+    return PUBLISHED_DIR / Path(json_file).stem
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 publish_transcripts.py input.json [diretório de saída]")
+        sys.exit(1)
+
+    in_file = Path(sys.argv[1])
+    out_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output(in_file)
+    index = build_word_index(iter_segments(in_file, fields=("start", "end", "text", "tokens", "seek")))
+    manifest = publish_book(index, out_dir)
+
+    total = sum(s["bytes"] for s in manifest["shards"])
+    gz = sum(s.get("gz", 0) for s in manifest["shards"])
+    first = manifest["shards"][0] if manifest["shards"] else None
+    print(f"✅ {len(manifest['shards'])} shards em {out_dir} ({total // 1024} KB, {gz // 1024} KB com gzip)")
+    if first:
+        print(f"⚡ Primeiro shard: {first['bytes'] // 1024} KB ({first.get('br', first.get('gz', 0)) // 1024} KB comprimido)")
+    if brotli is None:
+        print("⚠️ Pacote brotli não instalado: só variantes gzip")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Relatório de qualidade de uma transcrição inteira, vetorizado com NumPy
+
+Carrega avg_logprob, no_speech_prob, compression_ratio, duração e
+caracteres por segundo de todos os segmentos em arrays e marca, numa
+única passada:
+
+- loops: texto repetitivo (compression_ratio alto) ou idêntico ao anterior;
+- alucinações em silêncio: o Whisper acha que não há fala, mas escreveu algo;
+- baixa confiança: avg_logprob abaixo do limiar do próprio Whisper;
+- tempos anômalos: fala rápida/lenta demais ou duração fora da curva.
+
+Segmentos marcados vizinhos viram intervalos de tempo. Com várias
+transcrições compara as versões lado a lado, e com --max-flagged serve de
+portão: sai com código 1 se alguma passar do limite.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from segment_stream import iter_segments
+
+FIELDS = ("start", "end", "text", "avg_logprob", "no_speech_prob", "compression_ratio")
+
+# Mesmos limiares que o Whisper usa para refazer/descartar segmentos
+COMPRESSION_LIMIT = 2.4
+LOGPROB_LIMIT = -1.0
+NO_SPEECH_LIMIT = 0.6
+
+CPS_MIN = 3.0     # abaixo disso, segmento longo com pouco texto
+CPS_MAX = 25.0    # acima disso, texto demais para o tempo
+MIN_SLOW_DURATION = 2.0
+DURATION_Z = 4.0  # desvios absolutos medianos
+RANGE_GAP = 1.0   # segundos entre marcações que ainda contam como um intervalo
+
+FLAGS = ("loop", "silence", "low_confidence", "timing")
+
+
+def load_columns(json_file):
+    """Colunas NumPy dos segmentos de uma transcrição."""
+    return columns_from_segments(list(iter_segments(json_file, fields=FIELDS)))
+
+
+def columns_from_segments(segments):
+    """Colunas NumPy de uma lista de segmentos já carregada."""
+    texts = [s.get("text", "").strip() for s in segments]
+    n = len(segments)
+
+    def column(key, default):
+        return np.fromiter((s.get(key, default) for s in segments), dtype=np.float64, count=n)
+
+    return {
+        "start": column("start", 0.0),
+        "end": column("end", 0.0),
+        "avg_logprob": column("avg_logprob", 0.0),
+        "no_speech_prob": column("no_speech_prob", 0.0),
+        "compression_ratio": column("compression_ratio", 0.0),
+        "chars": np.fromiter((len(t) for t in texts), dtype=np.float64, count=n),
+        "text_hash": np.fromiter((hash(t) for t in texts), dtype=np.int64, count=n),
+        "texts": texts,
+    }
+
+
+def flag_segments(cols):
+    """Máscaras booleanas por tipo de problema."""
+    duration = np.maximum(cols["end"] - cols["start"], 0.01)
+    cps = cols["chars"] / duration
+
+    repeated = np.zeros(len(duration), dtype=bool)
+    repeated[1:] = (cols["text_hash"][1:] == cols["text_hash"][:-1]) & (cols["chars"][1:] > 0)
+
+    median = np.median(duration) if len(duration) else 0.0
+    mad = np.median(np.abs(duration - median)) if len(duration) else 0.0
+    z = np.abs(duration - median) / (1.4826 * mad) if mad > 0 else np.zeros_like(duration)
+
+    # Sem fala segundo o modelo, mas com texto pouco confiável ou esparso
+    no_speech = cols["no_speech_prob"] > NO_SPEECH_LIMIT
+    hallucinated = (cols["avg_logprob"] < LOGPROB_LIMIT) | ((cols["chars"] > 0) & (cps < CPS_MIN))
+
+    return {
+        "loop": (cols["compression_ratio"] > COMPRESSION_LIMIT) | repeated,
+        "silence": no_speech & hallucinated,
+        "low_confidence": cols["avg_logprob"] < LOGPROB_LIMIT,
+        "timing": (cps > CPS_MAX) | ((cps < CPS_MIN) & (duration > MIN_SLOW_DURATION)) | (z > DURATION_Z),
+    }
+
+
+def flag_ranges(mask, starts, ends, gap=RANGE_GAP):
+    """Junta segmentos marcados e próximos em intervalos [(início, fim)]."""
+    idx = np.flatnonzero(mask)
+    if not len(idx):
+        return []
+    # Novo intervalo quando o próximo marcado começa a mais de `gap` s do anterior
+    breaks = np.flatnonzero(starts[idx[1:]] - ends[idx[:-1]] > gap)
+    firsts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    lasts = np.concatenate((idx[breaks], [idx[-1]]))
+    return [(round(float(starts[a]), 2), round(float(ends[b]), 2)) for a, b in zip(firsts, lasts)]
+
+
+def quality_report(cols):
+    """Estatísticas e intervalos marcados de uma transcrição."""
+    duration = cols["end"] - cols["start"]
+    total = float(duration.sum())
+    masks = flag_segments(cols)
+    any_flag = np.logical_or.reduce(list(masks.values())) if len(duration) else np.zeros(0, bool)
+
+    report = {
+        "segments": int(len(duration)),
+        "audio_seconds": round(float(cols["end"].max()), 2) if len(duration) else 0.0,
+        "avg_duration": round(float(duration.mean()), 2) if len(duration) else 0.0,
+        "avg_logprob": round(float(np.average(cols["avg_logprob"], weights=duration)), 3) if total > 0 else None,
+        "chars_per_second": round(float(cols["chars"].sum() / total), 2) if total > 0 else None,
+        "flagged_seconds": round(float(duration[any_flag].sum()), 2),
+        "flagged_percent": round(100 * float(duration[any_flag].sum()) / total, 2) if total > 0 else 0.0,
+        "flags": {},
+    }
+    for name in FLAGS:
+        report["flags"][name] = {
+            "segments": int(masks[name].sum()),
+            "seconds": round(float(duration[masks[name]].sum()), 2),
+            "ranges": flag_ranges(masks[name], cols["start"], cols["end"]),
+        }
+    return report
+
+
+def compare(files):
+    """Relatórios de várias versões, na ordem dada."""
+    return {str(f): quality_report(load_columns(f)) for f in files}
+
+
+def print_comparison(reports):
+    names = [Path(f).stem for f in reports]
+    width = max(12, *(len(n) for n in names))
+    rows = [
+        ("segmentos", lambda r: r["segments"]),
+        ("duração média", lambda r: f"{r['avg_duration']:.2f}s"),
+        ("avg_logprob", lambda r: r["avg_logprob"]),
+        ("caracteres/s", lambda r: r["chars_per_second"]),
+        *[(name, lambda r, name=name: f"{r['flags'][name]['segments']} ({r['flags'][name]['seconds']:.0f}s)")
+          for name in FLAGS],
+        ("marcado", lambda r: f"{r['flagged_percent']:.1f}%"),
+    ]
+    print("📊 " + "".ljust(16) + "".join(n.rjust(width + 2) for n in names))
+    for label, get in rows:
+        print("   " + label.ljust(16) + "".join(str(get(r)).rjust(width + 2) for r in reports.values()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relatório de qualidade de transcrições do Whisper")
+    parser.add_argument("inputs", nargs="+", help="JSONs do Whisper (várias versões para comparar)")
+    parser.add_argument("--json", help="grava os relatórios completos em JSON")
+    parser.add_argument("--max-flagged", type=float, help="falha se mais que N%% do áudio for marcado")
+    args = parser.parse_args()
+
+    reports = compare(args.inputs)
+    print_comparison(reports)
+    for f, report in reports.items():
+        ranges = sum(len(report["flags"][name]["ranges"]) for name in FLAGS)
+        if ranges:
+            print(f"⚠️ {Path(f).name}: {ranges} intervalos marcados")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if args.max_flagged is not None:
+        failed = [f for f, r in reports.items() if r["flagged_percent"] > args.max_flagged]
+        for f in failed:
+            print(f"❌ {f}: {reports[f]['flagged_percent']:.1f}% marcado (limite {args.max_flagged}%)")
+        if failed:
+            sys.exit(1)
+        print("✅ Todas as transcrições dentro do limite")
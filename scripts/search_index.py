@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Índice invertido posicional para busca no livro, com tempos do áudio
+
+Cada palavra do texto é normalizada (minúsculas, sem acentos: "Príncipito"
+→ "principito"; o "ñ" é mantido) e recebe uma posição global no livro.
+Para cada termo guardamos a lista ordenada de posições, o que permite
+buscar palavras, prefixos e frases exatas (mesmo atravessando segmentos)
+e devolver o segmento com start/end para o leitor pular até o trecho.
+
+Formato serializado (<livro>.search.json), pensado para ser lido também
+pelo server.js:
+- "terms": termos ordenados (prefixo = busca binária);
+- "postings": posições codificadas em delta + varint, em base64, com
+  "postingOffsets" marcando o início de cada termo;
+- "offsets": primeira posição de cada segmento; "start"/"end" em ms.
+"""
+import base64
+import bisect
+import json
+import re
+import sys
+from pathlib import Path
+
+from segment_stream import iter_segments
+from tracing import traced
+
+INDEX_VERSION = 1
+
+_FOLD = str.maketrans("áéíóúüàèìòùâêîôûäëïö", "aeiouuaeiouaeiouaeio")
+_TOKEN = re.compile(r"\w+")
+
+
+def fold(text):
+    """Minúsculas e sem acentos, para comparar "Príncipito" com "principito"."""
+    return text.lower().translate(_FOLD)
+
+
+def tokenize(text):
+    return _TOKEN.findall(fold(text))
+
+
+def encode_postings(positions):
+    """Posições ordenadas → bytes (deltas em varint)."""
+    out = bytearray()
+    prev = 0
+    for pos in positions:
+        delta = pos - prev
+        prev = pos
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(data, start=0, end=None):
+    positions = []
+    pos = value = shift = 0
+    for byte in data[start:end]:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            pos += value
+            positions.append(pos)
+            value = shift = 0
+    return positions
+
+
+@traced("search_index")
+def build_search_index(segments):
+    """Constrói o índice posicional a partir de segmentos do Whisper."""
+    postings = {}
+    offsets, starts, ends = [], [], []
+    position = 0
+    for segment in segments:
+        offsets.append(position)
+        starts.append(round(segment["start"] * 1000))
+        ends.append(round(segment["end"] * 1000))
+        for term in tokenize(segment.get("text", "")):
+            postings.setdefault(term, []).append(position)
+            position += 1
+    offsets.append(position)
+
+    terms = sorted(postings)
+    blob = bytearray()
+    posting_offsets = []
+    for term in terms:
+        posting_offsets.append(len(blob))
+        blob += encode_postings(postings[term])
+    posting_offsets.append(len(blob))
+
+    return {
+        "version": INDEX_VERSION,
+        "terms": terms,
+        "postingOffsets": posting_offsets,
+        "postings": base64.b64encode(bytes(blob)).decode("ascii"),
+        "offsets": offsets,
+        "start": starts,
+        "end": ends,
+    }
+
+
+def write_search_index(index, out_file):
+    Path(out_file).write_text(
+        json.dumps(index, ensure_ascii=False, separators=(",", ":")),
+        encoding="utf-8",
+    )
+
+
+def default_output(json_file):
+    json_file = Path(json_file)
+    return json_file.with_name(f"{json_file.stem}.search.json")
+
+
+class SearchIndex:
+    """Consultas sobre um índice serializado (palavra, prefixo, frase)."""
+
+    def __init__(self, index):
+        self.terms = index["terms"]
+        self.posting_offsets = index["postingOffsets"]
+        self.blob = base64.b64decode(index["postings"])
+        self.offsets = index["offsets"]
+        self.starts = index["start"]
+        self.ends = index["end"]
+        self._cache = {}
+
+    @classmethod
+    def load(cls, path):
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def positions(self, term):
+        """Posições globais de um termo já normalizado."""
+        cached = self._cache.get(term)
+        if cached is not None:
+            return cached
+        i = bisect.bisect_left(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return []
+        positions = decode_postings(self.blob, self.posting_offsets[i], self.posting_offsets[i + 1])
+        self._cache[term] = positions
+        return positions
+
+    def _hits(self, positions, length=1, limit=None):
+        """Posições → [{segment, start, end}] sem repetir segmento."""
+        hits = []
+        last = None
+        for pos in positions:
+            if limit is not None and len(hits) >= limit:
+                break
+            seg = bisect.bisect_right(self.offsets, pos) - 1
+            if seg == last:
+                continue
+            last_seg = bisect.bisect_right(self.offsets, pos + length - 1) - 1
+            hits.append({"segment": seg, "start": self.starts[seg] / 1000, "end": self.ends[last_seg] / 1000})
+            last = seg
+        return hits
+
+    def word(self, word):
+        terms = tokenize(word)
+        if not terms:
+            return []
+        return self._hits(self.positions(terms[0])) if len(terms) == 1 else self.phrase(word)
+
+    def prefix(self, prefix, limit=50):
+        """Segmentos com palavras que começam por `prefix`."""
+        prefix = fold(prefix.strip())
+        if not prefix:
+            return []
+        i = bisect.bisect_left(self.terms, prefix)
+        positions = []
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            positions.extend(self.positions(self.terms[i]))
+            i += 1
+        return self._hits(sorted(positions), limit=limit)
+
+    def phrase(self, text, limit=None):
+        """Segmentos onde as palavras de `text` aparecem em sequência."""
+        terms = tokenize(text)
+        if not terms:
+            return []
+        # Começa pelo termo mais raro e confere os vizinhos em conjuntos
+        lists = [self.positions(t) for t in terms]
+        rarest = min(range(len(terms)), key=lambda k: len(lists[k]))
+        others = [(k - rarest, set(lists[k])) for k in range(len(terms)) if k != rarest]
+        found = [
+            pos - rarest for pos in lists[rarest]
+            if all(pos + delta in positions for delta, positions in others)
+        ]
+        return self._hits(found, len(terms), limit)
+
+    def search(self, query, limit=50):
+        """Frase entre aspas, prefixo com "*" no fim, ou palavras em sequência."""
+        query = query.strip()
+        if query.endswith("*"):
+            return self.prefix(query[:-1], limit)
+        return self.phrase(query.strip('"'), limit)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 search_index.py input.json [output.search.json] [--query TEXTO]")
+        sys.exit(1)
+
+    args = sys.argv[1:]
+    query = None
+    if "--query" in args:
+        i = args.index("--query")
+        query = " ".join(args[i + 1:])
+        args = args[:i]
+
+    in_file = Path(args[0])
+    if in_file.name.endswith(".search.json"):
+        search = SearchIndex.load(in_file)
+    else:
+        out_file = Path(args[1]) if len(args) > 1 else default_output(in_file)
+        index = build_search_index(iter_segments(in_file))
+        write_search_index(index, out_file)
+        print(f"✅ Índice de busca gerado em {out_file}")
+        print(f"📊 {len(index['terms'])} termos, {index['offsets'][-1]} palavras, "
+              f"{out_file.stat().st_size // 1024} KB")
+        search = SearchIndex(index)
+
+    if query:
+        for hit in search.search(query):
+            print(f"  🔎 {hit['start']:8.2f}s – {hit['end']:8.2f}s  segmento {hit['segment']}")
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Leitura incremental dos segmentos de um JSON do Whisper
+
+Percorre o arquivo em blocos, entrega um segmento por vez e só decodifica
+os campos pedidos (por exemplo start, end e text). Os demais valores —
+listas de tokens, o "text" duplicado no topo do documento, estatísticas
+do decoder — são pulados sem virar objetos Python, então a memória fica
+limitada pelo maior segmento e não pelo tamanho do livro.
+
+Com partial=True um arquivo truncado (Whisper ainda gravando) devolve os
+segmentos completos até o ponto do corte em vez de falhar.
+"""
+import io
+import json
+import re
+import sys
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_FIELDS = ("start", "end", "text")
+
+_WS = re.compile(rb"[ \t\r\n]*")
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.S)
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+_SCALAR = re.compile(rb"[^,\]}\s]+")
+
+
+class TruncatedTranscript(ValueError):
+    """O JSON terminou antes de fechar a lista de segmentos."""
+
+
+class _Scanner:
+    """Cursor sobre um buffer de bytes que cresce sob demanda."""
+
+    def __init__(self, f, offset=0):
+        self.f = f
+        self.buf = b""
+        self.pos = 0
+        self.base = offset
+        self.mark = None
+        self.eof = False
+
+    @property
+    def offset(self):
+        return self.base + self.pos
+
+    def _more(self):
+        if self.eof:
+            raise TruncatedTranscript(f"JSON truncado no byte {self.offset}")
+        # Descarta o que já foi consumido, preservando o valor marcado
+        cut = self.pos if self.mark is None else min(self.mark, self.pos)
+        if cut:
+            self.buf = self.buf[cut:]
+            self.base += cut
+            self.pos -= cut
+            if self.mark is not None:
+                self.mark -= cut
+        data = self.f.read(CHUNK_SIZE)
+        if not data:
+            self.eof = True
+            raise TruncatedTranscript(f"JSON truncado no byte {self.offset}")
+        self.buf += data
+
+    def peek(self):
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            self._more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido no byte {self.offset}: esperado {char.decode()}")
+        self.pos += 1
+
+    def _skip_string(self):
+        self.pos += 1
+        while True:
+            self.pos = _STRING_BODY.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) and self.buf[self.pos] == 0x22:
+                self.pos += 1
+                return
+            self._more()
+
+    def skip_value(self):
+        char = self.peek()
+        if char == b'"':
+            self._skip_string()
+        elif char in (b"[", b"{"):
+            self.pos += 1
+            depth = 1
+            while depth:
+                m = _STRUCTURAL.search(self.buf, self.pos)
+                if not m:
+                    self.pos = len(self.buf)
+                    self._more()
+                    continue
+                self.pos = m.start()
+                if self.buf[self.pos] == 0x22:
+                    self._skip_string()
+                elif self.buf[self.pos] in b"[{":
+                    depth += 1
+                    self.pos += 1
+                else:
+                    depth -= 1
+                    self.pos += 1
+        else:
+            # _more() preserva o buffer a partir de pos, que fica no início do escalar
+            while True:
+                end = _SCALAR.match(self.buf, self.pos).end()
+                if end < len(self.buf):
+                    break
+                self._more()
+            self.pos = end
+
+    def read_value(self):
+        self.peek()
+        self.mark = self.pos
+        try:
+            self.skip_value()
+            raw = self.buf[self.mark:self.pos]
+        finally:
+            self.mark = None
+        return json.loads(raw)
+
+
+def _read_segment(scanner, fields):
+    scanner.expect(b"{")
+    segment = {}
+    if scanner.peek() == b"}":
+        scanner.pos += 1
+        return segment
+    while True:
+        key = scanner.read_value()
+        scanner.expect(b":")
+        if fields is None or key in fields:
+            segment[key] = scanner.read_value()
+        else:
+            scanner.skip_value()
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == b"}":
+            return segment
+        if char != b",":
+            raise ValueError(f"JSON inválido no byte {scanner.offset - 1}")
+
+
+def _iter_array(scanner, fields, resumed=False):
+    # resumed: o cursor está logo depois de um segmento já lido
+    if not resumed:
+        if scanner.peek() == b"]":
+            scanner.pos += 1
+            return
+        yield _read_segment(scanner, fields)
+    while True:
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == b"]":
+            return
+        if char != b",":
+            raise ValueError(f"JSON inválido no byte {scanner.offset - 1}")
+        yield _read_segment(scanner, fields)
+
+
+def _iter_document(scanner, fields):
+    scanner.expect(b"{")
+    if scanner.peek() == b"}":
+        return
+    while True:
+        key = scanner.read_value()
+        scanner.expect(b":")
+        if key == "segments":
+            scanner.expect(b"[")
+            # O resto do documento ("language" etc.) não interessa aqui
+            yield from _iter_array(scanner, fields)
+            return
+        scanner.skip_value()
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == b"}":
+            return
+        if char != b",":
+            raise ValueError(f"JSON inválido no byte {scanner.offset - 1}")
+
+
+def iter_segments(json_file, fields=DEFAULT_FIELDS, partial=False):
+    """Gera os segmentos um a um, só com os campos pedidos.
+
+    fields=None mantém todos os campos. Com partial=True um arquivo
+    truncado encerra a iteração no último segmento completo; sem ele,
+    TruncatedTranscript é lançada.
+    """
+    fields = None if fields is None else frozenset(fields)
+    with open(json_file, "rb") as f:
+        scanner = _Scanner(f)
+        try:
+            yield from _iter_document(scanner, fields)
+        except TruncatedTranscript:
+            if not partial:
+                raise
+
+
+def iter_segments_from(json_file, offset=None, fields=DEFAULT_FIELDS):
+    """(segmento, byte logo após ele) de um arquivo possivelmente truncado.
+
+    Com `offset` (um valor devolvido antes) retoma a leitura dali em vez
+    de reler o arquivo desde o início: acompanhar um JSON que cresce custa
+    só os segmentos novos. Para no último segmento completo.
+    """
+    fields = None if fields is None else frozenset(fields)
+    with open(json_file, "rb") as f:
+        if offset is None:
+            scanner = _Scanner(f)
+            segments = _iter_document(scanner, fields)
+        else:
+            f.seek(offset)
+            scanner = _Scanner(f, offset)
+            segments = _iter_array(scanner, fields, resumed=True)
+        try:
+            for segment in segments:
+                yield segment, scanner.offset
+        except TruncatedTranscript:
+            return
+
+
+def segment_spans(data):
+    """(início, fim) em bytes de cada segmento de um documento completo.
+
+    Recortar `data` nesses pontos e juntar os pedaços devolve os mesmos
+    bytes, o que permite comparar versões segmento a segmento.
+    """
+    scanner = _Scanner(io.BytesIO(data))
+    spans = []
+    scanner.expect(b"{")
+    if scanner.peek() == b"}":
+        return spans
+    while True:
+        key = scanner.read_value()
+        scanner.expect(b":")
+        if key == "segments":
+            scanner.expect(b"[")
+            if scanner.peek() == b"]":
+                return spans
+            while True:
+                scanner.peek()
+                start = scanner.offset
+                scanner.skip_value()
+                spans.append((start, scanner.offset))
+                char = scanner.peek()
+                scanner.pos += 1
+                if char == b"]":
+                    return spans
+                if char != b",":
+                    raise ValueError(f"JSON inválido no byte {scanner.offset - 1}")
+        scanner.skip_value()
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == b"}":
+            return spans
+        if char != b",":
+            raise ValueError(f"JSON inválido no byte {scanner.offset - 1}")
+
+
+def count_segments(json_file, partial=False):
+    """Conta os segmentos sem decodificar nenhum campo."""
+    return sum(1 for _ in iter_segments(json_file, fields=(), partial=partial))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 segment_stream.py input.json [campo ...]")
+        sys.exit(1)
+
+    wanted = tuple(sys.argv[2:]) or DEFAULT_FIELDS
+    for seg in iter_segments(sys.argv[1], fields=wanted, partial=True):
+        print(json.dumps(seg, ensure_ascii=False))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Instrumentação do pipeline: spans, contadores e pico de memória
+
+    from tracing import span, count, traced
+
+    with span("html.write", file=str(out_file)):
+        path.write_text(...)
+    count("segments", len(segments))
+
+Desligado (o padrão) tudo vira no-op: span() devolve sempre o mesmo
+objeto vazio e count() retorna na primeira linha. Liga com a variável
+TRANSCRIPT_TRACE=arquivo.json (ou --trace nos scripts que aceitam) e, no
+fim do processo, grava um JSON no formato trace-event do Chrome (abre em
+chrome://tracing ou ui.perfetto.dev) e imprime um resumo por etapa.
+TRANSCRIPT_TRACE_MEMORY=1 (--trace-memory) liga o tracemalloc e anota em
+cada span o pico de memória alocada acima do início dele.
+
+Processos de um pool não gravam arquivo próprio: devolvem collect() junto
+com o resultado e o processo principal chama merge().
+
+Uso: python3 tracing.py trace.json   (resumo de um trace já gravado)
+"""
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+ENV_TRACE = "TRANSCRIPT_TRACE"
+ENV_MEMORY = "TRANSCRIPT_TRACE_MEMORY"
+
+_enabled = False
+_memory = False
+_path = None
+_owner = None  # pid do processo que grava o arquivo
+_events = []
+_counters = {}
+_local = threading.local()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _now_us():
+    # CLOCK_MONOTONIC é do sistema: tempos de processos diferentes se alinham
+    return time.perf_counter_ns() / 1000
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "mem_start", "peak")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        if _memory:
+            current, peak = tracemalloc.get_traced_memory()
+            stack = _stack()
+            if stack:
+                # O pico até aqui pertence ao span de fora; zera para medir este
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.mem_start, self.peak = current, 0
+            stack.append(self)
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        end = _now_us()
+        args = self.args
+        if _memory:
+            _, peak = tracemalloc.get_traced_memory()
+            stack = _stack()
+            stack.pop()
+            self.peak = max(self.peak, peak)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            args = {**args, "peak_kb": round((self.peak - self.mem_start) / 1024, 1)}
+        _events.append({
+            "name": self.name, "cat": "pipeline", "ph": "X",
+            "ts": self.start, "dur": end - self.start,
+            "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+        })
+        return False
+
+
+def span(name, **args):
+    """Context manager que mede um trecho; no-op quando desligado."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Decorador: cada chamada vira um span (nome padrão: módulo.função)."""
+    def decorate(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(label, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Soma `value` ao contador `name` (aparece como série no trace)."""
+    if not _enabled:
+        return
+    total = _counters[name] = _counters.get(name, 0) + value
+    _events.append({"name": name, "ph": "C", "ts": _now_us(), "pid": os.getpid(), "args": {name: total}})
+
+
+def enabled():
+    return _enabled
+
+
+def enable(path=None, memory=False):
+    """Liga a coleta; com `path`, grava o trace e o resumo ao sair."""
+    global _enabled, _memory, _path, _owner
+    _enabled = True
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if path and _path is None:
+        _path = Path(path)
+        _owner = os.getpid()
+        atexit.register(_write_at_exit)
+        # Processos filhos iniciados por spawn ligam a coleta pelo ambiente
+        os.environ[ENV_TRACE] = str(path)
+        os.environ[ENV_MEMORY] = "1" if memory else "0"
+    _name_process(Path(sys.argv[0]).stem or "python")
+
+
+def _name_process(name):
+    _events.append({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": name}})
+
+
+def collect():
+    """Eventos gravados neste processo até agora (e esquece-os)."""
+    events = _events[:]
+    _events.clear()
+    return events
+
+
+def merge(events):
+    """Junta eventos vindos de outro processo (ver collect)."""
+    _events.extend(events)
+
+
+def summarize(events):
+    """{nome: {count, total_ms, mean_ms, max_ms, peak_kb}} dos spans."""
+    table = {}
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        row = table.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "peak_kb": None})
+        ms = event["dur"] / 1000
+        row["count"] += 1
+        row["total_ms"] += ms
+        row["max_ms"] = max(row["max_ms"], ms)
+        peak = event.get("args", {}).get("peak_kb")
+        if peak is not None:
+            row["peak_kb"] = max(row["peak_kb"] or 0, peak)
+    for row in table.values():
+        row["mean_ms"] = row["total_ms"] / row["count"]
+    return dict(sorted(table.items(), key=lambda item: -item[1]["total_ms"]))
+
+
+def counters_from(events):
+    """Último valor de cada contador, somado entre processos."""
+    last = {}
+    for event in events:
+        if event.get("ph") == "C":
+            last[(event["pid"], event["name"])] = event["args"][event["name"]]
+    totals = {}
+    for (_, name), value in last.items():
+        totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def print_summary(events, out=sys.stderr):
+    table = summarize(events)
+    if not table:
+        return
+    print(f"📊 {'etapa':<32}{'chamadas':>9}{'total ms':>11}{'média ms':>11}{'máx ms':>10}{'pico KB':>10}", file=out)
+    for name, row in table.items():
+        peak = f"{row['peak_kb']:.0f}" if row["peak_kb"] is not None else "—"
+        print(f"   {name:<32}{row['count']:>9}{row['total_ms']:>11.1f}{row['mean_ms']:>11.2f}"
+              f"{row['max_ms']:>10.1f}{peak:>10}", file=out)
+    for name, value in counters_from(events).items():
+        print(f"   🔢 {name}: {value}", file=out)
+
+
+def write_trace(path=None):
+    """Grava o trace-event JSON com todos os eventos coletados."""
+    path = Path(path or _path)
+    data = {"traceEvents": _events, "displayTimeUnit": "ms"}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def _write_at_exit():
+    # Filhos de um pool (fork ou spawn) herdam o estado mas não gravam o arquivo
+    if os.getpid() != _owner or multiprocessing.parent_process() is not None:
+        return
+    path = write_trace()
+    print_summary(_events)
+    print(f"🧭 Trace salvo em {path} (chrome://tracing ou ui.perfetto.dev)", file=sys.stderr)
+
+
+def _reset_in_child():
+    _events.clear()
+    _counters.clear()
+    _local.stack = []
+    if _enabled:
+        _name_process(f"worker {os.getpid()}")
+
+
+os.register_at_fork(after_in_child=_reset_in_child)
+
+if os.environ.get(ENV_TRACE):
+    enable(os.environ[ENV_TRACE], memory=os.environ.get(ENV_MEMORY, "") not in ("", "0"))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 tracing.py trace.json")
+        sys.exit(1)
+    trace = json.loads(Path(sys.argv[1]).read_text(encoding="utf-8"))
+    print_summary(trace["traceEvents"], out=sys.stdout)
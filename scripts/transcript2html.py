@@ -1,30 +1,40 @@
 #!/usr/bin/env python3
+import argparse
 import json
-import re
+import os
 import sys
 from pathlib import Path
 from html import escape
 
-def load_segments(json_file):
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    # Whisper JSON geralmente tem "segments"
-    return data.get("segments", [])
+from chapters import ChapterDetector, chapter_title, find_chapters
+from cue_export import write_vtt
+from segment_stream import TruncatedTranscript, iter_segments, iter_segments_from
+from tracing import count, enable, span, traced
 
-def normalize_capitulo(text):
-    """Transforma 'capitulo 1' em 'Capítulo 1'."""
-    text = text.strip().capitalize()
-    return text.replace("capitulo", "Capítulo").replace("í", "í")
+# Fim do cue "next": bem além de qualquer áudio (100 h)
+OUTSIDE_END = 360000.0
 
-def export_html(segments, out_file, audio_path):
-    capitulo_re = re.compile(r"^cap[ií]tulo\s+(\d+|[a-záéíóú]+)", re.IGNORECASE)
+@traced("load_segments")
+def load_segments(json_file):
+    if Path(json_file).suffix == ".tbin":
+        from transcript_bin import TranscriptReader
+        with TranscriptReader(json_file) as reader:
+            return list(reader)
 
-    story = []
-    toc = []
-    chapter_counter = 0
+    # Whisper JSON geralmente tem "segments"; tokens e afins são pulados
+    return list(iter_segments(json_file, fields=("start", "end", "text")))
 
-    # Cabeçalho HTML
-    story.append(f"""<!DOCTYPE html>
+def shard_path(out_file, index):
+    """Arquivo do shard `index` (o primeiro mantém o nome pedido)."""
+    out_file = Path(out_file)
+    if index == 0:
+        return out_file
+    return out_file.with_name(f"{out_file.stem}-{index + 1}{out_file.suffix}")
+
+def _html_head(audio_path, track=None):
+    # Trilha "metadata" não aparece na tela, mas o navegador dispara cuechange nela
+    track_tag = f'\n  <track kind="metadata" src="{track}" default>' if track else ""
+    return f"""<!DOCTYPE html>
 <html lang="es">
 <head>
 <meta charset="UTF-8">
@@ -36,6 +46,7 @@ h1,h2 {{ color: #c55; }}
 .line.highlight {{ background: #ffff99; }}
 .word {{ border-bottom: 1px dotted gray; cursor: help; }}
 #toc {{ background: #f4f4f4; padding: 10px; border-radius: 6px; }}
+.shard-nav {{ margin: 16px 0; }}
 </style>
 </head>
 <body>
@@ -43,71 +54,430 @@ h1,h2 {{ color: #c55; }}
 <h1>El Principito</h1>
 
 <audio id="player" controls>
-  <source src="{audio_path}" type="audio/mp4">
+  <source src="{audio_path}" type="audio/mp4">{track_tag}
 </audio>
 
 <h2>Sumário</h2>
 <ul id="toc">
-""")
-
-    body_parts = []
-
-    for seg in segments:
-        text = escape(seg.get("text", "").strip())
-        start = seg.get("start", 0)
-        end = seg.get("end", 0)
+"""
 
-        m = capitulo_re.match(text.lower())
-        if m:
-            chapter_counter += 1
-            chap_id = f"capitulo_{chapter_counter}"
-            cap_title = normalize_capitulo(text)
-            toc.append(f"<li><a href='#{chap_id}'>{cap_title}</a></li>")
-            body_parts.append(f"<h2 id='{chap_id}'>{cap_title}</h2>")
-        else:
-            body_parts.append(
-                f"<p class='line' data-start='{start}' data-end='{end}'>{text}</p>"
-            )
-
-    story.extend(toc)
-    story.append("</ul>")
-    story.extend(body_parts)
-
-    # Script JS
-    story.append("""
+def _player_script(starts, ends, prev_page, next_page, live=None, track=False, next_start=None):
+    # Fronteiras já ordenadas: o navegador só faz busca binária nelas.
+    # next_start: primeiro início do próximo shard; a pausa entre os dois fica neste
+    return f"""
 <script>
+const TRACK = {json.dumps(track)};
+const STARTS = {json.dumps(starts)};
+const ENDS = {json.dumps(ends)};
+const NEXT_PAGE = {json.dumps(next_page)};
+const PREV_PAGE = {json.dumps(prev_page)};
+const NEXT_START = {json.dumps(next_start)};
+const LIVE = {json.dumps(live)};
 const audio = document.getElementById("player");
-const lines = document.querySelectorAll(".line");
-
-audio.addEventListener("timeupdate", () => {
-  const current = audio.currentTime;
-  lines.forEach(line => {
-    const start = parseFloat(line.dataset.start);
-    const end = parseFloat(line.dataset.end);
-    if (current >= start && current <= end) {
-      line.classList.add("highlight");
-      line.scrollIntoView({ behavior: "smooth", block: "center" });
-    } else {
-      line.classList.remove("highlight");
-    }
-  });
-});
+const lines = document.getElementsByClassName("line");
+const PAGE = location.pathname.split("/").pop();
+let cameFrom = new URLSearchParams(location.search).get("from");
+let current = -1;
+let hint = 0;
+
+function locate(t) {{
+  // Caso comum: mesma linha ou a seguinte à última posição conhecida
+  for (let i = hint; i < hint + 2 && i < STARTS.length; i++) {{
+    if (STARTS[i] <= t && (i + 1 === STARTS.length || STARTS[i + 1] > t)) return i;
+  }}
+  let lo = 0, hi = STARTS.length - 1, found = -1;
+  while (lo <= hi) {{
+    const mid = (lo + hi) >> 1;
+    if (STARTS[mid] <= t) {{ found = mid; lo = mid + 1; }} else {{ hi = mid - 1; }}
+  }}
+  return found;
+}}
+
+function activate(index) {{
+  if (index === current) return;
+  if (current !== -1) lines[current].classList.remove("highlight");
+  current = index;
+  if (current !== -1) {{
+    lines[current].classList.add("highlight");
+    lines[current].scrollIntoView({{ behavior: "smooth", block: "center" }});
+  }}
+}}
+
+function leaveShard(t) {{
+  // Este shard vai do seu primeiro início até o primeiro do próximo; nunca volta
+  // direto para a página de onde se acabou de chegar
+  const end = NEXT_START === null ? Infinity : NEXT_START;
+  if (t >= STARTS[0] && t < end) {{
+    cameFrom = null;
+    return false;
+  }}
+  const page = t >= end ? NEXT_PAGE : PREV_PAGE;
+  if (!page || audio.paused || page === cameFrom) return false;
+  location.href = page + "?t=" + t.toFixed(2) + "&from=" + encodeURIComponent(PAGE);
+  return true;
+}}
+
+if (!TRACK) {{
+  audio.addEventListener("timeupdate", () => {{
+    const t = audio.currentTime;
+    if (!STARTS.length || leaveShard(t)) return;
+    const i = locate(t);
+    hint = Math.max(i, 0);
+    activate(i !== -1 && t <= ENDS[i] ? i : -1);
+  }});
+}}
+
+if (TRACK) {{
+  // Um cue por linha (id = índice da linha) e "prev"/"next" fora do shard:
+  // o próprio navegador avisa a troca, sem timeupdate
+  const cues = audio.textTracks[0];
+  cues.mode = "hidden";
+  const outside = () => Array.from(cues.activeCues || []).some(cue => cue.id === "prev" || cue.id === "next");
+  cues.addEventListener("cuechange", () => {{
+    if (outside() && leaveShard(audio.currentTime)) return;
+    const active = Array.from(cues.activeCues).filter(cue => cue.id !== "prev" && cue.id !== "next");
+    activate(active.length ? Number(active[active.length - 1].id) : -1);
+  }});
+  // Buscou fora do shard com o áudio pausado: o cue já está ativo quando o play chega
+  audio.addEventListener("play", () => {{
+    if (outside()) leaveShard(audio.currentTime);
+  }});
+}}
+
+if (LIVE) {{
+  // Transcrição em andamento: busca só os bytes novos do fragmento (Range) e o sumário atual
+  const content = document.getElementById("live");
+  const toc = document.getElementById("toc");
+  let loaded = 0;
+  async function poll() {{
+    let state = null;
+    try {{
+      state = await (await fetch(LIVE.state, {{ cache: "no-store" }})).json();
+      if (state.bytes < loaded) {{
+        // O fragmento recomeçou (JSON reescrito): a página é refeita do zero
+        location.reload();
+        return;
+      }}
+      if (state.bytes > loaded) {{
+        const response = await fetch(LIVE.body, {{
+          cache: "no-store",
+          headers: {{ Range: `bytes=${{loaded}}-${{state.bytes - 1}}` }}
+        }});
+        let data = await response.arrayBuffer();
+        if (response.status !== 206) data = data.slice(loaded, state.bytes);
+        content.insertAdjacentHTML("beforeend", new TextDecoder().decode(data));
+        loaded = state.bytes;
+        for (let i = STARTS.length; i < lines.length; i++) {{
+          STARTS.push(parseFloat(lines[i].dataset.start));
+          ENDS.push(parseFloat(lines[i].dataset.end));
+        }}
+        toc.replaceChildren(...state.toc.map(([id, title]) => {{
+          const item = document.createElement("li");
+          const link = document.createElement("a");
+          link.href = "#" + id;
+          link.textContent = title;
+          item.append(link);
+          return item;
+        }}));
+      }}
+    }} catch (error) {{
+      console.log("Aguardando transcrição...", error);
+    }}
+    if (state && state.error) console.log("Transcrição interrompida:", state.error);
+    if (!state || !(state.done || state.error)) setTimeout(poll, LIVE.interval);
+  }}
+  poll();
+}}
+
+const resumeAt = new URLSearchParams(location.search).get("t");
+if (resumeAt !== null) {{
+  audio.addEventListener("loadedmetadata", () => {{
+    audio.currentTime = parseFloat(resumeAt);
+    audio.play().catch(() => {{}});
+  }}, {{ once: true }});
+}}
 </script>
 </body></html>
-""")
+"""
 
-    Path(out_file).write_text("\n".join(story), encoding="utf-8")
-    print(f"✅ HTML gerado em {out_file}")
+def segment_parts(seg, chapters):
+    """Partes de um segmento na ordem: ("line", texto, início, fim) e
+    ("chapter", capítulo, tempo, tempo) para cada marcador do segmento."""
+    text = seg.get("text", "").strip()
+    start = seg.get("start", 0)
+    end = seg.get("end", 0)
 
-if __name__ == "__main__":
-    if len(sys.argv) < 4:
-        print("Uso: python3 transcript2html_sync.py input.json output.html audio/El-Principito.m4a")
+    # O marcador pode estar no meio do segmento: texto antes, título, texto depois
+    pos, t = 0, start
+    for chapter in chapters:
+        offset = chapter["offset"]
+        marker_time = chapter.get("start")
+        if marker_time is None:
+            marker_time = start + (end - start) * offset / max(len(text), 1)
+        before = text[pos:offset].strip()
+        if before:
+            yield "line", before, t, marker_time
+        yield "chapter", chapter, marker_time, marker_time
+        pos, t = offset + chapter["length"], marker_time
+
+    rest = text[pos:].strip()
+    if rest:
+        yield "line", rest, t, end
+
+def build_shards(segments, chapters, max_lines=None):
+    """(sumário, shards): o corpo do HTML já partido em no máximo max_lines linhas."""
+    by_segment = {}
+    for chapter in chapters:
+        by_segment.setdefault(chapter["segment"], []).append(chapter)
+
+    toc = []
+    chapter_counter = 0
+
+    # Cada shard guarda suas partes do corpo e as fronteiras das suas linhas
+    shards = [{"body": [], "starts": [], "ends": [], "texts": []}]
+
+    def add_line(text, start, end):
+        if max_lines and len(shards[-1]["starts"]) >= max_lines:
+            shards.append({"body": [], "starts": [], "ends": [], "texts": []})
+        shard = shards[-1]
+        shard["body"].append(f"<p class='line'>{escape(text)}</p>")
+        shard["starts"].append(round(start, 3))
+        shard["ends"].append(round(end, 3))
+        shard["texts"].append(text)
+
+    for seg_index, seg in enumerate(segments):
+        for kind, value, start, end in segment_parts(seg, by_segment.get(seg_index, ())):
+            if kind == "line":
+                add_line(value, start, end)
+                continue
+            chapter_counter += 1
+            chap_id = f"capitulo_{chapter_counter}"
+            if max_lines and len(shards[-1]["starts"]) >= max_lines:
+                shards.append({"body": [], "starts": [], "ends": [], "texts": []})
+            toc.append((len(shards) - 1, chap_id, value["title"]))
+            shards[-1]["body"].append(f"<h2 id='{chap_id}'>{value['title']}</h2>")
+    return toc, shards
+
+def export_html(segments, out_file, audio_path, max_lines=None, chapters=None, track=False):
+    """chapters: tabela de capítulos (chapters.chapter_table); sem ela os
+    marcadores são procurados no texto e o corte é interpolado no tempo.
+    track: grava <página>.vtt com um cue por linha e a página destaca as
+    linhas pelo cuechange do <track>, sem busca a cada timeupdate."""
+    if chapters is None:
+        chapters = find_chapters(segments)
+    with span("html.build", segments=len(segments)):
+        toc, shards = build_shards(segments, chapters, max_lines)
+
+    sharded = len(shards) > 1
+    names = [shard_path(out_file, i).name for i in range(len(shards))]
+
+    for index, shard in enumerate(shards):
+        path = shard_path(out_file, index)
+        track_file = path.with_suffix(".vtt") if track else None
+        story = [_html_head(audio_path, track_file.name if track else None)]
+        for toc_shard, chap_id, cap_title in toc:
+            href = f"{names[toc_shard]}#{chap_id}" if sharded else f"#{chap_id}"
+            story.append(f"<li><a href='{href}'>{cap_title}</a></li>")
+        story.append("</ul>")
+
+        prev_page = names[index - 1] if index > 0 else None
+        next_page = names[index + 1] if index + 1 < len(shards) else None
+        if sharded:
+            nav = [f"Parte {index + 1} de {len(shards)}"]
+            if prev_page:
+                nav.insert(0, f"<a href='{prev_page}'>◀ Anterior</a>")
+            if next_page:
+                nav.append(f"<a href='{next_page}'>Próxima ▶</a>")
+            story.append(f"<div class='shard-nav'>{' | '.join(nav)}</div>")
+
+        story.extend(shard["body"])
+        next_start = None
+        if next_page:
+            following = shards[index + 1]["starts"] or shard["ends"][-1:]
+            next_start = following[0] if following else None
+        story.append(_player_script(shard["starts"], shard["ends"], prev_page, next_page,
+                                    track=track, next_start=next_start))
+
+        with span("html.write", file=path.name):
+            data = "\n".join(story).encode("utf-8")
+            path.write_bytes(data)
+            if track:
+                # Uma linha inteira por cue: os tempos de cada palavra não chegam até aqui
+                cues = [(start, end, [(text, start, end)], i) for i, (start, end, text)
+                        in enumerate(zip(shard["starts"], shard["ends"], shard["texts"]))]
+                # Cues "prev"/"next" cobrem o áudio dos outros shards: entrar neles troca de página
+                if prev_page and shard["starts"]:
+                    cues.insert(0, (0, shard["starts"][0], [("◀", 0, 0)], "prev"))
+                if next_start is not None:
+                    cues.append((next_start, OUTSIDE_END, [("▶", 0, 0)], "next"))
+                write_vtt(cues, track_file)
+        count("html_bytes", len(data))
+        print(f"✅ HTML gerado em {path}")
+
+class LiveExport:
+    """HTML de uma transcrição que ainda está sendo gravada.
+
+    A página (out_file) é escrita uma vez; cada atualização lê só os
+    segmentos novos (retomando do último byte lido) e os acrescenta como
+    fragmento em <livro>.live.html, que a página busca com Range. O
+    sumário e o tamanho do fragmento ficam em <livro>.live.json.
+    """
+
+    FIELDS = ("start", "end", "text")
+    FINGERPRINT = 64  # bytes antes do ponto de retomada que precisam continuar iguais
+
+    def __init__(self, json_file, out_file, audio_path, interval=5.0):
+        self.json_file = Path(json_file)
+        self.out_file = Path(out_file)
+        self.audio_path = audio_path
+        self.interval = interval
+        self.body_file = self.out_file.with_name(f"{self.out_file.stem}.live.html")
+        self.state_file = self.out_file.with_name(f"{self.out_file.stem}.live.json")
+        self.reset()
+
+    def reset(self):
+        self.offset = None
+        self.fingerprint = b""
+        self.segments = 0
+        self.detector = ChapterDetector()
+        self.toc = []
+        self.body_file.write_bytes(b"")
+        self._write_state(done=False)
+        live = {"body": self.body_file.name, "state": self.state_file.name, "interval": int(self.interval * 1000)}
+        page = [_html_head(self.audio_path), "</ul>", "<div id='live'></div>", _player_script([], [], None, None, live)]
+        self.out_file.write_text("\n".join(page), encoding="utf-8")
+
+    def _write_state(self, done, error=None):
+        state = {"segments": self.segments, "bytes": self.body_file.stat().st_size,
+                 "toc": self.toc, "done": done}
+        if error:
+            state["error"] = error
+        tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.state_file)
+
+    def _rewritten(self):
+        """O arquivo foi reescrito (não só cresceu) desde a última leitura?"""
+        if self.offset is None:
+            return False
+        try:
+            with open(self.json_file, "rb") as f:
+                f.seek(self.offset - len(self.fingerprint))
+                return f.read(len(self.fingerprint)) != self.fingerprint
+        except FileNotFoundError:
+            return True
+
+    def update(self):
+        """Acrescenta os segmentos novos; devolve quantos foram lidos."""
+        if self._rewritten():
+            self.reset()
+        parts = []
+        added = 0
+        try:
+            for seg, offset in iter_segments_from(self.json_file, self.offset, self.FIELDS):
+                chapters = []
+                for marker in self.detector.scan(seg.get("text", "").strip()):
+                    chapters.append({"title": chapter_title(marker.number), "offset": marker.start,
+                                     "length": marker.end - marker.start})
+                for kind, value, start, end in segment_parts(seg, chapters):
+                    if kind == "line":
+                        parts.append(f"<p class='line' data-start='{round(start, 3)}' "
+                                     f"data-end='{round(end, 3)}'>{escape(value)}</p>\n")
+                    else:
+                        chap_id = f"capitulo_{len(self.toc) + 1}"
+                        self.toc.append((chap_id, value["title"]))
+                        parts.append(f"<h2 id='{chap_id}'>{value['title']}</h2>\n")
+                self.offset = offset
+                added += 1
+        except (FileNotFoundError, ValueError):
+            pass
+        if added:
+            with open(self.json_file, "rb") as f:
+                f.seek(max(self.offset - self.FINGERPRINT, 0))
+                self.fingerprint = f.read(self.offset - f.tell())
+            # Fragmento primeiro, estado depois: o leitor nunca pede bytes que ainda não existem
+            with open(self.body_file, "a", encoding="utf-8") as f:
+                f.write("".join(parts))
+            self.segments += added
+            self._write_state(done=False)
+        return added
+
+    def finish(self, chapters=None):
+        """Gera o HTML completo no lugar da página ao vivo.
+
+        Se o JSON ficou truncado (Whisper morto no meio da gravação), a
+        página ao vivo é mantida, o estado recebe "error" e a exceção sobe.
+        """
+        self.update()
+        try:
+            segments = load_segments(self.json_file)
+        except TruncatedTranscript as error:
+            self._write_state(done=False, error=str(error))
+            raise
+        export_html(segments, self.out_file, self.audio_path, chapters=chapters)
+        self._write_state(done=True)
+
+
+def follow_html(json_file, out_file, audio_path, model=None, pid=None, interval=5.0):
+    """Renderiza a transcrição enquanto o Whisper grava e a completa no fim."""
+    from whisper_watch import wait_for_transcript
+
+    live = LiveExport(json_file, out_file, audio_path, interval)
+    live.update()
+    print(f"👀 Acompanhando {json_file} → {out_file}")
+
+    def on_change(size):
+        added = live.update()
+        if added:
+            print(f"📝 +{added} segmentos ({live.segments} no total, {len(live.toc)} capítulos)")
+
+    wait_for_transcript(json_file, pid=pid, model=model, on_change=on_change, require_change=False)
+    try:
+        live.finish()
+    except TruncatedTranscript as error:
+        print(f"❌ {json_file} ficou incompleto ({error}); a página ao vivo foi mantida com "
+              f"{live.segments} segmentos")
         sys.exit(1)
+    print(f"✅ Transcrição concluída: {live.segments} segmentos")
 
-    in_file = Path(sys.argv[1])
-    out_file = Path(sys.argv[2])
-    audio_path = sys.argv[3]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gera HTML sincronizado com o áudio a partir de um JSON do Whisper",
+        usage="python3 transcript2html.py input.json output.html audio/El-Principito.m4a [--max-lines N | --follow]",
+    )
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("audio")
+    parser.add_argument("--max-lines", type=int, default=None,
+                        help="divide a saída em vários arquivos com no máximo N linhas cada")
+    parser.add_argument("--chapters", default=None,
+                        help="tabela de capítulos (chapters.py); padrão: <input>.chapters.json, se existir")
+    parser.add_argument("--track", action="store_true",
+                        help="grava <saida>.vtt e sincroniza as linhas pelo <track> do áudio (cuechange)")
+    parser.add_argument("--follow", action="store_true",
+                        help="acompanha um JSON ainda em gravação e atualiza o HTML a cada lote de segmentos")
+    parser.add_argument("--model", default=None, help="com --follow: modelo do Whisper a acompanhar")
+    parser.add_argument("--pid", type=int, default=None, help="com --follow: PID do Whisper")
+    parser.add_argument("--trace", default=None, help="grava um trace do Chrome com o tempo de cada etapa")
+    parser.add_argument("--trace-memory", action="store_true", help="com --trace: pico de memória por etapa")
+    args = parser.parse_args()
+    if args.trace:
+        enable(args.trace, memory=args.trace_memory)
 
-    segments = load_segments(in_file)
-    export_html(segments, out_file, audio_path)
+    if args.follow:
+        if args.max_lines:
+            parser.error("--follow não divide a saída: remova --max-lines")
+        follow_html(args.input, args.output, args.audio, model=args.model, pid=args.pid)
+        sys.exit(0)
 
+    in_file = Path(args.input)
+    out_file = Path(args.output)
+    audio_path = args.audio
+
+    chapters_file = Path(args.chapters) if args.chapters else in_file.with_name(f"{in_file.stem}.chapters.json")
+    chapters = None
+    if chapters_file.exists():
+        chapters = json.loads(chapters_file.read_text(encoding="utf-8"))
+
+    segments = load_segments(in_file)
+    export_html(segments, out_file, audio_path, max_lines=args.max_lines, chapters=chapters, track=args.track)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Formato binário colunar para transcrições do Whisper (.tbin)
+
+Guarda apenas o que o leitor precisa: start/end como arrays de float64,
+todo o texto num único blob UTF-8 com tabela de offsets e, opcionalmente,
+as colunas de confiança (avg_logprob, no_speech_prob, compression_ratio).
+O leitor faz mmap do arquivo e responde "segmento no tempo t" e
+"segmentos em [t0, t1]" por busca binária, sem decodificar o resto.
+
+Layout (little-endian, seções alinhadas em 8 bytes):
+
+    header   MAGIC, versão, flags, n_segments, tamanho do texto
+    starts   float64[n]
+    ends     float64[n]
+    offsets  uint32[n + 1]       (posições no blob de texto)
+    conf     float32[n] x 3      (só se FLAG_CONFIDENCE)
+    text     bytes UTF-8
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+MAGIC = b"TBIN"
+VERSION = 1
+FLAG_CONFIDENCE = 1
+
+HEADER = struct.Struct("<4sHHIQ")
+CONFIDENCE_FIELDS = ("avg_logprob", "no_speech_prob", "compression_ratio")
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _le_bytes(typecode, values):
+    arr = array(typecode, values)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def pack_segments(segments, out_file, confidence=True):
+    """Escreve uma lista de segmentos do Whisper no formato .tbin."""
+    starts, ends, offsets = [], [], [0]
+    text_parts = []
+    conf = {field: [] for field in CONFIDENCE_FIELDS}
+    has_conf = confidence
+
+    pos = 0
+    for seg in segments:
+        starts.append(float(seg.get("start", 0)))
+        ends.append(float(seg.get("end", 0)))
+        encoded = seg.get("text", "").strip().encode("utf-8")
+        text_parts.append(encoded)
+        pos += len(encoded)
+        offsets.append(pos)
+        if has_conf:
+            if all(field in seg for field in CONFIDENCE_FIELDS):
+                for field in CONFIDENCE_FIELDS:
+                    conf[field].append(float(seg[field]))
+            else:
+                # Transcrições sintéticas não têm estatísticas do decoder
+                has_conf = False
+
+    if pos > 0xFFFFFFFF:
+        raise ValueError("Texto grande demais para offsets de 32 bits")
+
+    flags = FLAG_CONFIDENCE if has_conf and segments else 0
+    sections = [
+        _le_bytes("d", starts),
+        _le_bytes("d", ends),
+        _le_bytes("I", offsets),
+    ]
+    if flags & FLAG_CONFIDENCE:
+        sections.extend(_le_bytes("f", conf[field]) for field in CONFIDENCE_FIELDS)
+    sections.append(b"".join(text_parts))
+
+    with open(out_file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, flags, len(starts), pos))
+        written = HEADER.size
+        for section in sections:
+            padding = _align(written) - written
+            f.write(b"\0" * padding)
+            f.write(section)
+            written += padding + len(section)
+
+    return len(starts)
+
+
+def convert(json_file, out_file, confidence=True):
+    """Converte um JSON do Whisper em .tbin."""
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return pack_segments(data.get("segments", []), out_file, confidence)
+
+
+class TranscriptReader:
+    """Acesso aleatório por tempo a um arquivo .tbin via mmap."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap de arquivo vazio não é permitido
+            self._file.close()
+            raise ValueError(f"Arquivo .tbin inválido: {path}")
+        self._buf = memoryview(self._mm)
+
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise ValueError(f"Arquivo .tbin inválido: {path}")
+        magic, version, flags, n, text_size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Arquivo .tbin inválido: {path}")
+
+        self.count = n
+        self.has_confidence = bool(flags & FLAG_CONFIDENCE)
+
+        pos = _align(HEADER.size)
+        self.starts, pos = self._column("d", pos, n)
+        self.ends, pos = self._column("d", pos, n)
+        self._offsets, pos = self._column("I", pos, n + 1)
+        self._conf = {}
+        if self.has_confidence:
+            for field in CONFIDENCE_FIELDS:
+                self._conf[field], pos = self._column("f", pos, n)
+        pos = _align(pos)
+        self._text = self._buf[pos:pos + text_size]
+
+    def _column(self, typecode, pos, length):
+        pos = _align(pos)
+        size = struct.calcsize(typecode) * length
+        raw = self._buf[pos:pos + size]
+        if sys.byteorder == "little":
+            column = raw.cast(typecode)
+        else:
+            # array(typecode, memoryview) faria um elemento por byte
+            column = array(typecode)
+            column.frombytes(raw)
+            column.byteswap()
+        return column, pos + size
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Libera as views antes de fechar o mmap."""
+        for attr in ("starts", "ends", "_offsets", "_text"):
+            view = self.__dict__.pop(attr, None)
+            if isinstance(view, memoryview):
+                view.release()
+        for view in self.__dict__.pop("_conf", {}).values():
+            if isinstance(view, memoryview):
+                view.release()
+        if getattr(self, "_buf", None) is not None:
+            self._buf.release()
+            self._buf = None
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def text(self, i):
+        return bytes(self._text[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def segment(self, i):
+        """Reconstrói o segmento i no formato do Whisper."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        seg = {
+            "id": i,
+            "start": self.starts[i],
+            "end": self.ends[i],
+            "text": self.text(i),
+        }
+        for field, column in self._conf.items():
+            seg[field] = column[i]
+        return seg
+
+    def index_at(self, t):
+        """Índice do segmento que contém t, ou -1 se t cai num intervalo vazio."""
+        i = bisect_right(self.starts, t) - 1
+        if i >= 0 and t <= self.ends[i]:
+            return i
+        return -1
+
+    def segment_at(self, t):
+        i = self.index_at(t)
+        return self.segment(i) if i >= 0 else None
+
+    def segments_between(self, t0, t1):
+        """Segmentos que se sobrepõem ao intervalo [t0, t1]."""
+        # Os ends são monotônicos nos JSON do Whisper, então a busca vale
+        first = bisect_left(self.ends, t0)
+        last = bisect_right(self.starts, t1)
+        return [self.segment(i) for i in range(first, last)]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.segment(i)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python3 transcript_bin.py input.json output.tbin [--no-confidence]")
+        sys.exit(1)
+
+    in_file = Path(sys.argv[1])
+    out_file = Path(sys.argv[2])
+    confidence = "--no-confidence" not in sys.argv[3:]
+
+    count = convert(in_file, out_file, confidence)
+    print(f"✅ {count} segmentos gravados em {out_file}")
+    print(f"📦 {in_file.stat().st_size} → {out_file.stat().st_size} bytes")
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Armazenamento de versões de transcrições por hash de conteúdo
+
+Em vez de copiar o JSON inteiro a cada backup (el-principito-original.json,
+-small-original.json, -tiny-backup.json...), cada versão é guardada uma
+única vez em transcriptions/.store/, identificada pelo sha256 dos bytes:
+
+- objects/ab/cdef...   objeto comprimido com zlib: o documento inteiro ou
+                       um delta por segmentos contra outra versão (só os
+                       segmentos que mudaram; o resto é cópia da base);
+- refs/<livro>/<nome>  hash da versão que o nome ("tiny", "small",
+                       "current"...) aponta, trocado atomicamente;
+- logs/<livro>.jsonl   histórico de cada troca de ref.
+
+Salvar de novo uma versão que já existe não grava nada além da ref, e a
+versão seguinte de um livro custa só os segmentos diferentes.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from segment_stream import segment_spans
+
+STORE_DIR = Path("transcriptions/.store")
+MAX_CHAIN = 8         # deltas seguidos antes de gravar o documento inteiro de novo
+COMPRESS_LEVEL = 6
+
+_SENTENCE = re.compile(rb"[^.?!]*(?:[.?!]+|$)", re.S)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _sentences(data):
+    return [piece for piece in _SENTENCE.findall(data) if piece]
+
+
+def split_chunks(data):
+    """Bytes do documento em pedaços: cabeçalho, um por segmento, final.
+
+    Cada segmento leva junto o separador até o próximo; b"".join(pedaços)
+    devolve `data` exatamente. O cabeçalho repete o texto do livro inteiro
+    ("text" do Whisper) e é quebrado em frases, para que corrigir uma
+    palavra não mude o cabeçalho todo.
+    """
+    try:
+        spans = segment_spans(data)
+    except ValueError:
+        return _sentences(data)
+    if not spans:
+        return _sentences(data)
+    cuts = [start for start, _ in spans] + [spans[-1][1], len(data)]
+    return _sentences(data[:cuts[0]]) + [data[a:b] for a, b in zip(cuts, cuts[1:])]
+
+
+def make_delta(base_chunks, chunks):
+    """Operações que levam de `base_chunks` a `chunks`.
+
+    ["c", i, j] copia os pedaços i:j da base; ["i", [...]] insere pedaços novos.
+    """
+    matcher = SequenceMatcher(None, base_chunks, chunks, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["c", i1, i2])
+        elif j2 > j1:
+            ops.append(["i", [c.decode("utf-8") for c in chunks[j1:j2]]])
+    return ops
+
+
+def apply_delta(base_chunks, ops):
+    chunks = []
+    for op in ops:
+        if op[0] == "c":
+            chunks.extend(base_chunks[op[1]:op[2]])
+        else:
+            chunks.extend(c.encode("utf-8") for c in op[1])
+    return chunks
+
+
+class TranscriptStore:
+    """Objetos por hash de conteúdo, refs nomeadas e histórico por livro."""
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.logs = self.root / "logs"
+
+    def _object_path(self, digest):
+        return self.objects / digest[:2] / digest[2:]
+
+    def _write_atomic(self, path, data):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def has(self, digest):
+        return self._object_path(digest).exists()
+
+    def _read_object(self, digest):
+        """(cabeçalho, corpo) de um objeto."""
+        try:
+            raw = zlib.decompress(self._object_path(digest).read_bytes())
+        except FileNotFoundError:
+            raise KeyError(f"versão {digest[:12]} não está no store") from None
+        header, _, body = raw.partition(b"\n")
+        return json.loads(header), body
+
+    def chain_length(self, digest):
+        length = 0
+        header, _ = self._read_object(digest)
+        while header["type"] == "delta":
+            length += 1
+            header, _ = self._read_object(header["base"])
+        return length
+
+    def put(self, data, base=None):
+        """Guarda uma versão (bytes) e devolve o hash; não regrava o que já existe.
+
+        Com `base` (hash de uma versão parecida, em geral a da ref atual)
+        grava só o delta por segmentos, se ele for menor que o documento.
+        """
+        digest = content_hash(data)
+        if self.has(digest):
+            return digest
+
+        full = zlib.compress(json.dumps({"type": "blob"}).encode() + b"\n" + data, COMPRESS_LEVEL)
+        stored = full
+        if base and base != digest and self.has(base) and self.chain_length(base) < MAX_CHAIN:
+            ops = make_delta(split_chunks(self.get(base)), split_chunks(data))
+            header = json.dumps({"type": "delta", "base": base}).encode()
+            body = json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            delta = zlib.compress(header + b"\n" + body, COMPRESS_LEVEL)
+            if len(delta) < len(full):
+                stored = delta
+        self._write_atomic(self._object_path(digest), stored)
+        return digest
+
+    def get(self, digest):
+        """Bytes de uma versão, reconstruindo a cadeia de deltas."""
+        header, body = self._read_object(digest)
+        if header["type"] == "blob":
+            data = body
+        else:
+            ops = json.loads(body)
+            data = b"".join(apply_delta(split_chunks(self.get(header["base"])), ops))
+        if content_hash(data) != digest:
+            raise ValueError(f"versão {digest[:12]} corrompida no store")
+        return data
+
+    def resolve(self, book, name):
+        """Hash apontado por uma ref (ou o próprio hash/prefixo), ou None."""
+        ref = self.refs_dir / book / name
+        if ref.exists():
+            return ref.read_text().strip()
+        if len(name) >= 6 and all(c in "0123456789abcdef" for c in name):
+            folder = self.objects / name[:2]
+            matches = sorted(p.name for p in folder.glob(f"{name[2:]}*")) if folder.is_dir() else []
+            if len(matches) == 1:
+                return name[:2] + matches[0]
+        return None
+
+    def refs(self, book):
+        folder = self.refs_dir / book
+        if not folder.is_dir():
+            return {}
+        return {p.name: p.read_text().strip() for p in sorted(folder.iterdir()) if not p.name.endswith(".tmp")}
+
+    def set_ref(self, book, name, digest, message=""):
+        """Aponta a ref para `digest` (troca atômica) e registra no histórico."""
+        if not self.has(digest):
+            raise KeyError(f"versão {digest[:12]} não está no store")
+        old = self.refs(book).get(name)
+        self._write_atomic(self.refs_dir / book / name, f"{digest}\n".encode())
+        if old != digest:
+            entry = {"time": round(time.time(), 3), "ref": name, "old": old, "new": digest, "message": message}
+            self.logs.mkdir(parents=True, exist_ok=True)
+            with open(self.logs / f"{book}.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return old
+
+    def history(self, book, name=None):
+        """Trocas de ref de um livro, da mais recente para a mais antiga."""
+        try:
+            lines = (self.logs / f"{book}.jsonl").read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return []
+        entries = [json.loads(line) for line in lines if line.strip()]
+        return [e for e in reversed(entries) if name is None or e["ref"] == name]
+
+    def save(self, book, path, refs=("current",), message=""):
+        """Guarda o arquivo como nova versão do livro e move as refs para ela."""
+        data = Path(path).read_bytes()
+        base = next(filter(None, (self.resolve(book, r) for r in (*refs, "current"))), None)
+        digest = self.put(data, base)
+        for name in refs:
+            self.set_ref(book, name, digest, message or Path(path).name)
+        return digest
+
+    def checkout(self, book, name, out_file):
+        """Grava a versão apontada por `name` em `out_file` (escrita atômica)."""
+        digest = self.resolve(book, name)
+        if digest is None:
+            raise KeyError(f"ref {book}/{name} não existe")
+        self._write_atomic(Path(out_file), self.get(digest))
+        return digest
+
+    def disk_usage(self):
+        return sum(p.stat().st_size for p in self.objects.rglob("*") if p.is_file())
+
+
+def book_id(path):
+    return Path(path).stem.split("-original")[0].split("-backup")[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versões de transcrições por hash de conteúdo")
+    parser.add_argument("--store", default=str(STORE_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("save", help="guarda um JSON e aponta refs para ele")
+    p.add_argument("file")
+    p.add_argument("--book", help="padrão: nome do arquivo")
+    p.add_argument("--ref", action="append", help="ref a mover (repetível; padrão: current)")
+    p.add_argument("-m", "--message", default="")
+
+    p = sub.add_parser("checkout", help="restaura uma versão num arquivo")
+    p.add_argument("book")
+    p.add_argument("ref", help="nome da ref ou prefixo do hash")
+    p.add_argument("out")
+
+    p = sub.add_parser("refs", help="lista as refs de um livro")
+    p.add_argument("book")
+
+    p = sub.add_parser("log", help="histórico de trocas de ref")
+    p.add_argument("book")
+    p.add_argument("ref", nargs="?")
+    args = parser.parse_args()
+
+    store = TranscriptStore(args.store)
+    if args.command == "save":
+        book = args.book or book_id(args.file)
+        digest = store.save(book, args.file, args.ref or ["current"], args.message)
+        print(f"💾 {args.file} → {book} {digest[:12]} ({', '.join(args.ref or ['current'])})")
+        print(f"📦 Store ocupa {store.disk_usage() // 1024} KB")
+    elif args.command == "checkout":
+        digest = store.checkout(args.book, args.ref, args.out)
+        print(f"✅ {args.book}/{args.ref} ({digest[:12]}) restaurado em {args.out}")
+    elif args.command == "refs":
+        for name, digest in store.refs(args.book).items():
+            print(f"  🏷️ {name:<10} {digest[:12]}")
+    else:
+        for entry in store.history(args.book, args.ref):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["time"]))
+            old = entry["old"][:12] if entry["old"] else "—"
+            print(f"  {when}  {entry['ref']:<10} {old} → {entry['new'][:12]}  {entry['message']}")
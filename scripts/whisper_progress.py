@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Progresso e throughput medidos de uma transcrição do Whisper
+
+Lê o "end" do último segmento concluído — do JSON parcial ou das linhas
+"[00:01.000 --> 00:05.000]" que o Whisper imprime no stdout — e calcula
+percentual concluído, fator de tempo real (segundos de áudio por segundo
+de relógio) e ETA. Cada amostra sai como uma linha JSON e num arquivo de
+texto no formato do Prometheus (node_exporter textfile collector).
+
+Ao terminar, o fator de tempo real medido é guardado por modelo, e as
+próximas execuções estimam a duração de tiny/base/small a partir dele em
+vez de chutes fixos.
+
+Uso:
+    whisper audio.mp3 --model small --language es | \\
+        python3 scripts/whisper_progress.py --model small --duration 6150
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HISTORY_FILE = Path("transcriptions/.throughput.json")
+MODELS = ("tiny", "base", "small")
+TAIL_BYTES = 64 * 1024
+
+_STDOUT_LINE = re.compile(
+    r"\[(?:(\d+):)?(\d+):(\d+(?:\.\d+)?) --> (?:(\d+):)?(\d+):(\d+(?:\.\d+)?)\]"
+)
+_JSON_END = re.compile(rb'"end"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)\s*[,}]')
+
+
+def parse_stdout_end(line):
+    """Tempo final de uma linha de progresso do Whisper, ou None."""
+    m = _STDOUT_LINE.search(line)
+    if not m:
+        return None
+    hours, minutes, seconds = m.group(4), m.group(5), m.group(6)
+    return int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def last_segment_end(json_file):
+    """"end" do último segmento gravado, lendo só o final do arquivo."""
+    try:
+        with open(json_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - TAIL_BYTES))
+            tail = f.read()
+    except FileNotFoundError:
+        return None
+    matches = _JSON_END.findall(tail)
+    return float(matches[-1]) if matches else None
+
+
+def load_history(path=HISTORY_FILE):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_throughput(model, audio_seconds, wall_seconds, path=HISTORY_FILE):
+    """Guarda o fator de tempo real de uma execução concluída."""
+    if wall_seconds <= 0 or audio_seconds <= 0:
+        return None
+    history = load_history(path)
+    runs = history.setdefault(model, [])
+    runs.append({"rtf": audio_seconds / wall_seconds, "audio": audio_seconds, "wall": wall_seconds})
+    del runs[:-20]  # Mantém as 20 execuções mais recentes
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return runs[-1]["rtf"]
+
+
+def measured_rtf(model, history=None):
+    """Média ponderada por áudio dos fatores de tempo real medidos."""
+    runs = (history if history is not None else load_history()).get(model) or []
+    audio = sum(r["audio"] for r in runs)
+    wall = sum(r["wall"] for r in runs)
+    return audio / wall if wall > 0 else None
+
+
+def estimate_eta(model, duration, history=None):
+    """Segundos estimados para transcrever `duration` com `model`, ou None."""
+    rtf = measured_rtf(model, history)
+    return duration / rtf if rtf else None
+
+
+class ProgressTracker:
+    """Converte "áudio concluído até t" em métricas de progresso."""
+
+    def __init__(self, model, duration, book="el-principito", jsonl=None, prom_file=None):
+        self.model = model
+        self.duration = float(duration)
+        self.book = book
+        self.jsonl = jsonl if jsonl is not None else sys.stdout
+        self.prom_file = Path(prom_file) if prom_file else None
+        self.started = time.monotonic()
+        self.done = 0.0
+        self.history = load_history()
+
+    def set_start(self, wall_time):
+        """Conta o tempo a partir de `wall_time` (time.time()), e não da criação do tracker."""
+        self.started = time.monotonic() - max(0.0, time.time() - wall_time)
+
+    def update(self, audio_done):
+        """Registra progresso (segundos de áudio concluídos) e emite a amostra."""
+        if audio_done is None or audio_done <= self.done:
+            return None
+        self.done = min(audio_done, self.duration)
+        sample = self.sample()
+        self.jsonl.write(json.dumps(sample) + "\n")
+        self.jsonl.flush()
+        if self.prom_file:
+            self.write_prometheus(sample)
+        return sample
+
+    def sample(self):
+        elapsed = time.monotonic() - self.started
+        rtf = self.done / elapsed if elapsed > 0 else None
+        remaining = self.duration - self.done
+        eta = remaining / rtf if rtf else None
+        return {
+            "ts": round(time.time(), 3),
+            "book": self.book,
+            "model": self.model,
+            "audio_done": round(self.done, 2),
+            "audio_total": self.duration,
+            "percent": round(100 * self.done / self.duration, 2) if self.duration else None,
+            "elapsed": round(elapsed, 2),
+            "rtf": round(rtf, 3) if rtf else None,
+            "eta": round(eta, 1) if eta is not None else None,
+            "eta_by_model": {
+                model: (round(est, 1) if (est := estimate_eta(model, self.duration, self.history)) else None)
+                for model in MODELS
+            },
+        }
+
+    def write_prometheus(self, sample):
+        labels = f'book="{self.book}",model="{self.model}"'
+        lines = [
+            "# HELP whisper_audio_seconds_done Segundos de áudio já transcritos",
+            "# TYPE whisper_audio_seconds_done gauge",
+            f"whisper_audio_seconds_done{{{labels}}} {sample['audio_done']}",
+            "# HELP whisper_audio_seconds_total Duração total do áudio",
+            "# TYPE whisper_audio_seconds_total gauge",
+            f"whisper_audio_seconds_total{{{labels}}} {sample['audio_total']}",
+            "# HELP whisper_progress_ratio Fração do áudio concluída",
+            "# TYPE whisper_progress_ratio gauge",
+            f"whisper_progress_ratio{{{labels}}} {sample['audio_done'] / sample['audio_total']:.4f}",
+        ]
+        if sample["rtf"] is not None:
+            lines += [
+                "# HELP whisper_realtime_factor Segundos de áudio por segundo de relógio",
+                "# TYPE whisper_realtime_factor gauge",
+                f"whisper_realtime_factor{{{labels}}} {sample['rtf']}",
+                "# HELP whisper_eta_seconds Tempo restante estimado",
+                "# TYPE whisper_eta_seconds gauge",
+                f"whisper_eta_seconds{{{labels}}} {sample['eta']}",
+            ]
+        measured = [(m, measured_rtf(m, self.history)) for m in MODELS]
+        measured = [(m, rtf) for m, rtf in measured if rtf]
+        if measured:
+            lines += [
+                "# HELP whisper_model_realtime_factor Fator de tempo real medido em execuções anteriores",
+                "# TYPE whisper_model_realtime_factor gauge",
+            ]
+            lines += [f'whisper_model_realtime_factor{{model="{m}"}} {rtf:.3f}' for m, rtf in measured]
+
+        # Escrita atômica para o coletor nunca ler um arquivo pela metade
+        tmp = self.prom_file.with_name(self.prom_file.name + ".tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp, self.prom_file)
+
+    def finish(self):
+        """Grava o throughput medido no histórico do modelo."""
+        elapsed = time.monotonic() - self.started
+        return record_throughput(self.model, self.done, elapsed)
+
+
+def probe_duration(audio_file):
+    """Duração do áudio via ffprobe, se disponível."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(audio_file)],
+            capture_output=True, text=True, check=True,
+        )
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Métricas de progresso do Whisper")
+    parser.add_argument("--model", required=True, choices=MODELS)
+    parser.add_argument("--duration", type=float, help="duração do áudio em segundos")
+    parser.add_argument("--audio", help="arquivo de áudio (duração via ffprobe)")
+    parser.add_argument("--book", default="el-principito")
+    parser.add_argument("--transcript", help="lê o JSON parcial em vez do stdin")
+    parser.add_argument("--jsonl", help="arquivo de saída das amostras (padrão: stdout)")
+    parser.add_argument("--prom", help="arquivo .prom para o textfile collector")
+    args = parser.parse_args()
+
+    duration = args.duration or (probe_duration(args.audio) if args.audio else None)
+    if not duration:
+        print("⚠️ Informe --duration ou --audio (com ffprobe instalado)", file=sys.stderr)
+        sys.exit(1)
+
+    out = open(args.jsonl, "a", encoding="utf-8") if args.jsonl else sys.stdout
+    tracker = ProgressTracker(args.model, duration, args.book, jsonl=out, prom_file=args.prom)
+
+    if args.transcript:
+        from whisper_watch import wait_for_transcript
+        wait_for_transcript(
+            args.transcript, model=args.model,
+            on_change=lambda size: tracker.update(last_segment_end(args.transcript)),
+        )
+        tracker.update(last_segment_end(args.transcript))
+    else:
+        for line in sys.stdin:
+            tracker.update(parse_stdout_end(line))
+
+    rtf = tracker.finish()
+    if rtf:
+        print(f"✅ {args.model}: {rtf:.2f}x tempo real medido", file=sys.stderr)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Observador de conclusão do Whisper orientado a eventos
+
+Substitui os loops "ps aux + sleep + json.load" dos scripts monitor_*.py:
+
+- o arquivo de saída é observado com inotify (Linux) ou, na falta dele,
+  com polling leve de os.stat;
+- o processo do Whisper é acompanhado pelo PID (pidfd no Linux acorda o
+  observador no instante em que o processo termina);
+- a conclusão é detectada por rename atômico do arquivo ou por tamanho
+  estável depois do fim do processo, sem reparsear o JSON.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+POLL_INTERVAL = 1.0
+PROCESS_RECHECK = 2.0
+
+WatchResult = namedtuple("WatchResult", "path size reason elapsed")
+
+
+def find_whisper_pids(model=None):
+    """PIDs de processos Whisper (opcionalmente de um modelo específico)."""
+    pids = []
+    proc = Path("/proc")
+    if proc.is_dir():
+        for entry in proc.iterdir():
+            if not entry.name.isdigit() or int(entry.name) == os.getpid():
+                continue
+            try:
+                args = (entry / "cmdline").read_bytes().split(b"\0")
+            except OSError:
+                continue
+            if _matches([a.decode("utf-8", "replace") for a in args if a], model):
+                pids.append(int(entry.name))
+        return pids
+
+    # Sem /proc (macOS): uma única chamada ao ps com PID e argumentos
+    result = subprocess.run(["ps", "-axo", "pid=,args="], capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        pid, _, args = line.strip().partition(" ")
+        if pid.isdigit() and int(pid) != os.getpid() and _matches(args.split(), model):
+            pids.append(int(pid))
+    return pids
+
+
+def _matches(args, model):
+    if not any("whisper" in Path(arg).name.lower() for arg in args[:3]):
+        return False
+    if any(Path(arg).name.startswith(("monitor_", "whisper_watch")) for arg in args[:3]):
+        return False
+    return model is None or model in args
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        # Zumbi ainda responde ao kill(0), mas já terminou
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        return stat.rsplit(")", 1)[1].split()[0] != "Z"
+    except (OSError, IndexError):
+        return True
+
+
+def process_start_time(pid):
+    """Instante (time.time()) em que o processo começou, ou None se não der para saber."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        ticks = int(stat.rsplit(")", 1)[1].split()[19])
+        boot = next(int(line.split()[1]) for line in Path("/proc/stat").read_text().splitlines()
+                    if line.startswith("btime "))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError, StopIteration):
+        return None
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+class _InotifyWatcher:
+    """Eventos de um diretório via inotify (carregado com ctypes)."""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch falhou em {directory}")
+
+    def wait(self, timeout, extra_fds=()):
+        """Bloqueia até haver eventos; devolve [(mask, nome)]."""
+        ready, _, _ = select.select([self.fd, *extra_fds], [], [], timeout)
+        if self.fd not in ready:
+            return [(0, None)] if ready else []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos < len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = data[pos:pos + length].rstrip(b"\0").decode("utf-8", "replace")
+            pos += length
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollWatcher:
+    """Alternativa portátil: compara os.stat em intervalos curtos."""
+
+    def __init__(self, path, interval=POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.last = _stat(path)
+
+    def wait(self, timeout, extra_fds=()):
+        delay = self.interval if timeout is None else min(self.interval, timeout)
+        if extra_fds:
+            ready, _, _ = select.select(list(extra_fds), [], [], delay)
+            if ready:
+                return [(0, None)]
+        else:
+            time.sleep(delay)
+        current = _stat(self.path)
+        if current != self.last:
+            self.last = current
+            return [(IN_MODIFY, Path(self.path).name)]
+        return []
+
+    def close(self):
+        pass
+
+
+def _make_watcher(path):
+    if sys.platform.startswith("linux"):
+        try:
+            return _InotifyWatcher(Path(path).parent or ".")
+        except (OSError, AttributeError):
+            pass
+    return _PollWatcher(path)
+
+
+def _open_pidfd(pid):
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def wait_for_transcript(path, pid=None, model=None, settle=1.0, timeout=None,
+                        on_change=None, require_change=True):
+    """Espera o Whisper terminar de gravar `path`.
+
+    pid: processo a acompanhar; sem ele, procura um processo Whisper
+    (do `model`, se informado). Conclui quando o arquivo é renomeado
+    atomicamente para `path` ou quando, com o processo encerrado, o
+    arquivo mudou em relação ao início e ficou estável por `settle`
+    segundos. on_change(size) é chamado a cada alteração observada.
+    Com require_change=False, um arquivo já existente sem Whisper rodando
+    conta como concluído de imediato. Levanta TimeoutError se `timeout`
+    segundos se passarem e ChildProcessError se o processo terminar sem
+    gravar o arquivo.
+    """
+    path = Path(path)
+    started = time.monotonic()
+    deadline = None if timeout is None else started + timeout
+
+    baseline = _stat(path)
+    last = baseline
+    stable_since = started
+
+    pids = [pid] if pid and pid_alive(pid) else ([] if pid else find_whisper_pids(model))
+    if not require_change and not pids and baseline is not None:
+        return WatchResult(path, baseline[0], "existente", 0.0)
+
+    pidfds = {p: fd for p in pids if (fd := _open_pidfd(p)) is not None}
+    last_scan = started
+    exited_at = started if pid and not pids else None
+
+    watcher = _make_watcher(path)
+    try:
+        while True:
+            now = time.monotonic()
+
+            # Processos: pidfd legível = terminou; sem pidfd, checa com kill(0)
+            for p in list(pids):
+                fd = pidfds.get(p)
+                if fd is not None:
+                    done = bool(select.select([fd], [], [], 0)[0])
+                else:
+                    done = not pid_alive(p)
+                if done:
+                    pids.remove(p)
+                    exited_at = now
+                    if fd is not None:
+                        os.close(pidfds.pop(p))
+            if not pid and not pids and now - last_scan >= PROCESS_RECHECK:
+                # Whisper ainda não tinha iniciado quando começamos a observar
+                pids = find_whisper_pids(model)
+                pidfds.update({p: fd for p in pids if (fd := _open_pidfd(p)) is not None})
+                last_scan = now
+
+            current = _stat(path)
+            if current != last:
+                last = current
+                stable_since = now
+                if on_change and current is not None:
+                    on_change(current[0])
+
+            changed = current is not None and current != baseline
+            if changed and not pids and now - stable_since >= settle:
+                return WatchResult(path, current[0], "estável", now - started)
+            if not changed and not pids and exited_at is not None and now - exited_at >= settle:
+                raise ChildProcessError(f"Whisper terminou sem gravar {path}")
+
+            if deadline is not None and now >= deadline:
+                raise TimeoutError(f"{path} não foi concluído em {timeout}s")
+
+            # Só acorda sem evento quando há algo a cronometrar
+            if changed and not pids:
+                wait = settle - (now - stable_since)
+            elif not pids and exited_at is not None:
+                wait = settle - (now - exited_at)
+            elif pids and len(pidfds) < len(pids):
+                wait = PROCESS_RECHECK
+            elif not pid and not pids:
+                wait = PROCESS_RECHECK
+            else:
+                wait = None
+            if deadline is not None:
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+
+            for mask, name in watcher.wait(max(wait, 0) if wait is not None else None,
+                                           list(pidfds.values())):
+                if name == path.name and mask & IN_MOVED_TO:
+                    st = _stat(path)
+                    if st is not None:
+                        if on_change:
+                            on_change(st[0])
+                        return WatchResult(path, st[0], "rename", time.monotonic() - started)
+    finally:
+        watcher.close()
+        for fd in pidfds.values():
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 whisper_watch.py transcricao.json [modelo|--pid PID]")
+        sys.exit(1)
+
+    target = sys.argv[1]
+    watch_pid, watch_model = None, None
+    if len(sys.argv) > 3 and sys.argv[2] == "--pid":
+        watch_pid = int(sys.argv[3])
+    elif len(sys.argv) > 2:
+        watch_model = sys.argv[2]
+
+    print(f"🎧 Observando {target}...")
+    result = wait_for_transcript(
+        target, pid=watch_pid, model=watch_model,
+        on_change=lambda size: print(f"📈 Arquivo atualizado: {size} bytes"),
+    )
+    print(f"✅ Concluído ({result.reason}) em {result.elapsed:.1f}s — {result.size} bytes")
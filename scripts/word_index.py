@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Índice de tempos por palavra, calculado offline a partir do JSON do Whisper
+
+Em vez de o navegador dividir a duração de cada segmento igualmente entre
+as palavras, cada palavra recebe um peso proporcional às suas sílabas
+(mais uma pausa após pontuação) e os tokens de timestamp do Whisper,
+quando existem, delimitam o trecho falado de cada segmento.
+
+Saída: JSON compacto com arrays paralelos ordenados por tempo
+(start/end em milissegundos, segmento e capítulo de cada palavra) que o
+leitor carrega direto e consulta com busca binária.
+"""
+import json
+import re
+import sys
+from pathlib import Path
+
+from chapters import ChapterDetector, chapter_title
+from segment_stream import iter_segments
+from tracing import traced
+
+INDEX_VERSION = 1
+
+# Tokens de timestamp do Whisper multilíngue: <|0.00|> = 50364, passo de 20 ms
+TIMESTAMP_BEGIN = 50364
+TIMESTAMP_STEP = 0.02
+FRAMES_PER_SECOND = 100
+
+# Pausas (em "sílabas") depois de pontuação
+COMMA_PAUSE = 0.5
+SENTENCE_PAUSE = 1.0
+
+_VOWEL_GROUP = re.compile(r"[aeiouáéíóúü]+")
+_STRONG = set("aeoáéó")
+_STRESSED_WEAK = set("íú")
+_WORD = re.compile(r"\S+")
+
+
+def count_syllables(word):
+    """Contagem aproximada de sílabas em espanhol (ditongos e hiatos)."""
+    syllables = 0
+    for group in _VOWEL_GROUP.findall(word.lower()):
+        syllables += 1
+        for a, b in zip(group, group[1:]):
+            # Duas vogais fortes ou uma fraca acentuada formam hiato
+            if (a in _STRONG and b in _STRONG) or a in _STRESSED_WEAK or b in _STRESSED_WEAK:
+                syllables += 1
+    if syllables == 0:
+        # Números e siglas: aproxima pelo comprimento
+        syllables = max(1, len(word) // 2)
+    return syllables
+
+
+def word_weight(word):
+    weight = count_syllables(word)
+    if word[-1] in ",;:":
+        weight += COMMA_PAUSE
+    elif word[-1] in ".?!…»":
+        weight += SENTENCE_PAUSE
+    return weight
+
+
+def speech_spans(segment):
+    """Trechos falados do segmento segundo os tokens de timestamp.
+
+    Devolve [(start, end, text_tokens)]; sem timestamps nos tokens volta
+    ao (start, end) do próprio segmento.
+    """
+    start, end = segment["start"], segment["end"]
+    tokens = segment.get("tokens") or []
+    offset = segment.get("seek", 0) / FRAMES_PER_SECOND
+
+    spans = []
+    span_start = None
+    text_tokens = 0
+    for token in tokens:
+        if token >= TIMESTAMP_BEGIN:
+            t = offset + (token - TIMESTAMP_BEGIN) * TIMESTAMP_STEP
+            if span_start is None:
+                span_start, text_tokens = t, 0
+            else:
+                if text_tokens:
+                    spans.append((span_start, t, text_tokens))
+                span_start = None if text_tokens else t
+        else:
+            text_tokens += 1
+
+    # Só confia nos tokens se estiverem dentro dos limites do segmento
+    spans = [
+        (max(a, start), min(b, end), n) for a, b, n in spans
+        if b > a and a < end and b > start
+    ]
+    return spans or [(start, end, 1)]
+
+
+def time_words(segment, weights):
+    """Distribui o tempo do segmento pelas palavras conforme os pesos."""
+    if not weights:
+        return []
+    spans = speech_spans(segment)
+    total_weight = sum(weights)
+    if total_weight == 0:
+        weights = [1] * len(weights)
+        total_weight = len(weights)
+
+    # Cada trecho recebe uma fração do peso proporcional aos seus tokens
+    total_tokens = sum(n for _, _, n in spans)
+    boundaries = []
+    acc = 0
+    for a, b, n in spans:
+        w0 = acc / total_tokens * total_weight
+        acc += n
+        w1 = acc / total_tokens * total_weight
+        boundaries.append((w0, w1, a, b))
+
+    def at(w):
+        for w0, w1, a, b in boundaries:
+            if w <= w1:
+                break
+        if w1 == w0:
+            return a
+        return a + (min(w, w1) - w0) / (w1 - w0) * (b - a)
+
+    timings = []
+    acc = 0
+    for weight in weights:
+        timings.append((at(acc), at(acc + weight)))
+        acc += weight
+    return timings
+
+
+@traced("word_index")
+def build_word_index(segments):
+    """Constrói o índice de palavras a partir de segmentos do Whisper."""
+    words, starts, ends, seg_ids, chapter_ids = [], [], [], [], []
+    chapters = []
+    detector = ChapterDetector()
+
+    for seg_index, segment in enumerate(segments):
+        text = segment.get("text", "").strip()
+        tokens = list(_WORD.finditer(text))
+        if not tokens:
+            continue
+
+        # Palavras que formam o marcador "Capítulo N" viram entrada na tabela
+        markers = detector.scan(text)
+
+        timings = time_words(segment, [word_weight(t.group()) for t in tokens])
+        for token, (start, end) in zip(tokens, timings):
+            marker = next((mk for mk in markers if mk.start <= token.start() < mk.end), None)
+            if marker is not None:
+                if not chapters or (chapters[-1]["segment"], chapters[-1]["offset"]) != (seg_index, marker.start):
+                    chapters.append({
+                        "number": marker.number,
+                        "title": chapter_title(marker.number),
+                        "start": round(start, 3),
+                        "word": len(words),
+                        "segment": seg_index,
+                        "offset": marker.start,
+                        "length": marker.end - marker.start,
+                    })
+                continue
+            words.append(token.group())
+            starts.append(round(start * 1000))
+            ends.append(round(end * 1000))
+            seg_ids.append(seg_index)
+            chapter_ids.append(len(chapters) - 1)
+
+    return {
+        "version": INDEX_VERSION,
+        "words": words,
+        "start": starts,
+        "end": ends,
+        "segment": seg_ids,
+        "chapter": chapter_ids,
+        "chapters": chapters,
+    }
+
+
+def write_word_index(index, out_file):
+    Path(out_file).write_text(
+        json.dumps(index, ensure_ascii=False, separators=(",", ":")),
+        encoding="utf-8",
+    )
+
+
+def default_output(json_file):
+    json_file = Path(json_file)
+    return json_file.with_name(f"{json_file.stem}.words.json")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 word_index.py input.json [output.words.json]")
+        sys.exit(1)
+
+    in_file = Path(sys.argv[1])
+    out_file = Path(sys.argv[2]) if len(sys.argv) > 2 else default_output(in_file)
+
+    fields = ("start", "end", "text", "tokens", "seek")
+    index = build_word_index(iter_segments(in_file, fields=fields))
+    write_word_index(index, out_file)
+    print(f"✅ Índice de palavras gerado em {out_file}")
+    print(f"📊 {len(index['words'])} palavras, {len(index['chapters'])} capítulos")
@@ -1,6 +1,7 @@
 const express = require('express');
 const axios = require('axios');
 const cors = require('cors');
+const crypto = require('crypto');
 const fs = require('fs');
 const path = require('path');
 require('dotenv').config();
@@ -8,11 +9,67 @@ require('dotenv').config();
 const app = express();
 app.use(cors());
 app.use(express.json());
-app.use(express.static('public'));
+app.use(express.static('public', { setHeaders: setAudioPartHeaders }));
+app.get('/transcriptions/published/:book/:file', servePublished);
 app.use('/transcriptions', express.static('transcriptions'));
 
+// Manifesto gerado por scripts/build_library.py
+const LIBRARY_FILE = path.join(__dirname, 'transcriptions', 'library.json');
+let libraryCache = { mtime: null, books: null };
+
+function loadLibrary() {
+  try {
+    const mtime = fs.statSync(LIBRARY_FILE).mtimeMs;
+    if (libraryCache.mtime !== mtime) {
+      libraryCache = { mtime, books: JSON.parse(fs.readFileSync(LIBRARY_FILE, 'utf8')).books };
+    }
+    return libraryCache.books;
+  } catch (error) {
+    if (error.code !== 'ENOENT') {
+      console.error('Error reading library manifest:', error.message);
+    }
+    return null;
+  }
+}
+
+function formatDuration(seconds) {
+  const total = Math.round(seconds);
+  return [Math.floor(total / 3600), Math.floor(total / 60) % 60, total % 60]
+    .map(n => String(n).padStart(2, '0')).join(':');
+}
+
+// O manifesto pode ter sido gerado sem o áudio (checkout sem public/audio): tamanho e
+// duração vêm do próprio arquivo de áudio e do índice de seek quando faltam
+function withAudioInfo(book) {
+  const filled = { ...book };
+  if (book.audioFile && (!book.fileSize || book.fileSize === 'N/A')) {
+    try {
+      const stats = fs.statSync(path.join(__dirname, 'public', 'audio', path.basename(book.audioFile)));
+      filled.fileSize = Math.round(stats.size / (1024 * 1024)) + ' MB';
+    } catch (error) {
+      if (error.code !== 'ENOENT') console.error('Audio stat error:', error.message);
+    }
+  }
+  if (!book.duration || book.duration === 'N/A') {
+    try {
+      const seek = JSON.parse(fs.readFileSync(path.join(TRANSCRIPTIONS_DIR, `${book.id}.seek.json`), 'utf8'));
+      filled.duration = formatDuration(seek.duration);
+      filled.durationSeconds = seek.duration;
+    } catch (error) {
+      if (book.durationSeconds) filled.duration = formatDuration(book.durationSeconds);
+    }
+  }
+  return filled;
+}
+
 // API para listar livros disponíveis
 app.get('/api/books', (req, res) => {
+  const library = loadLibrary();
+  if (library) {
+    return res.json(library.map(withAudioInfo));
+  }
+
+  // Sem manifesto: lista os áudios diretamente
   try {
     const audioDir = path.join(__dirname, 'public', 'audio');
     const audioFiles = fs.readdirSync(audioDir)
@@ -69,10 +126,329 @@ function getBookInfo(fileName) {
   };
 }
 
+// Busca no texto dos livros: índices gerados por scripts/search_index.py
+const TRANSCRIPTIONS_DIR = path.join(__dirname, 'transcriptions');
+const FOLD_FROM = 'áéíóúüàèìòùâêîôûäëïö';
+const FOLD_TO = 'aeiouuaeiouaeiouaeio';
+const searchIndexes = new Map();
+
+function foldText(text) {
+  return text.toLowerCase().replace(/[áéíóúüàèìòùâêîôûäëïö]/g, c => FOLD_TO[FOLD_FROM.indexOf(c)]);
+}
+
+function tokenize(text) {
+  return foldText(text).match(/[\p{L}\p{N}_]+/gu) || [];
+}
+
+function loadSearchIndex(book) {
+  const file = path.join(TRANSCRIPTIONS_DIR, `${book}.search.json`);
+  const mtime = fs.statSync(file).mtimeMs;
+  const cached = searchIndexes.get(book);
+  if (cached && cached.mtime === mtime) {
+    return cached;
+  }
+  const data = JSON.parse(fs.readFileSync(file, 'utf8'));
+  const index = {
+    mtime,
+    terms: data.terms,
+    postingOffsets: data.postingOffsets,
+    blob: Buffer.from(data.postings, 'base64'),
+    offsets: data.offsets,
+    start: data.start,
+    end: data.end,
+    cache: new Map()
+  };
+  searchIndexes.set(book, index);
+  return index;
+}
+
+function lowerBound(array, value) {
+  let lo = 0;
+  let hi = array.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (array[mid] < value) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+function upperBound(array, value) {
+  let lo = 0;
+  let hi = array.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (array[mid] <= value) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+function termPositions(index, term) {
+  if (index.cache.has(term)) {
+    return index.cache.get(term);
+  }
+  const i = lowerBound(index.terms, term);
+  if (index.terms[i] !== term) {
+    return [];
+  }
+  // Deltas em varint, como em encode_postings
+  const positions = [];
+  let pos = 0, value = 0, shift = 0;
+  for (let b = index.postingOffsets[i]; b < index.postingOffsets[i + 1]; b++) {
+    const byte = index.blob[b];
+    value += (byte & 0x7f) * 2 ** shift;
+    if (byte & 0x80) {
+      shift += 7;
+    } else {
+      pos += value;
+      positions.push(pos);
+      value = 0;
+      shift = 0;
+    }
+  }
+  index.cache.set(term, positions);
+  return positions;
+}
+
+function segmentHits(index, positions, length, limit) {
+  const hits = [];
+  let last = -1;
+  for (const pos of positions) {
+    if (hits.length >= limit) break;
+    const segment = upperBound(index.offsets, pos) - 1;
+    if (segment === last) continue;
+    const lastSegment = upperBound(index.offsets, pos + length - 1) - 1;
+    hits.push({ segment, start: index.start[segment] / 1000, end: index.end[lastSegment] / 1000 });
+    last = segment;
+  }
+  return hits;
+}
+
+function searchBook(index, query, limit = 50) {
+  query = query.trim();
+  if (query.endsWith('*')) {
+    const prefix = foldText(query.slice(0, -1).trim());
+    if (!prefix) return [];
+    const positions = [];
+    for (let i = lowerBound(index.terms, prefix); i < index.terms.length && index.terms[i].startsWith(prefix); i++) {
+      positions.push(...termPositions(index, index.terms[i]));
+    }
+    return segmentHits(index, positions.sort((a, b) => a - b), 1, limit);
+  }
+
+  const terms = tokenize(query.replace(/"/g, ''));
+  if (terms.length === 0) return [];
+  const lists = terms.map(term => termPositions(index, term));
+  let rarest = 0;
+  lists.forEach((list, k) => { if (list.length < lists[rarest].length) rarest = k; });
+  const others = lists
+    .map((list, k) => [k - rarest, new Set(list)])
+    .filter(([delta]) => delta !== 0);
+  const found = lists[rarest]
+    .filter(pos => others.every(([delta, set]) => set.has(pos + delta)))
+    .map(pos => pos - rarest);
+  return segmentHits(index, found, terms.length, limit);
+}
+
+// API de busca: ?q=palavra, ?q=prefix*, ?q="frase exata"; sem ?book= busca em todos
+app.get('/api/search', (req, res) => {
+  const query = String(req.query.q || '');
+  const limit = Math.min(parseInt(req.query.limit, 10) || 50, 500);
+  if (!query.trim()) {
+    return res.status(400).json({ error: 'Missing query parameter q' });
+  }
+  try {
+    const books = req.query.book
+      ? [path.basename(String(req.query.book))]
+      : fs.readdirSync(TRANSCRIPTIONS_DIR)
+          .filter(file => file.endsWith('.search.json'))
+          .map(file => file.slice(0, -'.search.json'.length));
+
+    const results = [];
+    for (const book of books) {
+      for (const hit of searchBook(loadSearchIndex(book), query, limit)) {
+        results.push({ book, ...hit });
+      }
+    }
+    res.json({ query, results: results.slice(0, limit) });
+  } catch (error) {
+    if (error.code === 'ENOENT') {
+      return res.status(404).json({ error: 'Search index not found' });
+    }
+    console.error('Search error:', error);
+    res.status(500).json({ error: 'Search failed' });
+  }
+});
+
+// Partes do áudio por capítulo (scripts/audio_seek_index.py --split): o hash no nome muda com o conteúdo
+const AUDIO_PART = /[\\/]audio[\\/]parts[\\/][\w-]+[\\/][\w-]+\.[0-9a-f]{16}\.(mp3|m4a)$/;
+
+function setAudioPartHeaders(res, filePath) {
+  if (AUDIO_PART.test(filePath)) {
+    res.setHeader('Cache-Control', 'public, max-age=31536000, immutable');
+  }
+}
+
+// Shards por capítulo de scripts/publish_transcripts.py: variante pré-comprimida, ETag forte e cache longo
+const PUBLISHED_DIR = path.join(TRANSCRIPTIONS_DIR, 'published');
+const PUBLISHED_NAME = /^\w[\w.-]*$/;
+const HASHED_NAME = /\.([0-9a-f]{16})\.json$/;
+const PRECOMPRESSED = [['br', '.br'], ['gzip', '.gz']];
+const publishedDigests = new Map();
+
+function publishedDigest(file) {
+  // Shards já trazem o hash no nome; o manifesto é hasheado uma vez por versão
+  const hashed = path.basename(file).match(HASHED_NAME);
+  if (hashed) return hashed[1];
+  const mtime = fs.statSync(file).mtimeMs;
+  const cached = publishedDigests.get(file);
+  if (cached && cached.mtime === mtime) return cached.digest;
+  const digest = crypto.createHash('sha256').update(fs.readFileSync(file)).digest('hex').slice(0, 32);
+  publishedDigests.set(file, { mtime, digest });
+  return digest;
+}
+
+function acceptedEncodings(header) {
+  const accepted = new Set();
+  for (const part of String(header || '').split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';');
+    const q = params.map(p => p.trim()).find(p => p.startsWith('q='));
+    if (name && !(q && parseFloat(q.slice(2)) === 0)) accepted.add(name);
+  }
+  return accepted;
+}
+
+function servePublished(req, res, next) {
+  const { book, file } = req.params;
+  if (!PUBLISHED_NAME.test(book) || !PUBLISHED_NAME.test(file) || !file.endsWith('.json')) {
+    return next();
+  }
+  const filePath = path.join(PUBLISHED_DIR, book, file);
+  if (!fs.existsSync(filePath)) {
+    return next();
+  }
+
+  const accepted = acceptedEncodings(req.headers['accept-encoding']);
+  const variant = PRECOMPRESSED.find(([name, suffix]) => accepted.has(name) && fs.existsSync(filePath + suffix));
+  // ETag diferente por codificação: os bytes enviados são outros
+  const etag = `"${publishedDigest(filePath)}${variant ? '-' + variant[0] : ''}"`;
+  const headers = {
+    'Content-Type': 'application/json; charset=utf-8',
+    'Cache-Control': HASHED_NAME.test(file) ? 'public, max-age=31536000, immutable' : 'no-cache',
+    'ETag': etag,
+    'Vary': 'Accept-Encoding'
+  };
+  res.set(headers);
+
+  const ifNoneMatch = req.headers['if-none-match'];
+  if (ifNoneMatch && ifNoneMatch.split(',').some(tag => tag.trim() === etag || tag.trim() === '*')) {
+    return res.status(304).end();
+  }
+  if (variant) res.set('Content-Encoding', variant[0]);
+  // sendFile cuida de Range/If-Range e HEAD com os cabeçalhos acima
+  res.sendFile(variant ? filePath + variant[1] : filePath, { etag: false, lastModified: false, cacheControl: false });
+}
+
+// Traduções pré-calculadas por scripts/pretranslate.py; o que faltar vai para o próximo lote
+const TRANSLATIONS_FILE = path.join(TRANSCRIPTIONS_DIR, 'translations.json');
+const MISSES_FILE = path.join(TRANSCRIPTIONS_DIR, 'translation-misses.txt');
+let translationCache = { mtime: null, entries: new Map() };
+// Traduções do DeepL feitas em tempo real: LRU pela ordem de inserção do Map
+const LIVE_TRANSLATIONS_MAX = 5000;
+const liveTranslations = new Map();
+// Misses já anotados nesta execução e tamanho máximo do arquivo até o próximo lote
+const RECORDED_MISSES_MAX = 10000;
+const MISSES_FILE_MAX_BYTES = 1024 * 1024;
+const recordedMisses = new Set();
+
+function normalizeTranslationKey(text) {
+  return (text.toLowerCase().match(/\p{L}+(?:['’-]\p{L}+)*/gu) || []).join(' ');
+}
+
+function cachedTranslation(text) {
+  try {
+    const mtime = fs.statSync(TRANSLATIONS_FILE).mtimeMs;
+    if (translationCache.mtime !== mtime) {
+      const data = JSON.parse(fs.readFileSync(TRANSLATIONS_FILE, 'utf8'));
+      translationCache = { mtime, entries: new Map(Object.entries(data.translations)) };
+    }
+  } catch (error) {
+    if (error.code !== 'ENOENT') {
+      console.error('Translation cache error:', error.message);
+    }
+  }
+  const key = normalizeTranslationKey(text);
+  if (translationCache.entries.has(key)) {
+    return translationCache.entries.get(key);
+  }
+  const live = liveTranslations.get(key);
+  if (live !== undefined) {
+    liveTranslations.delete(key);
+    liveTranslations.set(key, live);
+  }
+  return live;
+}
+
+function rememberTranslation(text, translation) {
+  const key = normalizeTranslationKey(text);
+  if (!key) return;
+  liveTranslations.delete(key);
+  liveTranslations.set(key, translation);
+  if (liveTranslations.size > LIVE_TRANSLATIONS_MAX) {
+    liveTranslations.delete(liveTranslations.keys().next().value);
+  }
+}
+
+function inAnyBook(key) {
+  // Só palavras que aparecem em algum livro (termos do índice de busca) vão para o lote
+  const terms = tokenize(key);
+  if (terms.length === 0) return false;
+  let books;
+  try {
+    books = fs.readdirSync(TRANSCRIPTIONS_DIR)
+      .filter(file => file.endsWith('.search.json'))
+      .map(file => loadSearchIndex(file.slice(0, -'.search.json'.length)));
+  } catch (error) {
+    console.error('Could not load search indexes:', error.message);
+    return false;
+  }
+  return terms.every(term => books.some(index => index.terms[lowerBound(index.terms, term)] === term));
+}
+
+function recordTranslationMiss(text) {
+  const key = normalizeTranslationKey(text);
+  if (!key || recordedMisses.has(key) || !inAnyBook(key)) {
+    return;
+  }
+  if (recordedMisses.size >= RECORDED_MISSES_MAX) {
+    // Repetições no arquivo são descartadas por pretranslate.py
+    recordedMisses.clear();
+  }
+  recordedMisses.add(key);
+  fs.stat(MISSES_FILE, (statError, stats) => {
+    if (!statError && stats.size >= MISSES_FILE_MAX_BYTES) return;
+    fs.appendFile(MISSES_FILE, key + '\n', error => {
+      if (error) console.error('Could not record translation miss:', error.message);
+    });
+  });
+}
+
 app.post('/translate', async (req, res) => {
   try {
-    const { text } = req.body;
+    const { text } = req.body || {};
+    if (typeof text !== 'string' || !text.trim()) {
+      return res.status(400).json({ error: 'Missing text' });
+    }
+
+    const cached = cachedTranslation(text);
+    if (cached !== undefined) {
+      return res.json({
+        translations: [{ text: cached }]
+      });
+    }
     console.log('Translating text:', text);
+    recordTranslationMiss(text);
     
     // Check if DeepL API key is available and valid
     if (!process.env.DEEPL_API_KEY || process.env.DEEPL_API_KEY === 'test_key') {
@@ -100,6 +476,7 @@ app.post('/translate', async (req, res) => {
       );
 
       console.log('DeepL translation successful');
+      rememberTranslation(text, response.data.translations[0].text);
       res.json(response.data);
     } catch (deeplError) {
       console.log('DeepL API failed, using fallback translation');